@@ -0,0 +1,260 @@
+"""
+Offline all-pairs matching of stored profiles against stored jobs.
+
+Both sides are exported to local index directories. Every profile is then
+scored against every job with block-wise matrix products on a process pool,
+keeping the top k jobs per profile and, in a second pass with the roles
+swapped, the top k profiles per job. The full similarity matrix never
+exists; each worker holds one block of it, sized to fit the memory cap.
+
+    python all_pairs.py export --dir data/all_pairs
+    python all_pairs.py run --dir data/all_pairs --k 20 --workers 8 --memory-mb 4096
+"""
+import argparse
+import datetime
+import json
+import os
+import time
+from multiprocessing import Pool
+import numpy as np
+from pymongo import ReplaceOne
+from local_search import METADATA_FILE, cosine_to_score, export_directory, export_index, load_manifest, open_vectors, top_k
+
+PROFILES_DIR = "profiles"
+JOBS_DIR = "jobs"
+
+# Field holding the resume vector on stored profiles
+PROFILE_VECTOR_PATH = "resume_vector"
+
+# Field holding the vector version the profile was embedded for; profiles
+# stored before vector versions existed have none and count as legacy
+PROFILE_VERSION_FIELD = "vector_version"
+
+# Collections receiving the precomputed recommendations
+PROFILE_MATCHES_COLLECTION = "profile_job_matches"
+JOB_MATCHES_COLLECTION = "job_profile_matches"
+
+# Query rows scored together by one task
+DEFAULT_QUERY_BLOCK = 1024
+
+# Estimated bytes per element of a score block: the float32 scores and the
+# threshold mask, with headroom for temporaries
+BYTES_PER_SCORE = 8
+
+# Score columns folded into the running top-k at a time. Thresholds rise
+# after every chunk, so later chunks let through fewer and fewer candidates.
+UPDATE_COLUMNS = 1024
+
+_worker = {}
+
+
+def corpus_block_rows(query_block, workers, memory_limit, dimension):
+    """
+    Picks the number of corpus rows scored per matrix product so that all
+    workers together stay within `memory_limit` bytes.
+    """
+    per_worker = memory_limit // workers
+    rows = per_worker // (query_block * BYTES_PER_SCORE + dimension * 4)
+    if rows < 1:
+        raise ValueError(f"A memory limit of {memory_limit} bytes is too small for {workers} workers")
+    return int(rows)
+
+
+def load_metadata(directory):
+    """
+    Reads the per-row result documents of an index directory.
+    """
+    with open(os.path.join(directory, METADATA_FILE)) as metadata_file:
+        return json.load(metadata_file)
+
+
+def update_top_k(best_rows, best_scores, scores, offset):
+    """
+    Folds a block of scores into running per-row top-k lists.
+
+    Only entries beating a row's current k-th best score are considered, so
+    once the thresholds have settled almost every score is skipped by one
+    comparison instead of being partitioned.
+
+    Args:
+        best_rows: (queries, k) int32 corpus rows, best first; -1 for none.
+        best_scores: Matching float32 scores; -inf for none.
+        scores: A (queries, block) score matrix.
+        offset: Corpus row of the first block column.
+
+    Returns:
+        The updated (best_rows, best_scores).
+    """
+    k = best_rows.shape[1]
+    thresholds = best_scores[:, -1]
+    active = np.flatnonzero(scores.max(axis=1) > thresholds)
+    if not len(active):
+        return best_rows, best_scores
+    queries, columns = np.nonzero(scores[active] > thresholds[active, None])
+    queries = active[queries]
+
+    touched = np.unique(queries)
+    owner = np.concatenate([np.repeat(touched, k), queries])
+    rows = np.concatenate([best_rows[touched].ravel(), (columns + offset).astype(np.int32)])
+    candidate_scores = np.concatenate([best_scores[touched].ravel(), scores[queries, columns]])
+
+    # Sort candidates by owner, best first, and keep the first k of each owner
+    order = np.lexsort((-candidate_scores, owner))
+    owner = owner[order]
+    starts = np.searchsorted(owner, touched)
+    rank = np.arange(len(owner)) - np.repeat(starts, np.diff(np.append(starts, len(owner))))
+    keep = order[rank < k]
+    best_rows[touched] = rows[keep].reshape(-1, k)
+    best_scores[touched] = candidate_scores[keep].reshape(-1, k)
+    return best_rows, best_scores
+
+
+def _init_worker(profile_dir, job_dir):
+    _worker["profiles"] = open_vectors(profile_dir, load_manifest(profile_dir))
+    _worker["jobs"] = open_vectors(job_dir, load_manifest(job_dir))
+
+
+def _match_block(task):
+    query_side, corpus_side, start, stop, corpus_block, k = task
+    queries = np.asarray(_worker[query_side][start:stop])
+    corpus = _worker[corpus_side]
+
+    best_rows = np.full((len(queries), k), -1, dtype=np.int32)
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    for corpus_start in range(0, len(corpus), corpus_block):
+        block = np.asarray(corpus[corpus_start:corpus_start + corpus_block])
+        for chunk_start in range(0, len(block), UPDATE_COLUMNS):
+            chunk = queries @ block[chunk_start:chunk_start + UPDATE_COLUMNS].T
+            offset = corpus_start + chunk_start
+            if offset == 0:
+                # Seed the thresholds with an exact top-k of the first chunk
+                keep = top_k(chunk, k)
+                best_rows[:, :keep.shape[1]] = keep
+                best_scores[:, :keep.shape[1]] = np.take_along_axis(chunk, keep, axis=1)
+            else:
+                best_rows, best_scores = update_top_k(best_rows, best_scores, chunk, offset)
+    return query_side, start, best_rows, best_scores
+
+
+def match_all(profile_dir, job_dir, k=10, workers=None, memory_limit=2 ** 31, query_block=DEFAULT_QUERY_BLOCK):
+    """
+    Computes the top-k jobs of every profile and the top-k profiles of every job.
+
+    Args:
+        profile_dir: Local index directory of the profile vectors.
+        job_dir: Local index directory of the job vectors.
+        k: Number of matches kept on each side.
+        workers: Number of worker processes; defaults to the CPU count.
+        memory_limit: Approximate cap in bytes on the score blocks of all workers.
+        query_block: Number of query rows per task.
+
+    Returns:
+        (profile_rows, profile_scores, job_rows, job_scores): int32 row
+        indices into the other side, -1 where fewer than k exist, and cosine
+        similarities.
+    """
+    profile_dir, job_dir = export_directory(profile_dir), export_directory(job_dir)
+    manifests = {"profiles": load_manifest(profile_dir), "jobs": load_manifest(job_dir)}
+    dimension = manifests["profiles"]["dimension"]
+    if dimension != manifests["jobs"]["dimension"]:
+        raise ValueError(f"Profile vectors have dimension {dimension}, "
+                         f"job vectors {manifests['jobs']['dimension']}")
+    workers = workers or os.cpu_count()
+    corpus_block = corpus_block_rows(query_block, workers, memory_limit, dimension)
+
+    results = {}
+    tasks = []
+    for query_side, corpus_side in (("profiles", "jobs"), ("jobs", "profiles")):
+        count = manifests[query_side]["count"]
+        results[query_side] = (np.full((count, k), -1, dtype=np.int32),
+                               np.full((count, k), -np.inf, dtype=np.float32))
+        tasks += [(query_side, corpus_side, start, min(start + query_block, count), corpus_block, k)
+                  for start in range(0, count, query_block)]
+
+    started = time.perf_counter()
+    with Pool(workers, initializer=_init_worker, initargs=(profile_dir, job_dir)) as pool:
+        for done, (query_side, start, rows, scores) in enumerate(pool.imap_unordered(_match_block, tasks), 1):
+            results[query_side][0][start:start + len(rows)] = rows
+            results[query_side][1][start:start + len(rows)] = scores
+            if done % 10 == 0 or done == len(tasks):
+                print(f"[ALL_PAIRS] {done}/{len(tasks)} blocks ({time.perf_counter() - started:.1f}s, "
+                      f"corpus block {corpus_block} rows)")
+    return (*results["profiles"], *results["jobs"])
+
+
+def write_matches(collection, sources, targets, rows, scores, batch_size=1000):
+    """
+    Replaces the stored recommendations of every source document.
+
+    Args:
+        collection: The pymongo collection receiving the matches.
+        sources: Metadata of the matched side, one entry per row.
+        targets: Metadata of the other side, indexed by `rows`.
+        rows: (len(sources), k) row indices into `targets`, -1 for none.
+        scores: Matching cosine similarities.
+        batch_size: Number of documents per bulk request.
+
+    Returns:
+        The number of written documents.
+    """
+    generated_at = datetime.datetime.now(datetime.timezone.utc)
+    requests = []
+    written = 0
+    for source, source_rows, source_scores in zip(sources, rows.tolist(), scores.tolist()):
+        matches = [{**targets[row], "score": cosine_to_score(score)}
+                   for row, score in zip(source_rows, source_scores) if row >= 0]
+        requests.append(ReplaceOne({"_id": source["_id"]},
+                                   {"matches": matches, "generated_at": generated_at}, upsert=True))
+        if len(requests) >= batch_size:
+            collection.bulk_write(requests, ordered=False)
+            written += len(requests)
+            requests = []
+    if requests:
+        collection.bulk_write(requests, ordered=False)
+        written += len(requests)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="All-pairs profile and job matching")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Export profile and job vectors")
+    export_parser.add_argument("--dir", default="data/all_pairs", help="Output directory")
+    run_parser = subparsers.add_parser("run", help="Match every profile with every job and store the results")
+    run_parser.add_argument("--dir", default="data/all_pairs", help="Directory written by export")
+    run_parser.add_argument("--k", type=int, default=20, help="Matches kept per profile and per job")
+    run_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    run_parser.add_argument("--memory-mb", type=int, default=2048, help="Memory cap for the score blocks")
+    run_parser.add_argument("--query-block", type=int, default=DEFAULT_QUERY_BLOCK)
+    args = parser.parse_args()
+
+    from database import PROFILE_COLLECTION, get_collection
+    from vector_versions import LEGACY_VERSION, active_version
+    profile_dir = os.path.join(args.dir, PROFILES_DIR)
+    job_dir = os.path.join(args.dir, JOBS_DIR)
+
+    if args.command == "export":
+        # Jobs and profiles of the active vector version, so both sides share one embedding model
+        vector_version = active_version(get_collection())
+        versions = [vector_version["version"]] + ([None] if vector_version["version"] == LEGACY_VERSION else [])
+        profiles = export_index(get_collection(PROFILE_COLLECTION), profile_dir, path=PROFILE_VECTOR_PATH,
+                                query={PROFILE_VERSION_FIELD: {"$in": versions}})
+        jobs = export_index(get_collection(), job_dir, path=vector_version["path"])
+        print(f"Exported {profiles} profiles and {jobs} jobs to {args.dir}")
+    elif args.command == "run":
+        # Match and label rows with the same exports, even if a new one lands meanwhile
+        profile_dir, job_dir = export_directory(profile_dir), export_directory(job_dir)
+        start = time.perf_counter()
+        profile_rows, profile_scores, job_rows, job_scores = match_all(
+            profile_dir, job_dir, args.k, args.workers, args.memory_mb * 2 ** 20, args.query_block)
+        print(f"Matched in {time.perf_counter() - start:.1f}s")
+
+        profiles = load_metadata(profile_dir)
+        jobs = load_metadata(job_dir)
+        written = write_matches(get_collection(PROFILE_MATCHES_COLLECTION), profiles, jobs, profile_rows, profile_scores)
+        written += write_matches(get_collection(JOB_MATCHES_COLLECTION), jobs, profiles, job_rows, job_scores)
+        print(f"Wrote {written} recommendation documents")
+
+
+if __name__ == "__main__":
+    main()
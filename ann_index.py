@@ -0,0 +1,264 @@
+"""
+Approximate nearest-neighbour search with an inverted-file (IVF) index.
+
+Built on top of a local index directory from `local_search.py export`:
+
+    python ann_index.py build --dir data/local_index
+    SEARCH_BACKEND=ivf python user_profile_vectorization.py
+"""
+import argparse
+import json
+import math
+import os
+import numpy as np
+from local_search import LocalVectorIndex, export_directory, load_manifest, normalize_rows, open_vectors, top_k
+
+IVF_MANIFEST_FILE = "ivf_manifest.json"
+CENTROIDS_FILE = "ivf_centroids.npy"
+OFFSETS_FILE = "ivf_offsets.npy"
+ROW_IDS_FILE = "ivf_row_ids.npy"
+LIST_VECTORS_FILE = "ivf_vectors.npy"
+
+# Rows assigned to centroids per matrix product while building
+ASSIGN_BLOCK_ROWS = 65536
+
+# numCandidates is spread over this many candidates per probed list, so
+# the default numCandidates=100 probes 10 lists
+CANDIDATES_PER_PROBE = 10
+
+
+def default_nlist(count):
+    """
+    Returns the default number of inverted lists for a corpus size.
+    """
+    return max(1, min(count, int(4 * math.sqrt(count))))
+
+
+def assign(vectors, centroids, block_rows=ASSIGN_BLOCK_ROWS):
+    """
+    Assigns each vector to the centroid with the highest cosine similarity.
+
+    Args:
+        vectors: A 2-D array of normalized vectors (may be memory-mapped).
+        centroids: A 2-D array of normalized centroids.
+        block_rows: Number of vectors assigned per matrix product.
+
+    Returns:
+        An int array with one list number per vector.
+    """
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block_rows):
+        block = np.asarray(vectors[start:start + block_rows])
+        assignments[start:start + block_rows] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def train_centroids(vectors, nlist, iterations=8, sample_per_list=32, seed=0):
+    """
+    Runs spherical k-means on a sample of the vectors.
+
+    Args:
+        vectors: A 2-D array of normalized vectors.
+        nlist: Number of centroids.
+        iterations: Number of k-means iterations.
+        sample_per_list: Training vectors sampled per centroid.
+        seed: Random seed.
+
+    Returns:
+        A float32 array of normalized centroids.
+    """
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * sample_per_list)
+    sample_rows = np.sort(rng.choice(len(vectors), size=sample_size, replace=False))
+    sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, size=nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = assign(sample, centroids)
+        sums = np.stack([np.bincount(assignments, weights=sample[:, d], minlength=nlist)
+                         for d in range(sample.shape[1])], axis=1)
+        counts = np.bincount(assignments, minlength=nlist)
+
+        # Re-seed empty lists with random sample vectors
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+def build_ivf(directory, nlist=None, iterations=8, seed=0):
+    """
+    Builds an IVF index next to the exact index in `directory`.
+
+    Vectors are stored grouped by list, so probing a list reads one
+    contiguous slice of the memory-mapped file.
+
+    Args:
+        directory: A local index directory written by `export_index`.
+        nlist: Number of inverted lists; defaults to 4 * sqrt(count).
+        iterations: Number of k-means iterations.
+        seed: Random seed.
+
+    Returns:
+        The number of lists.
+    """
+    # Built next to the current export's files, and replaced along with them
+    directory = export_directory(directory)
+    manifest = load_manifest(directory)
+    vectors = open_vectors(directory, manifest)
+    if not len(vectors):
+        raise ValueError(f"Index in {directory} is empty")
+    nlist = nlist or default_nlist(len(vectors))
+
+    centroids = train_centroids(vectors, nlist, iterations, seed=seed)
+    assignments = assign(vectors, centroids)
+    row_ids = np.argsort(assignments, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=nlist))])
+
+    # Write vectors in list order without loading the whole matrix
+    list_vectors = np.lib.format.open_memmap(os.path.join(directory, LIST_VECTORS_FILE), mode="w+",
+                                             dtype=np.float32, shape=vectors.shape)
+    for start in range(0, len(row_ids), ASSIGN_BLOCK_ROWS):
+        block_rows = row_ids[start:start + ASSIGN_BLOCK_ROWS]
+        # Read the source rows in ascending order, which memory maps handle best
+        order = np.argsort(block_rows)
+        block = np.empty((len(block_rows), vectors.shape[1]), dtype=np.float32)
+        block[order] = vectors[block_rows[order]]
+        list_vectors[start:start + len(block_rows)] = block
+    list_vectors.flush()
+    del list_vectors
+
+    np.save(os.path.join(directory, CENTROIDS_FILE), centroids)
+    np.save(os.path.join(directory, OFFSETS_FILE), offsets)
+    np.save(os.path.join(directory, ROW_IDS_FILE), row_ids)
+    with open(os.path.join(directory, IVF_MANIFEST_FILE), "w") as manifest_file:
+        json.dump({"nlist": nlist, "count": len(vectors), "dimension": vectors.shape[1],
+                   "export_id": manifest.get("export_id")}, manifest_file)
+    return nlist
+
+
+class IVFIndex(LocalVectorIndex):
+    """
+    Approximate cosine search over an IVF index.
+
+    Every file is memory-mapped on load, so a restarted worker is ready
+    immediately. Recall and latency are traded through `nprobe`, the number
+    of lists scanned per query; by default it follows `num_candidates` the
+    way Atlas' numCandidates does.
+
+    Args:
+        directory: A local index directory with a built IVF index.
+        nprobe: Fixed number of lists to scan, overriding `num_candidates`.
+
+    Raises:
+        ValueError: If the current export has no IVF index, or it was built
+            for an earlier export; its row ids would point at the wrong jobs.
+    """
+
+    def __init__(self, directory, nprobe=None):
+        super().__init__(directory)
+        directory = self.directory
+        if not os.path.exists(os.path.join(directory, IVF_MANIFEST_FILE)):
+            raise ValueError(f"The current export in {directory} has no IVF index; "
+                             f"build it with `python ann_index.py build --dir {directory}`")
+        with open(os.path.join(directory, IVF_MANIFEST_FILE)) as manifest_file:
+            ivf_manifest = json.load(manifest_file)
+        built_for = (ivf_manifest.get("count"), ivf_manifest.get("dimension"), ivf_manifest.get("export_id"))
+        if built_for != (self.count, self.dimension, self.export_id):
+            raise ValueError(f"IVF index in {directory} was built for another export "
+                             f"({built_for[0]} x {built_for[1]}, export {built_for[2]}; the export has "
+                             f"{self.count} x {self.dimension}, export {self.export_id}); "
+                             f"rebuild it with `python ann_index.py build --dir {directory}`")
+        self.centroids = np.load(os.path.join(directory, CENTROIDS_FILE))
+        self.offsets = np.load(os.path.join(directory, OFFSETS_FILE))
+        self.row_ids = np.load(os.path.join(directory, ROW_IDS_FILE), mmap_mode="r")
+        self.list_vectors = np.load(os.path.join(directory, LIST_VECTORS_FILE), mmap_mode="r")
+        self.nlist = len(self.centroids)
+        self.nprobe = nprobe
+
+    def probes_for(self, num_candidates):
+        """
+        Returns the number of lists scanned for a numCandidates value.
+        """
+        if self.nprobe is not None:
+            return min(self.nlist, self.nprobe)
+        return min(self.nlist, max(1, math.ceil(num_candidates / CANDIDATES_PER_PROBE)))
+
+    def search_rows(self, query_vectors, limit=10, num_candidates=100):
+        """
+        Finds approximately the best-matching rows for a batch of queries.
+
+        Args:
+            query_vectors: A 2-D array with one query per row.
+            limit: Number of rows returned per query.
+            num_candidates: Controls how many lists are probed.
+
+        Returns:
+            A (rows, similarities) pair of 2-D arrays, best match first.
+            Queries with fewer than `limit` candidates are padded with row -1.
+        """
+        queries = normalize_rows(np.atleast_2d(query_vectors))
+        nprobe = self.probes_for(num_candidates)
+        probed_lists = top_k(queries @ self.centroids.T, nprobe)
+
+        best_rows = np.full((len(queries), limit), -1, dtype=np.int64)
+        best_scores = np.full((len(queries), limit), -np.inf, dtype=np.float32)
+        for i, (query, lists) in enumerate(zip(queries, probed_lists)):
+            scores = []
+            positions = []
+            for list_id in lists:
+                start, end = self.offsets[list_id], self.offsets[list_id + 1]
+                if start == end:
+                    continue
+                scores.append(self.list_vectors[start:end] @ query)
+                positions.append(np.arange(start, end))
+            if not scores:
+                continue
+            scores = np.concatenate(scores)
+            positions = np.concatenate(positions)
+            keep = top_k(scores[None, :], limit)[0]
+            best_rows[i, :len(keep)] = self.row_ids[positions[keep]]
+            best_scores[i, :len(keep)] = scores[keep]
+        return best_rows, best_scores
+
+    def search_batch(self, query_vectors, num_candidates=100, limit=10, filters=None):
+        """
+        Searches several query vectors.
+
+        Args:
+            query_vectors: A sequence or 2-D array of query embeddings.
+            num_candidates: Controls how many lists are probed.
+            limit: Number of results per query.
+            filters: Optional filter spec; filtered searches scan the
+                matching rows exactly instead of probing lists.
+
+        Returns:
+            One result list per query, in input order.
+        """
+        if filters:
+            return super().search_batch(query_vectors, num_candidates, limit, filters)
+        rows, similarities = self.search_rows(query_vectors, limit, num_candidates)
+        results = []
+        for query_rows, query_similarities in zip(rows, similarities):
+            found = query_rows >= 0
+            results.append(self.to_results(query_rows[found], query_similarities[found]))
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IVF approximate nearest-neighbour index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="Build an IVF index over an exported local index")
+    build_parser.add_argument("--dir", default="data/local_index", help="Local index directory")
+    build_parser.add_argument("--nlist", type=int, default=None, help="Number of inverted lists")
+    build_parser.add_argument("--iterations", type=int, default=8, help="k-means iterations")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        nlist = build_ivf(args.dir, args.nlist, args.iterations)
+        print(f"Built IVF index with {nlist} lists in {args.dir}")
+
+
+if __name__ == "__main__":
+    main()
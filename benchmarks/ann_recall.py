@@ -0,0 +1,100 @@
+"""
+Recall@10 and QPS of the IVF index against exact search on synthetic corpora.
+
+Vectors are drawn from a mixture of Gaussians so they cluster like real
+job embeddings, normalized and written to a temporary local index.
+
+Usage (from the repository root):
+    python -m benchmarks.ann_recall --sizes 100000,1000000,5000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from ann_index import IVFIndex, build_ivf
+from local_search import VECTORS_FILE, LocalVectorIndex, normalize_rows, write_manifest
+
+DIMENSION = 96
+CHUNK_ROWS = 100000
+
+
+def write_synthetic_index(directory, count, clusters, seed=0):
+    """
+    Writes a synthetic local index of `count` clustered vectors.
+
+    Returns:
+        The cluster centres, used to draw realistic queries.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, DIMENSION)).astype(np.float32)
+    with open(os.path.join(directory, VECTORS_FILE), "wb") as vectors_file:
+        for start in range(0, count, CHUNK_ROWS):
+            rows = min(CHUNK_ROWS, count - start)
+            labels = rng.integers(0, clusters, size=rows)
+            chunk = centres[labels] + 0.6 * rng.normal(size=(rows, DIMENSION)).astype(np.float32)
+            vectors_file.write(normalize_rows(chunk).tobytes())
+    write_manifest(directory, count, DIMENSION, [])
+    return centres
+
+
+def draw_queries(centres, count, seed=1):
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, len(centres), size=count)
+    return centres[labels] + 0.6 * rng.normal(size=(count, DIMENSION)).astype(np.float32)
+
+
+def timed(fn, queries, batch):
+    """
+    Runs `fn` over the queries in batches and returns (rows, queries per second).
+    """
+    rows = []
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch):
+        rows.append(fn(queries[i:i + batch]))
+    elapsed = time.perf_counter() - start
+    return np.vstack(rows), len(queries) / elapsed
+
+
+def recall_at_k(approximate, exact):
+    hits = sum(len(set(a) & set(e)) for a, e in zip(approximate.tolist(), exact.tolist()))
+    return hits / exact.size
+
+
+def run(count, queries_count, nprobes, limit):
+    with tempfile.TemporaryDirectory() as directory:
+        centres = write_synthetic_index(directory, count, clusters=max(16, count // 2000))
+        queries = draw_queries(centres, queries_count)
+
+        start = time.perf_counter()
+        nlist = build_ivf(directory)
+        print(f"\nn={count:,}  nlist={nlist}  build={time.perf_counter() - start:.1f}s")
+
+        exact_index = LocalVectorIndex(directory)
+        exact_rows, exact_qps = timed(lambda q: exact_index.search_rows(q, limit)[0], queries, batch=64)
+        print(f"  exact         recall@{limit}=1.000  QPS={exact_qps:10.1f}")
+
+        for nprobe in nprobes:
+            ivf_index = IVFIndex(directory, nprobe=nprobe)
+            ivf_rows, ivf_qps = timed(lambda q: ivf_index.search_rows(q, limit)[0], queries, batch=64)
+            print(f"  ivf nprobe={nprobe:<3} recall@{limit}={recall_at_k(ivf_rows, exact_rows):.3f}  "
+                  f"QPS={ivf_qps:10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100000", help="Comma-separated corpus sizes")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries per corpus")
+    parser.add_argument("--nprobes", default="1,5,10,20,50", help="Comma-separated nprobe values")
+    parser.add_argument("--limit", type=int, default=10, help="k for recall@k")
+    args = parser.parse_args()
+
+    nprobes = [int(value) for value in args.nprobes.split(",")]
+    for count in (int(value) for value in args.sizes.split(",")):
+        run(count, args.queries, nprobes, args.limit)
+
+
+if __name__ == "__main__":
+    main()
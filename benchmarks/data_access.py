@@ -0,0 +1,86 @@
+"""
+Read cost of job documents with and without narrow projections.
+
+Writes `--jobs` synthetic job documents, shaped like the ingest path's
+(description, tokens, a 96-dimension vector, filter fields), into a scratch
+collection, then reads them back the way the search paths do: whole
+documents, as the old `$project` with its nonexistent `plot` field allowed
+for everything but the vector, and with `database.RESULT_PROJECTION`. Reports
+bytes transferred and the per-operation latency recorded by
+`database.operation_stats`.
+
+Point MONGODB_URI at a local mongod stand-in (e.g. `docker run -p 27017:27017
+mongo`); the scratch database is dropped at the end.
+
+Usage (from the repository root):
+    MONGODB_URI=mongodb://localhost:27017 python -m benchmarks.data_access --jobs 5000
+"""
+import argparse
+import random
+import time
+
+import bson
+import numpy as np
+
+from benchmarks.field_extraction import logged_lengths, synthetic_posting
+from database import RESULT_FIELDS, RESULT_PROJECTION, get_client, operation_stats, projection
+
+SCRATCH_DATABASE = "benchmark_data_access"
+
+
+def synthetic_documents(count, dimensions=96, seed=0):
+    rng = random.Random(seed)
+    lengths = logged_lengths()
+    documents = []
+    for number in range(count):
+        description = synthetic_posting(rng, rng.choice(lengths), labelled=number % 2 == 0)
+        documents.append({
+            "job_id": number,
+            "title": f"Software Engineer {number}",
+            "link": f"https://www.linkedin.com/jobs/view/{number}/",
+            "description": description,
+            "tokens": description.lower().split(),
+            "description_vector": np.random.default_rng(number).random(dimensions).tolist(),
+            "filters": {"remote": number % 3 == 0, "skills": ["python", "go"]},
+        })
+    return documents
+
+
+def read_all(collection, fields):
+    start = time.perf_counter()
+    documents = list(collection.find({}, fields, batch_size=1000))
+    elapsed = time.perf_counter() - start
+    return elapsed, sum(len(bson.encode(document)) for document in documents)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    client = get_client()
+    collection = client[SCRATCH_DATABASE]["job_collection"]
+    collection.drop()
+    try:
+        collection.insert_many(synthetic_documents(args.jobs))
+        variants = [
+            ("whole documents", None),
+            ("all but the vector", {"description_vector": 0}),
+            ("result projection", RESULT_PROJECTION),
+            ("lexical index", projection("tokens", "id", *RESULT_FIELDS)),
+        ]
+        print(f"\n{args.jobs:,} jobs")
+        for label, fields in variants:
+            operation_stats.reset()
+            runs = [read_all(collection, fields) for _ in range(args.runs)]
+            elapsed = min(seconds for seconds, _ in runs)
+            size = runs[0][1]
+            print(f"  {label:20s} {size / args.jobs:10,.0f} bytes/doc  {elapsed * 1000:8.1f} ms  "
+                  f"| {operation_stats.summary()}")
+    finally:
+        client.drop_database(SCRATCH_DATABASE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Throughput and memory of the embedding backends, and of the embedding cache.
+
+Each embedder spec is measured in a fresh process: the time and resident
+memory it takes to load, docs/sec embedding synthetic job postings in
+batches, and docs/sec when the same postings are embedded again and answered
+from the content-hash cache.
+
+Usage (from the repository root):
+    python -m benchmarks.embedders --postings 500 \\
+        --specs en_core_web_sm sentence-transformers:/models/all-MiniLM-L6-v2
+"""
+import argparse
+import multiprocessing
+import random
+import resource
+import time
+
+from benchmarks.field_extraction import logged_lengths, synthetic_posting
+from nlp_models import DEFAULT_MODEL
+
+
+def resident_mb():
+    """
+    Returns the current resident set size in MiB (the peak where /proc is missing).
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(spec, texts, batch_size, results):
+    # Runs in its own process so the memory figures belong to one backend
+    from embedders import EmbeddingCache, load_embedder
+    before = resident_mb()
+    start = time.perf_counter()
+    embedder = load_embedder(spec, EmbeddingCache(max_entries=len(texts)))
+    embedder.embed(texts[:1])
+    load_seconds = time.perf_counter() - start
+    embedder.cache = EmbeddingCache(max_entries=len(texts))
+
+    start = time.perf_counter()
+    for offset in range(0, len(texts), batch_size):
+        vectors = embedder.embed(texts[offset:offset + batch_size])
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for offset in range(0, len(texts), batch_size):
+        embedder.embed(texts[offset:offset + batch_size])
+    cached = time.perf_counter() - start
+
+    results.put({"spec": spec, "dimensions": vectors.shape[1], "load": load_seconds,
+                 "memory": resident_mb() - before, "cold": len(texts) / cold, "cached": len(texts) / cached})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--postings", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--specs", nargs="+", default=[DEFAULT_MODEL], help="Embedder specs, see embedders.py")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    lengths = logged_lengths()
+    texts = [synthetic_posting(rng, rng.choice(lengths), labelled=i % 2 == 0) for i in range(args.postings)]
+    print(f"\n{len(texts):,} postings, mean {sum(map(len, texts)) / len(texts):,.0f} characters")
+
+    for spec in args.specs:
+        results = multiprocessing.Queue()
+        process = multiprocessing.Process(target=measure, args=(spec, texts, args.batch_size, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            print(f"  {spec}: failed (exit code {process.exitcode})")
+            continue
+        result = results.get()
+        print(f"  {result['spec']}: {result['dimensions']} dimensions, loaded in {result['load']:.1f}s "
+              f"(+{result['memory']:,.0f} MiB)  {result['cold']:,.0f} docs/s  "
+              f"cached {result['cached']:,.0f} docs/s")
+
+
+if __name__ == "__main__":
+    main()
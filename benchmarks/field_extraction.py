@@ -0,0 +1,131 @@
+"""
+Field extraction from real-sized job postings: per-field regex searches
+against the single-pass `field_extraction` scanner.
+
+Posting lengths are taken from the description lengths the scraper logged
+in `nohup.out` (mostly 3-6k characters); the text is synthetic prose with a
+few colons per paragraph. Half of the postings carry the labelled fields at
+random positions, the other half carry none, which is the worst case for
+both approaches. Results of both implementations are checked to be equal.
+
+Usage (from the repository root):
+    python -m benchmarks.field_extraction --postings 5000
+"""
+import argparse
+import os
+import random
+import re
+import time
+
+from field_extraction import extract_job_fields, extract_posting_fields, extract_resume_fields
+
+LOG_LENGTH_PATTERN = re.compile(r"^\[ON_DATA\] .* \[\] (\d+)$", re.MULTILINE)
+
+WORDS = ("experience team software engineering build scalable systems python cloud data customers product "
+         "design develop work with across the and of to in for our you will benefits salary range remote "
+         "hybrid office requirements responsibilities qualifications preferred").split()
+HEADINGS = ("About the job", "Responsibilities:", "Qualifications:", "Benefits:", "Pay range: $120,000 - $160,000",
+            "Schedule: Monday to Friday, 9:00 - 17:00")
+LABELLED_LINES = ("ID: 3771706034", "Title: Senior Software Engineer", "Location: New York, NY",
+                  "Sponsorship: Not available", "Skillset: Python, Go, Kubernetes",
+                  "https://www.linkedin.com/jobs/view/3771706034/")
+
+
+def logged_lengths(path="nohup.out"):
+    """
+    Returns the description lengths logged by the scraper, or 3-6k characters when the log is missing.
+    """
+    if os.path.exists(path):
+        with open(path, errors="replace") as log_file:
+            lengths = [int(length) for length in LOG_LENGTH_PATTERN.findall(log_file.read())]
+        if lengths:
+            return lengths
+    return list(range(3000, 6001, 250))
+
+
+def synthetic_posting(rng, length, labelled):
+    lines = []
+    size = 0
+    while size < length:
+        if rng.random() < 0.1:
+            line = rng.choice(HEADINGS)
+        else:
+            line = ("• " if rng.random() < 0.4 else "") + " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 25)))
+        lines.append(line)
+        size += len(line) + 1
+    if labelled:
+        for line in LABELLED_LINES:
+            lines.insert(rng.randint(0, len(lines)), line)
+    return "\n".join(lines)
+
+
+def regex_job_fields(text):
+    # The per-field searches previously copied into the ingest scripts
+    fields = {"id": None, "location": None, "sponsorship": None, "skillset": None}
+    id_match = re.search(r"\bID: (\d+)", text)
+    if id_match:
+        fields["id"] = int(id_match.group(1))
+    for field, label in (("location", "Location"), ("sponsorship", "Sponsorship")):
+        match = re.search(rf"\b{label}: (.+)", text)
+        if match:
+            fields[field] = match.group(1)
+    skillset_match = re.search(r"\bSkillset: (.+)", text)
+    if skillset_match:
+        fields["skillset"] = [skill.strip() for skill in skillset_match.group(1).split(",")]
+    return fields
+
+
+def regex_posting_fields(text):
+    fields = {**regex_job_fields(text), "link": None, "title": None}
+    link_match = re.search(r"https?://[^\s]+", text)
+    if link_match:
+        fields["link"] = link_match.group(0)
+    title_match = re.search(r"\bTitle: (.+)", text)
+    if title_match:
+        fields["title"] = title_match.group(1)
+    return fields
+
+
+def regex_resume_fields(text):
+    fields = {}
+    for field, label in (("title", "Title"), ("work_experience", "Work Experience"), ("location", "Location")):
+        match = re.search(rf"{label}:(.+?)(?:\n|$)", text, re.IGNORECASE)
+        fields[field] = match.group(1).strip() if match else None
+    return fields
+
+
+def time_per_text(extract, texts, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            extract(text)
+        best = min(best, time.perf_counter() - start)
+    return best / len(texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--postings", type=int, default=5000)
+    parser.add_argument("--log", default="nohup.out", help="Scraper log with description lengths")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    lengths = logged_lengths(args.log)
+    texts = [synthetic_posting(rng, rng.choice(lengths), labelled=i % 2 == 0) for i in range(args.postings)]
+    mean_length = sum(map(len, texts)) / len(texts)
+    print(f"\n{len(texts):,} postings, mean {mean_length:,.0f} characters "
+          f"(lengths from {len(lengths)} logged descriptions)")
+
+    for name, old, new in (("job fields", regex_job_fields, extract_job_fields),
+                           ("posting fields", regex_posting_fields, extract_posting_fields),
+                           ("resume fields", regex_resume_fields, extract_resume_fields)):
+        mismatches = sum(old(text) != new(text) for text in texts)
+        old_time = time_per_text(old, texts)
+        new_time = time_per_text(new, texts)
+        print(f"  {name:15s} regex={old_time * 1e6:7.1f}us  single-pass={new_time * 1e6:6.1f}us  "
+              f"speedup={old_time / new_time:4.1f}x  ({1 / new_time:,.0f}/s, mismatches={mismatches})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Size and query latency of the BM25 index on synthetic job tokens.
+
+Jobs and queries draw their terms from a Zipf distribution over the
+vocabulary, like real descriptions. Reports the build rate, the postings
+size against raw int32 doc ids and frequencies, and query latency with and
+without MaxScore pruning, checking that both return the same results.
+
+Usage (from the repository root):
+    python -m benchmarks.lexical_search --jobs 200000 --query-terms 60
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from lexical_search import BM25Index
+
+
+def synthetic_documents(count, vocabulary, mean_length, seed=0):
+    """
+    Yields job documents whose tokens follow a Zipf distribution.
+    """
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, vocabulary + 1)
+    cumulative = np.cumsum(weights / weights.sum())
+    names = np.array([f"term{i}" for i in range(vocabulary)])
+    for number in range(count):
+        length = int(rng.integers(mean_length // 2, mean_length * 3 // 2))
+        draws = np.minimum(np.searchsorted(cumulative, rng.random(length)), vocabulary - 1)
+        tokens = names[draws].tolist()
+        yield {"_id": number, "tokens": tokens, "title": f"job {number}",
+               "link": f"https://www.linkedin.com/jobs/view/{number}/"}
+
+
+def percentiles(latencies):
+    latencies = np.asarray(latencies) * 1000
+    return f"p50={np.percentile(latencies, 50):.2f}ms p99={np.percentile(latencies, 99):.2f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=200000)
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--length", type=int, default=250, help="Mean tokens per job")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--query-terms", type=int, default=60, help="Tokens per query, e.g. a short resume")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = BM25Index(directory)
+        start = time.perf_counter()
+        index.add_documents(synthetic_documents(args.jobs, args.vocabulary, args.length))
+        elapsed = time.perf_counter() - start
+
+        postings = sum(len(segment.postings) for segment in index.segments)
+        entries = sum(df for segment in index.segments for _, _, df in segment.terms.values())
+        print(f"\nIndexed {len(index):,} jobs in {elapsed:.1f}s ({len(index) / elapsed:,.0f} jobs/s), "
+              f"{len(index.segments)} segments")
+        print(f"  postings: {postings / 2 ** 20:,.1f} MiB for {entries:,} entries "
+              f"({postings / entries:.2f} bytes each, {8 * entries / postings:.1f}x smaller than int32 pairs)")
+
+        queries = [document["tokens"] for document in
+                   synthetic_documents(args.queries, args.vocabulary, args.query_terms, seed=1)]
+        timings = {}
+        answers = {}
+        for prune in (False, True):
+            latencies = []
+            answers[prune] = []
+            for terms in queries:
+                start = time.perf_counter()
+                answers[prune].append(index.search(terms, args.limit, prune=prune))
+                latencies.append(time.perf_counter() - start)
+            timings[prune] = latencies
+            print(f"  search ({'MaxScore' if prune else 'exhaustive'}): {percentiles(latencies)}")
+
+        agreement = np.mean([np.allclose([r["bm25_score"] for r in a], [r["bm25_score"] for r in b], rtol=1e-4)
+                             for a, b in zip(answers[False], answers[True])])
+        print(f"  MaxScore speedup: {np.median(timings[False]) / np.median(timings[True]):.1f}x, "
+              f"same top {args.limit} scores on {agreement:.0%} of queries")
+
+
+if __name__ == "__main__":
+    main()
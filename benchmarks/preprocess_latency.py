@@ -0,0 +1,78 @@
+"""
+Per-request latency of the resume preprocessing path, before and after the
+shared model registry.
+
+"before" reproduces the original `preprocess_resume` spaCy work: two
+`spacy.load` calls and two full parses per request. "after" uses the
+process-wide registry and runs only the components each step needs.
+
+Usage (from the repository root):
+    python -m benchmarks.preprocess_latency --requests 20
+"""
+import argparse
+import statistics
+import time
+
+import spacy
+
+from nlp_models import DEFAULT_MODEL, ENTITY_COMPONENTS, VECTOR_COMPONENTS, get_nlp, process
+
+SAMPLE_RESUME = """
+Title: iOS Engineer
+Work Experience: 3
+Location: United States
+EXPERIENCE
+Software Engineer, Nodal Health, July 2023 - October 2023, New York, NY
+Boosted system reliability by reengineering webhook event handling to mitigate race conditions.
+Enhanced Django Rest API testing with Pytest, achieving robust permission validation for multiple roles.
+Software Engineer Intern, MyCarmunity, April 2021 - July 2021, Halle, Germany
+Developed a server-side payment processing solution using the Paypal JavaScript SDK.
+SKILLS
+Languages: Python, JavaScript, TypeScript, C++, Go, SQL, HTML, CSS
+Frameworks: Django, Django Rest, React.js, Flask, Node.js, Express
+""".lower()
+
+
+def before(text, model_name):
+    named_entities = spacy.load(model_name)(text).ents
+    resume_vector = spacy.load(model_name)(text).vector
+    return named_entities, resume_vector
+
+
+def after(text, model_name):
+    named_entities = process(text, ENTITY_COMPONENTS, model_name).ents
+    resume_vector = process(text, VECTOR_COMPONENTS, model_name).vector
+    return named_entities, resume_vector
+
+
+def measure(fn, text, model_name, requests):
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        fn(text, model_name)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(label, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{label:<8} mean={statistics.mean(latencies):8.2f} ms  "
+          f"p50={statistics.median(latencies):8.2f} ms  p95={p95:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20, help="Number of simulated /search requests")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="spaCy model name or path")
+    args = parser.parse_args()
+
+    # Load the shared model up front, as the search service does at startup
+    get_nlp(args.model)
+
+    report("before", measure(before, SAMPLE_RESUME, args.model, args.requests))
+    report("after", measure(after, SAMPLE_RESUME, args.model, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Memory footprint, latency and recall of quantized job vectors versus float32.
+
+Usage (from the repository root):
+    python -m benchmarks.quantization_report --size 200000
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.ann_recall import draw_queries, recall_at_k, write_synthetic_index
+from local_search import LocalVectorIndex
+from vector_quantization import DEFAULT_RERANK, QuantizedIndex, build_codes
+
+
+def measure(index, queries, limit):
+    start = time.perf_counter()
+    rows = np.vstack([index.search_rows(query, limit)[0] for query in queries])
+    latency = (time.perf_counter() - start) / len(queries) * 1000
+    return rows, latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=200000, help="Corpus size")
+    parser.add_argument("--queries", type=int, default=100, help="Number of queries")
+    parser.add_argument("--limit", type=int, default=10, help="k for recall@k")
+    parser.add_argument("--rerank", type=int, default=None,
+                        help="Candidates re-scored with float32 (default: per-codec DEFAULT_RERANK)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        centres = write_synthetic_index(directory, args.size, clusters=max(16, args.size // 2000))
+        queries = draw_queries(centres, args.queries)
+
+        exact = LocalVectorIndex(directory)
+        exact_rows, exact_latency = measure(exact, queries, args.limit)
+        float_bytes = exact.vectors.nbytes
+        print(f"{'codec':<14}{'MiB':>9}{'ratio':>8}{'ms/query':>11}{'recall@' + str(args.limit):>11}")
+        print(f"{'float32':<14}{float_bytes / 2 ** 20:>9.1f}{1:>7.0f}x{exact_latency:>11.2f}{1:>11.3f}")
+
+        for codec in ("sq8", "pq"):
+            code_bytes = build_codes(directory, codec)
+            for rerank in (0, args.rerank or DEFAULT_RERANK[codec]):
+                index = QuantizedIndex(directory, codec, rerank=rerank)
+                rows, latency = measure(index, queries, args.limit)
+                label = f"{codec}" + (f"+rerank{rerank}" if rerank else "")
+                print(f"{label:<14}{code_bytes / 2 ** 20:>9.1f}{float_bytes / code_bytes:>7.0f}x"
+                      f"{latency:>11.2f}{recall_at_k(rows, exact_rows):>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
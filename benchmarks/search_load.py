@@ -0,0 +1,149 @@
+"""
+Load test of the /search path with and without request coalescing.
+
+Client threads fire synthetic resumes at an in-process search path backed by
+a synthetic local index. Database latency is simulated with a sleep per
+lookup, so results reflect a remote backend such as Atlas.
+
+    direct     each request embeds and searches on its own thread, as the
+               threaded Flask server does today
+    coalesced  requests go through `SearchCoalescer`
+
+Usage (from the repository root):
+    python -m benchmarks.search_load --concurrency 1,8,32 --requests 400
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.ann_recall import DIMENSION, write_synthetic_index
+from local_search import LocalVectorIndex, write_manifest
+from nlp_models import DEFAULT_MODEL, VECTOR_COMPONENTS, get_nlp
+from search_server import SearchCoalescer
+from text_analysis import analyze_batch
+
+SKILLS = ["python", "django", "flask", "react", "typescript", "kubernetes", "aws", "postgres", "spark", "kafka",
+          "swift", "ios", "android", "kotlin", "go", "rust", "terraform", "pandas", "pytorch", "sql"]
+
+RESUME_TEMPLATE = """Title: {title}
+Work Experience: {years}
+Location: United States
+EXPERIENCE
+Software Engineer, Nodal Health, New York, NY
+Boosted system reliability by reengineering webhook event handling with {a} and {b}.
+Built data pipelines in {c} and shipped services on {d}.
+SKILLS
+Languages: {skills}
+"""
+
+
+def make_resumes(count, seed=0):
+    rng = random.Random(seed)
+    resumes = []
+    for _ in range(count):
+        skills = rng.sample(SKILLS, 8)
+        resumes.append(RESUME_TEMPLATE.format(title=rng.choice(["iOS Engineer", "Backend Engineer", "Data Engineer"]),
+                                              years=rng.randint(1, 10), a=skills[0], b=skills[1], c=skills[2],
+                                              d=skills[3], skills=", ".join(skills)))
+    return resumes
+
+
+def embed_batch(resume_texts, model_name):
+    analyses = analyze_batch(resume_texts, VECTOR_COMPONENTS, model_name=model_name)
+    vectors = np.zeros((len(analyses), DIMENSION), dtype=np.float32)
+    for i, analysis in enumerate(analyses):
+        # Pad or cut so any installed model fits the synthetic index
+        vector = analysis["vector"][:DIMENSION]
+        vectors[i, :len(vector)] = vector
+    return list(vectors)
+
+
+def make_lookup(index, latency):
+    def lookup(query_vector):
+        time.sleep(latency)
+        return index.search(query_vector, num_candidates=100, limit=10)
+    return lookup
+
+
+def run_clients(handle, resumes, concurrency):
+    """
+    Sends every resume through `handle` from `concurrency` threads.
+
+    Returns:
+        (latencies in ms, queries per second)
+    """
+    latencies = []
+    lock = threading.Lock()
+    position = iter(range(len(resumes)))
+
+    def client():
+        while True:
+            with lock:
+                i = next(position, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            handle(resumes[i])
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, len(resumes) / (time.perf_counter() - start)
+
+
+def report(label, concurrency, latencies, qps):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<10} c={concurrency:<3} p50={statistics.median(latencies):8.2f} ms  "
+          f"p99={p99:8.2f} ms  QPS={qps:8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated client thread counts")
+    parser.add_argument("--requests", type=int, default=400, help="Requests per run")
+    parser.add_argument("--index-size", type=int, default=100000, help="Vectors in the synthetic index")
+    parser.add_argument("--lookup-latency-ms", type=float, default=20.0, help="Simulated database round trip")
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--lookup-workers", type=int, default=8)
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="spaCy model name or path")
+    args = parser.parse_args()
+
+    get_nlp(args.model)
+    resumes = make_resumes(args.requests)
+    latency = args.lookup_latency_ms / 1000
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_synthetic_index(directory, args.index_size, clusters=max(16, args.index_size // 2000))
+        metadata = [{"_id": str(row), "title": f"Job {row}", "link": None} for row in range(args.index_size)]
+        write_manifest(directory, args.index_size, DIMENSION, metadata)
+        lookup = make_lookup(LocalVectorIndex(directory), latency)
+
+        for concurrency in (int(value) for value in args.concurrency.split(",")):
+            def direct(resume_text):
+                return lookup(embed_batch([resume_text], args.model)[0])
+
+            report("direct", concurrency, *run_clients(direct, resumes, concurrency))
+
+            coalescer = SearchCoalescer(lambda texts: embed_batch(texts, args.model), lookup,
+                                        max_batch_size=args.max_batch, max_wait=args.max_wait_ms / 1000,
+                                        lookup_workers=args.lookup_workers)
+            report("coalesced", concurrency, *run_clients(coalescer.search, resumes, concurrency))
+            print(f"           mean batch size {coalescer.stats()['mean_batch_size']:.1f}")
+            coalescer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Build time and query latency of the skill index on synthetic jobs.
+
+Jobs draw their skills from a Zipf-like distribution over a skill
+vocabulary, so a few skills have very long posting lists as in real
+postings. Reports the build rate, `search` latency and the cost of scoring
+the skill overlap of a page of vector search results.
+
+Usage (from the repository root):
+    python -m benchmarks.skill_overlap --jobs 1000000 --skills 3000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from skill_index import SkillIndex
+
+
+def synthetic_skills(jobs, vocabulary, per_job, seed=0):
+    """
+    Yields the skill lists of synthetic jobs.
+    """
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, vocabulary + 1)
+    weights /= weights.sum()
+    names = np.array([f"skill{i}" for i in range(vocabulary)])
+    counts = rng.integers(1, 2 * per_job, size=jobs)
+    draws = rng.choice(vocabulary, size=int(counts.sum()), p=weights)
+    start = 0
+    for count in counts.tolist():
+        yield names[draws[start:start + count]].tolist()
+        start += count
+
+
+def percentiles(latencies):
+    latencies = np.asarray(latencies) * 1000
+    return f"p50={np.percentile(latencies, 50):.2f}ms p99={np.percentile(latencies, 99):.2f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=1000000)
+    parser.add_argument("--skills", type=int, default=3000, help="Distinct skills")
+    parser.add_argument("--per-job", type=int, default=8, help="Mean skills per job")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    index = SkillIndex()
+    start = time.perf_counter()
+    for key, skills in enumerate(synthetic_skills(args.jobs, args.skills, args.per_job)):
+        index.add(key, skills)
+    elapsed = time.perf_counter() - start
+    print(f"\nBuilt {len(index):,} jobs x {len(index.skill_ids):,} skills in {elapsed:.1f}s "
+          f"({len(index) / elapsed:,.0f} jobs/s)")
+
+    resumes = list(synthetic_skills(args.queries, args.skills, 12, seed=1))
+    for method in ("weighted", "jaccard"):
+        latencies = []
+        for skills in resumes:
+            start = time.perf_counter()
+            index.search(skills, limit=10, method=method)
+            latencies.append(time.perf_counter() - start)
+        print(f"  search ({method}): {percentiles(latencies)}")
+
+    rng = np.random.default_rng(2)
+    latencies = []
+    for skills in resumes:
+        rows = rng.choice(len(index), size=100, replace=False)
+        start = time.perf_counter()
+        index.overlap(skills, rows)
+        latencies.append(time.perf_counter() - start)
+    print(f"  overlap of 100 results: {percentiles(latencies)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Import time of the entry points, against a startup budget.
+
+Each module is imported `--runs` times in a fresh interpreter, so nothing is
+cached between runs, and the median wall time is compared with `--budget`.
+Importing must not download NLTK data, load spaCy or connect to MongoDB;
+modules that pull in spacy, nltk or sentence_transformers at import time are
+reported, and with `--profile` the slowest imports from `python -X importtime`
+are listed.
+
+Exits with status 1 when a module is over budget or fails to import, so the
+check can run in CI.
+
+Usage (from the repository root):
+    python -m benchmarks.startup_time --budget 1.5
+    python -m benchmarks.startup_time --modules user_profile_vectorization bulk_ingest --profile
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+# Modules that make startup slow; none of them should be imported eagerly
+HEAVY_MODULES = ("spacy", "nltk", "sentence_transformers", "torch", "sklearn")
+
+IMPORT_SCRIPT = """
+import sys
+import {module}
+print(",".join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+
+def import_once(module):
+    """
+    Imports a module in a fresh interpreter.
+
+    Returns:
+        (seconds, heavy modules it imported), or raises RuntimeError with the child's stderr.
+    """
+    script = IMPORT_SCRIPT.format(module=module, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1] if process.stderr.strip() else process.returncode)
+    heavy = process.stdout.strip().splitlines()[-1] if process.stdout.strip() else ""
+    return elapsed, [name for name in heavy.split(",") if name]
+
+
+def slowest_imports(module, count=10):
+    """
+    Returns the `count` imports with the largest cumulative time, from `-X importtime`.
+
+    Returns:
+        (microseconds, module name) pairs, slowest first.
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                             capture_output=True, text=True)
+    timings = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings.append((int(cumulative), name.strip()))
+    return sorted(timings, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=["user_profile_vectorization"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=1.5, help="Maximum median import time in seconds")
+    parser.add_argument("--profile", action="store_true", help="List the slowest imports of each module")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        try:
+            runs = [import_once(module) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"  {module}: import failed: {e}")
+            failed = True
+            continue
+        median = statistics.median(seconds for seconds, _ in runs)
+        heavy = sorted({name for _, names in runs for name in names})
+        over = median > args.budget
+        failed = failed or over
+        print(f"  {module:32s} median {median:6.2f}s  max {max(seconds for seconds, _ in runs):6.2f}s  "
+              f"budget {args.budget:.2f}s  {'OVER' if over else 'ok'}"
+              + (f"  (imports {', '.join(heavy)})" if heavy else ""))
+        if args.profile:
+            for microseconds, name in slowest_imports(module):
+                print(f"      {microseconds / 1e6:6.3f}s  {name}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Vectorization throughput of scraped jobs, inline on the scraper thread
+against the `VectorizationPool` worker processes.
+
+"inline" is what `on_data` used to do: batch the jobs and run spaCy on
+the thread that delivered them, so that thread is blocked for a whole
+batch every `--batch-size` jobs. The pool runs the same
+`vectorize_job_batch` in worker processes; the scraper thread only
+enqueues, and waits only when the bounded queue is full. Jobs are
+submitted as fast as possible, so the reported rate is the pipeline's
+throughput. Descriptions are synthetic postings with the lengths the
+scraper logged in `nohup.out`.
+
+Usage (from the repository root):
+    python -m benchmarks.vectorization_pool --jobs 2000 --workers 1 2 4
+"""
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks.field_extraction import logged_lengths, synthetic_posting
+from job_ingest import load_job_models, vectorize_job_batch
+from vectorization_pool import VectorizationPool
+
+
+def synthetic_jobs(count, seed=0):
+    rng = random.Random(seed)
+    lengths = logged_lengths()
+    return [{
+        "title": f"Software Engineer {number}",
+        "company": "Example",
+        "company_link": None,
+        "date": "2024-01-01",
+        "link": f"https://www.linkedin.com/jobs/view/{number}/",
+        "insights": ["Remote", "Full-time"],
+        "description": synthetic_posting(rng, rng.choice(lengths), labelled=number % 2 == 0),
+    } for number in range(count)]
+
+
+def run_inline(jobs, batch_size):
+    start = time.perf_counter()
+    for offset in range(0, len(jobs), batch_size):
+        vectorize_job_batch(jobs[offset:offset + batch_size], batch_size)
+    elapsed = time.perf_counter() - start
+    # The thread delivering the last job of a batch waits for all of it
+    return elapsed, elapsed / -(-len(jobs) // batch_size)
+
+
+def run_pool(jobs, batch_size, workers, max_pending):
+    handled = []
+    pool = VectorizationPool(vectorize_job_batch, handled.append, workers=workers, max_pending=max_pending,
+                             batch_size=batch_size, max_wait=0.05, initializer=load_job_models)
+    # Let every worker load the model before timing, as the scraper does at startup
+    pool.submit(jobs[0])
+    while not handled:
+        time.sleep(0.01)
+    del handled[:]
+
+    # Submits that find room in the queue, i.e. what on_data pays while the workers keep up
+    submits = []
+    start = time.perf_counter()
+    for job in jobs:
+        submit_start = time.perf_counter()
+        pool.submit(job)
+        if len(submits) < max_pending // 2:
+            submits.append(time.perf_counter() - submit_start)
+    pool.close()
+    elapsed = time.perf_counter() - start
+    assert len(handled) == len(jobs), (len(handled), len(jobs))
+    return elapsed, statistics.median(submits)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-pending", type=int, default=256)
+    args = parser.parse_args()
+
+    jobs = synthetic_jobs(args.jobs)
+    load_job_models()
+    print(f"\n{len(jobs):,} jobs, mean {sum(len(job['description']) for job in jobs) / len(jobs):,.0f} characters")
+
+    elapsed, stall = run_inline(jobs, args.batch_size)
+    baseline = len(jobs) / elapsed
+    print(f"  inline      {baseline:8,.0f} jobs/s  on_data stalls {stall * 1000:8.2f} ms every {args.batch_size} jobs")
+    for workers in args.workers:
+        elapsed, submit = run_pool(jobs, args.batch_size, workers, args.max_pending)
+        rate = len(jobs) / elapsed
+        print(f"  {workers:2d} workers  {rate:8,.0f} jobs/s  on_data submit  {submit * 1000:8.3f} ms "
+              f"({rate / baseline:.1f}x inline throughput)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""
+Streaming bulk ingest of job dumps without the live scraper.
+
+JSONL and CSV files, or directories of them, are streamed record by record
+through a generator pipeline:
+
+    read -> fields -> preprocess -> embed -> write
+
+Each stage works on one batch at a time and the writer's queue is bounded,
+so memory stays flat however large the input is. Records use the scraper's
+field names (`title`, `company`, `link`, `description`, ...); records
+without a description are skipped.
+
+Every `--checkpoint-every` documents the writer is flushed and the byte
+offset reached in each file is saved, so a killed run resumes after the
+last written record instead of embedding everything again. Every document
+is upserted on its job key: the id in its link or its `ID:` field, else a
+hash of its title, company and description (`bulk_writer.content_key`).
+The few records between the last checkpoint and the kill are therefore
+written again onto the same documents rather than duplicated.
+
+    python bulk_ingest.py data/dumps/ --checkpoint data/ingest_checkpoint.json
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from bulk_writer import JOB_KEY_FIELD, content_key, job_key
+from field_extraction import JOB_FIELDS
+from job_ingest import JOB_EVENT_FIELDS, job_document, load_job_models
+from embedders import analyze_docs, get_embedder
+from text_analysis import tokenize_batch
+from vector_versions import legacy_version
+
+# File types read from input directories
+INPUT_SUFFIXES = (".jsonl", ".ndjson", ".csv")
+
+DEFAULT_CHECKPOINT = "data/ingest_checkpoint.json"
+
+STAGES = ("read", "fields", "preprocess", "embed", "write")
+
+
+def iter_sources(paths):
+    """
+    Expands files and directories into the input files to read, in a stable order.
+
+    Args:
+        paths: File or directory paths.
+
+    Yields:
+        Absolute file paths.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, subdirectories, files in os.walk(path):
+                subdirectories.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(INPUT_SUFFIXES):
+                        yield os.path.abspath(os.path.join(directory, name))
+        else:
+            yield os.path.abspath(path)
+
+
+def read_jsonl(path, offset=0):
+    """
+    Streams the records of a JSONL file from a byte offset.
+
+    Args:
+        path: The file path.
+        offset: Byte offset to start at, e.g. from a checkpoint.
+
+    Yields:
+        (record, offset) pairs, where offset is the byte just after the record.
+    """
+    with open(path, "rb") as file:
+        file.seek(offset)
+        position = offset
+        for line in file:
+            position += len(line)
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                print(f"[INGEST] Skipping malformed line ending at byte {position} of {path}: {e}")
+                continue
+            if isinstance(record, dict):
+                yield record, position
+
+
+def read_csv(path, offset=0):
+    """
+    Streams the rows of a CSV file with a header line from a byte offset.
+
+    Quoted fields may span several lines; offsets always fall between rows.
+
+    Args:
+        path: The file path.
+        offset: Byte offset to start at, e.g. from a checkpoint.
+
+    Yields:
+        (record, offset) pairs, where offset is the byte just after the row.
+    """
+    with open(path, "rb") as file:
+        position = 0
+
+        def lines():
+            nonlocal position
+            for line in file:
+                position += len(line)
+                yield line.decode("utf-8")
+
+        reader = csv.reader(lines())
+        header = next(reader, None)
+        if header is None:
+            return
+        header[0] = header[0].lstrip("\ufeff")
+        if offset > position:
+            file.seek(offset)
+            position = offset
+        for row in reader:
+            yield dict(zip(header, row)), position
+
+
+def read_records(path, offset=0):
+    """
+    Streams the records of one input file, picking the reader from its suffix.
+    """
+    if path.lower().endswith(".csv"):
+        return read_csv(path, offset)
+    return read_jsonl(path, offset)
+
+
+class IngestCheckpoint:
+    """
+    Byte offsets reached in each input file, saved as JSON.
+
+    Args:
+        path: Path of the checkpoint file; loaded if it exists.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = {}
+        if path and os.path.exists(path):
+            with open(path) as checkpoint_file:
+                self.offsets = json.load(checkpoint_file).get("offsets", {})
+
+    def offset(self, source):
+        return self.offsets.get(source, 0)
+
+    def save(self, offsets):
+        """
+        Records new offsets and writes the file atomically.
+
+        Args:
+            offsets: Source path -> byte offset of the last written record.
+        """
+        self.offsets.update(offsets)
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w") as checkpoint_file:
+            json.dump({"offsets": self.offsets, "saved_at": time.time()}, checkpoint_file, indent=2)
+        os.replace(temporary_path, self.path)
+
+
+class StageStats:
+    """
+    Documents and seconds spent per pipeline stage.
+    """
+
+    def __init__(self):
+        self.documents = dict.fromkeys(STAGES, 0)
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.skipped = 0
+        self.started = time.perf_counter()
+
+    def add(self, stage, documents, seconds):
+        self.documents[stage] += documents
+        self.seconds[stage] += seconds
+
+    def report(self):
+        """
+        Returns a one-line summary with the docs/sec of every stage and end to end.
+        """
+        rates = "  ".join(
+            f"{stage}={self.documents[stage] / self.seconds[stage]:,.0f}/s" if self.seconds[stage] else f"{stage}=-"
+            for stage in STAGES
+        )
+        elapsed = time.perf_counter() - self.started
+        written = self.documents["write"]
+        return (f"{written:,} docs in {elapsed:,.1f}s ({written / elapsed:,.0f} docs/s), "
+                f"{self.skipped:,} skipped | {rates}")
+
+
+def read_jobs(sources, checkpoint, stats):
+    """
+    Streams jobs from every input file, resuming each at its checkpointed offset.
+
+    Yields:
+        (job, source, offset) triples; `job` has the `JOB_EVENT_FIELDS`.
+    """
+    for source in sources:
+        offset = checkpoint.offset(source)
+        if offset:
+            print(f"[INGEST] Resuming {source} at byte {offset:,}")
+        records = read_records(source, offset)
+        while True:
+            start = time.perf_counter()
+            try:
+                record, offset = next(records)
+            except StopIteration:
+                break
+            except (OSError, UnicodeDecodeError, csv.Error) as e:
+                print(f"[INGEST] Error reading {source}: {e}")
+                break
+            job = {field: record.get(field) for field in JOB_EVENT_FIELDS}
+            stats.add("read", 1, time.perf_counter() - start)
+            if not job["description"]:
+                stats.skipped += 1
+                continue
+            yield job, source, offset
+
+
+def batched(items, size):
+    """
+    Groups a stream into lists of up to `size` items.
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def vectorize_batches(batches, stats, batch_size, vector_version=None):
+    """
+    Runs field extraction, preprocessing and embedding over each batch.
+
+    Vectors are computed with the model of `vector_version` (default: the
+    legacy field) and stored in its field.
+
+    Yields:
+        Lists of (document, source, offset) triples in input order.
+    """
+    vector_version = vector_version or legacy_version()
+    embedder = get_embedder(vector_version["model"])
+    for batch in batches:
+        jobs = [job for job, _, _ in batch]
+        descriptions = [job["description"] for job in jobs]
+
+        start = time.perf_counter()
+        fields_batch = JOB_FIELDS.extract_batch(descriptions)
+        fields_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        docs = tokenize_batch(descriptions, embedder.spacy_model)
+        stats.add("preprocess", len(batch), time.perf_counter() - start)
+
+        start = time.perf_counter()
+        analyses = analyze_docs(descriptions, docs, spec=vector_version["model"], batch_size=batch_size)
+        stats.add("embed", len(batch), time.perf_counter() - start)
+
+        start = time.perf_counter()
+        documents = [job_document(job, additional_fields, analysis, vector_version["path"])
+                     for job, additional_fields, analysis in zip(jobs, fields_batch, analyses)]
+        for job, document in zip(jobs, documents):
+            # Records without a link id or ID: would otherwise be inserted again on every resume
+            if job_key(document) is None:
+                document[JOB_KEY_FIELD] = content_key(job)
+        stats.add("fields", len(batch), fields_seconds + time.perf_counter() - start)
+
+        yield [(document, source, offset) for document, (_, source, offset) in zip(documents, batch)]
+
+
+def ingest(paths, job_writer, checkpoint, batch_size=64, checkpoint_every=1000, vector_version=None):
+    """
+    Streams job files into the collection through the bulk writer.
+
+    Args:
+        paths: Files or directories of JSONL/CSV job records.
+        job_writer: The `BulkJobWriter` receiving the documents.
+        checkpoint: An `IngestCheckpoint`.
+        batch_size: Jobs per embedding batch.
+        checkpoint_every: Documents between writer flushes and checkpoint saves.
+        vector_version: The active vector version (see `vector_versions.active_version`);
+            defaults to the legacy `description_vector` field.
+
+    Returns:
+        The `StageStats` of the run.
+    """
+    stats = StageStats()
+    jobs = read_jobs(iter_sources(paths), checkpoint, stats)
+    reached = {}
+    since_checkpoint = 0
+    for batch in vectorize_batches(batched(jobs, batch_size), stats, batch_size, vector_version):
+        start = time.perf_counter()
+        for document, source, offset in batch:
+            job_writer.write(document)
+            reached[source] = offset
+        since_checkpoint += len(batch)
+        if since_checkpoint >= checkpoint_every:
+            save_checkpoint(job_writer, checkpoint, reached)
+            since_checkpoint = 0
+        stats.add("write", len(batch), time.perf_counter() - start)
+        if not since_checkpoint:
+            print(f"[INGEST] {stats.report()}")
+
+    start = time.perf_counter()
+    save_checkpoint(job_writer, checkpoint, reached)
+    stats.seconds["write"] += time.perf_counter() - start
+    return stats
+
+
+def save_checkpoint(job_writer, checkpoint, reached):
+    """
+    Waits for every queued document to be written, then saves the offsets reached.
+
+    Raises:
+        RuntimeError: If the writer gave up on a batch; the checkpoint is not
+            advanced, so the next run writes those records again.
+    """
+    job_writer.flush()
+    if job_writer.totals["failed"]:
+        raise RuntimeError(f"{job_writer.totals['failed']} documents failed to write; checkpoint not advanced")
+    checkpoint.save(reached)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream JSONL/CSV job dumps into the job collection")
+    parser.add_argument("paths", nargs="+", help="JSONL/CSV files or directories of them")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Offsets file used to resume")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and read every file again")
+    parser.add_argument("--batch-size", type=int, default=64, help="Jobs per embedding batch")
+    parser.add_argument("--checkpoint-every", type=int, default=1000, help="Documents between checkpoints")
+    args = parser.parse_args()
+
+    from bulk_writer import BulkJobWriter
+    from database import get_collection, operation_stats
+    from vector_versions import active_version
+    collection = get_collection()
+    vector_version = active_version(collection)
+    print(f"[INGEST] Writing vector version {vector_version['version']} ({vector_version['path']})")
+    load_job_models(vector_version)
+
+    checkpoint = IngestCheckpoint(args.checkpoint)
+    if args.restart:
+        checkpoint.offsets = {}
+    job_writer = BulkJobWriter(collection)
+    job_writer.ensure_indexes()
+    try:
+        stats = ingest(args.paths, job_writer, checkpoint, args.batch_size, args.checkpoint_every, vector_version)
+        print(f"[INGEST] Done: {stats.report()}")
+    finally:
+        job_writer.close()
+        print(f"[INGEST] MongoDB: {operation_stats.summary()}")
+
+
+if __name__ == "__main__":
+    main()
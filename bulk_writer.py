@@ -0,0 +1,349 @@
+import hashlib
+import queue
+import re
+import threading
+import time
+import numpy as np
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, ExecutionTimeout, PyMongoError
+from result_cache import bump_generation
+from vector_storage import VECTOR_STORAGE, encode_for_storage
+
+# LinkedIn job links look like https://www.linkedin.com/jobs/view/<id>/?...
+JOB_LINK_ID_PATTERN = re.compile(r"/jobs/view/(\d+)")
+
+# Field holding the stable job key every upsert matches on
+JOB_KEY_FIELD = "job_id"
+
+# Fields hashed into the key of a job that has neither a link id nor an `ID:`
+CONTENT_KEY_FIELDS = ("title", "company", "description")
+
+# Embedding fields written in the configured vector storage format: the legacy
+# field and the `vectors.<version>` fields of vector_versions.py
+VECTOR_FIELDS = ("description_vector",)
+VERSIONED_VECTORS_PREFIX = "vectors."
+
+# Field on a canonical job listing the near-duplicate postings collapsed into it
+DUPLICATES_FIELD = "duplicates"
+
+# Errors after which a whole bulk request is resent: network errors, primary
+# step-downs and server selection or operation timeouts
+TRANSIENT_ERRORS = (ConnectionFailure, ExecutionTimeout)
+
+# Codes of per-operation write errors worth resending (host unreachable,
+# interrupted or stepped-down primary, time limits); duplicate keys,
+# validation failures and the like fail the same way every time
+RETRYABLE_WRITE_CODES = {6, 7, 50, 89, 91, 189, 262, 9001, 10107, 11600, 11602, 13435, 13436}
+
+
+def parse_job_id(link):
+    """
+    Extracts the LinkedIn job id from a job link.
+
+    Args:
+        link: A job URL, or None.
+
+    Returns:
+        The job id as an int, or None if the link has none.
+    """
+    if not link:
+        return None
+    match = JOB_LINK_ID_PATTERN.search(link)
+    return int(match.group(1)) if match else None
+
+
+def job_key(data):
+    """
+    Returns the stable key of a job document.
+
+    The id in the LinkedIn link is preferred; the `ID:` field parsed by
+    `extract_job_fields` is the fallback.
+
+    Args:
+        data: A job document.
+
+    Returns:
+        The job key as an int, or None if the document has neither.
+    """
+    key = parse_job_id(data.get("link"))
+    if key is None:
+        key = data.get("id")
+    return key
+
+
+def content_key(data):
+    """
+    Returns a deterministic key for a job without a link id or `ID:` field.
+
+    The key is derived from the title, company and description, so the same
+    record read again, e.g. when a bulk ingest resumes, is upserted onto the
+    same document. It is a negative int64, which no LinkedIn job id is.
+
+    Args:
+        data: A job or job document.
+
+    Returns:
+        The key as a negative int.
+    """
+    text = "\0".join(str(data.get(field) or "") for field in CONTENT_KEY_FIELDS)
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return -(int.from_bytes(digest[:8], "big") >> 1) - 1
+
+
+def nest_dotted_fields(document):
+    """
+    Turns dotted keys such as `vectors.v2` into subdocuments, for inserts;
+    upserts `$set` dotted keys as paths, which leaves sibling fields in place.
+    """
+    nested = {}
+    for field, value in document.items():
+        *parents, name = field.split(".")
+        target = nested
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[name] = value
+    return nested
+
+
+class BulkJobWriter:
+    """
+    Buffers job documents and writes them to MongoDB in bulk from a background thread.
+
+    Documents with a job key are upserted on `job_id`, so re-scraping a query
+    updates postings instead of inserting them again; a `job_id` set by the
+    caller, e.g. a `content_key`, is used when the document has no link id or
+    `ID:`. Documents without any key are inserted as-is. After every successful batch the collection's
+    generation counter is bumped, which invalidates cached search results.
+    The queue is bounded: `write` blocks once
+    `max_pending` documents are waiting, which caps memory use.
+
+    Args:
+        collection: The pymongo collection to write to.
+        batch_size: Maximum number of documents per bulk request.
+        flush_interval: Seconds to wait for a batch to fill before sending it.
+        max_pending: Maximum number of documents waiting to be written.
+        max_retries: Number of times a batch that failed transiently is retried.
+        retry_backoff: Initial delay in seconds between retries; doubles each time.
+        vector_storage: "array" or "binary"; see `vector_storage.VECTOR_STORAGE`.
+        on_written: Optional callback, called from the writer thread with the
+            job keys of the documents each bulk request stored. Documents that
+            failed are never reported.
+    """
+
+    def __init__(self, collection, batch_size=500, flush_interval=2.0, max_pending=5000,
+                 max_retries=3, retry_backoff=0.5, vector_storage=VECTOR_STORAGE, on_written=None):
+        self.collection = collection
+        self.vector_storage = vector_storage
+        self.on_written = on_written
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self.totals = {"batches": 0, "inserted": 0, "upserted": 0, "modified": 0, "failed": 0}
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def ensure_indexes(self):
+        """
+        Creates the unique index that keeps upserts from racing into duplicates.
+        """
+        try:
+            self.collection.create_index(
+                JOB_KEY_FIELD,
+                unique=True,
+                partialFilterExpression={JOB_KEY_FIELD: {"$exists": True}},
+            )
+        except PyMongoError as e:
+            print(f"Error creating index on '{JOB_KEY_FIELD}': {e}")
+
+    def write(self, data):
+        """
+        Queues one job document, blocking while the queue is full.
+
+        Args:
+            data: The job document. `description_vector` and dotted
+                `vectors.<version>` fields are stored in the configured vector
+                format; other NumPy arrays become lists.
+        """
+        if self._closed:
+            raise RuntimeError("BulkJobWriter is closed")
+        self._queue.put(self._prepare(data))
+
+    def write_duplicate(self, cluster_id, duplicate):
+        """
+        Records a near-duplicate posting on its canonical job instead of storing it.
+
+        The update upserts, so it lands correctly even when the canonical job
+        is written later in the same unordered batch.
+
+        Args:
+            cluster_id: The job key of the canonical posting.
+            duplicate: Small document describing the duplicate (link, company, ...).
+        """
+        if self._closed:
+            raise RuntimeError("BulkJobWriter is closed")
+        self._queue.put(UpdateOne(
+            {JOB_KEY_FIELD: cluster_id},
+            {"$addToSet": {DUPLICATES_FIELD: self._prepare(duplicate)}},
+            upsert=True,
+        ))
+
+    def flush(self):
+        """
+        Blocks until every queued document has been written or has failed.
+        """
+        self._queue.join()
+
+    def close(self):
+        """
+        Writes the remaining documents and stops the background thread.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        print(f"[BULK_WRITE] Totals: {self.totals}")
+
+    def _prepare(self, data):
+        document = dict(data)
+        for field, value in document.items():
+            if (field in VECTOR_FIELDS or field.startswith(VERSIONED_VECTORS_PREFIX)) and value is not None:
+                document[field] = encode_for_storage(value, self.vector_storage)
+            elif isinstance(value, np.ndarray):
+                document[field] = value.tolist()
+        key = job_key(document)
+        if key is not None:
+            document[JOB_KEY_FIELD] = key
+        return document
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = None
+            while len(batch) < self.batch_size:
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                try:
+                    document = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if document is None:
+                    self._queue.task_done()
+                    stopping = True
+                    break
+                batch.append(document)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if not batch:
+                continue
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                # Never let an unexpected error kill the writer thread
+                self.totals["failed"] += len(batch)
+                print(f"[BULK_WRITE] Error writing batch of {len(batch)} documents: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _build_requests(self, batch):
+        # Collapse repeats of the same job inside a batch; the latest copy wins.
+        # Returns the requests and, for each, the key of the job document it
+        # writes, or None
+        keyed = {}
+        requests = []
+        keys = []
+        for document in batch:
+            if not isinstance(document, dict):
+                # Prebuilt write request, e.g. from write_duplicate
+                requests.append(document)
+                keys.append(None)
+                continue
+            key = document.get(JOB_KEY_FIELD)
+            if key is None:
+                requests.append(InsertOne(nest_dotted_fields(document)))
+                keys.append(None)
+            else:
+                keyed[key] = document
+        for key, document in keyed.items():
+            requests.append(UpdateOne({JOB_KEY_FIELD: key}, {"$set": document}, upsert=True))
+            keys.append(key)
+        return requests, keys
+
+    def _write_batch(self, batch):
+        requests, keys = self._build_requests(batch)
+        delay = self.retry_backoff
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = self.collection.bulk_write(requests, ordered=False)
+            except BulkWriteError as e:
+                # The bulk is unordered, so every request without a write error
+                # was applied; only the retryable failures are sent again
+                self._record_batch(len(requests), e.details)
+                errors = e.details.get("writeErrors", [])
+                failed = {error["index"] for error in errors}
+                self._report_written(key for index, key in enumerate(keys) if index not in failed)
+                retryable = [error for error in errors if error.get("code") in RETRYABLE_WRITE_CODES]
+                if len(retryable) < len(errors):
+                    self.totals["failed"] += len(errors) - len(retryable)
+                    first = next(error for error in errors if error not in retryable)
+                    print(f"[BULK_WRITE] {len(errors) - len(retryable)} documents failed: {first.get('errmsg')}")
+                requests = [requests[error["index"]] for error in retryable]
+                keys = [keys[error["index"]] for error in retryable]
+                if not requests:
+                    return
+                error = f"{len(requests)} retryable write errors"
+            except TRANSIENT_ERRORS as e:
+                error = e
+            except PyMongoError as e:
+                self.totals["failed"] += len(requests)
+                print(f"[BULK_WRITE] Batch of {len(requests)} documents failed: {e}")
+                return
+            else:
+                self._record_batch(len(requests), result.bulk_api_result)
+                self._report_written(keys)
+                return
+
+            if attempt == self.max_retries:
+                self.totals["failed"] += len(requests)
+                print(f"[BULK_WRITE] Giving up on batch of {len(requests)} documents: {error}")
+                return
+            print(f"[BULK_WRITE] Batch failed (attempt {attempt + 1}), retrying {len(requests)} documents "
+                  f"in {delay:.1f}s: {error}")
+            time.sleep(delay)
+            delay *= 2
+
+    def _record_batch(self, size, details):
+        # Adds the counts of a bulk result, or of the applied part of a failed one
+        counts = {
+            "inserted": details.get("nInserted", 0),
+            "upserted": details.get("nUpserted", 0),
+            "modified": details.get("nModified", 0),
+        }
+        self.totals["batches"] += 1
+        for field, count in counts.items():
+            self.totals[field] += count
+        print(f"[BULK_WRITE] Batch of {size} documents: {counts}")
+        self._bump_generation()
+
+    def _report_written(self, keys):
+        # Passes the keys of the stored job documents to on_written
+        if self.on_written is None:
+            return
+        written = [key for key in keys if key is not None]
+        if not written:
+            return
+        try:
+            self.on_written(written)
+        except Exception as e:
+            print(f"[BULK_WRITE] Error reporting {len(written)} written documents: {e}")
+
+    def _bump_generation(self):
+        try:
+            bump_generation(self.collection)
+        except PyMongoError as e:
+            print(f"[BULK_WRITE] Error bumping collection generation: {e}")
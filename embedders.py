@@ -0,0 +1,371 @@
+"""
+Pluggable text embedders with a content-hash cache.
+
+An embedder is chosen by a spec string:
+
+    en_core_web_sm                                  spaCy `doc.vector` (the default)
+    spacy:en_core_web_md                            the same, explicitly
+    sentence-transformers:/models/all-MiniLM-L6-v2  a local sentence-transformers model directory
+
+Both run batched inference on CPU. The spaCy embedder reuses the parse the
+callers already make for their tokens, so it costs no extra pass; the
+sentence-transformers embedder sees the raw text and honours
+EMBEDDER_THREADS and EMBEDDER_MAX_SEQ_LENGTH.
+
+Vectors are cached by the SHA-256 of the embedder spec and the text, so a
+description that was already embedded (a repost, a re-run ingest or a
+backfill) is not embedded again. Set EMBEDDING_CACHE_DIR to share the
+cache between processes on a host.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+from nlp_models import DEFAULT_MODEL, VECTOR_COMPONENTS
+from text_analysis import annotate_batch, tokenize_batch
+
+# Embedder used for job and resume vectors; see the module docstring
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", DEFAULT_MODEL)
+
+# Inference settings; threads and sequence length only apply to sentence-transformers
+EMBEDDER_BATCH_SIZE = int(os.environ.get("EMBEDDER_BATCH_SIZE", "64"))
+EMBEDDER_THREADS = int(os.environ.get("EMBEDDER_THREADS", "0")) or None
+EMBEDDER_MAX_SEQ_LENGTH = int(os.environ.get("EMBEDDER_MAX_SEQ_LENGTH", "256"))
+
+# Cache sizing; EMBEDDING_CACHE_DIR enables the store shared between processes
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_DIR = os.environ.get("EMBEDDING_CACHE_DIR")
+
+SENTENCE_TRANSFORMERS_PREFIX = "sentence-transformers:"
+SPACY_PREFIX = "spacy:"
+
+
+class SpacyEmbedder:
+    """
+    Embeds texts as the spaCy `doc.vector` of the cleaned text.
+
+    With the small models this is the average of the `tok2vec` tensor, which
+    is what the stored `description_vector`s have always been.
+
+    Args:
+        model_name: The name of the installed spaCy model.
+        batch_size: Number of texts each component processes at once.
+    """
+
+    # Pipeline components whose output `doc.vector` needs
+    components = VECTOR_COMPONENTS
+
+    def __init__(self, model_name=DEFAULT_MODEL, batch_size=EMBEDDER_BATCH_SIZE):
+        self.model_name = model_name
+        self.spacy_model = model_name
+        self.batch_size = batch_size
+        self.name = f"{SPACY_PREFIX}{model_name}"
+
+    def embed(self, texts):
+        """
+        Embeds a batch of texts.
+
+        Returns:
+            A float32 array with one row per text.
+        """
+        return self.embed_docs(tokenize_batch(texts, self.model_name))
+
+    def embed_docs(self, docs):
+        """
+        Embeds Docs that were tokenized with `tokenize_batch`.
+        """
+        analyses = annotate_batch(docs, self.components, self.batch_size, self.model_name)
+        return _stack([analysis["vector"] for analysis in analyses])
+
+
+class SentenceTransformerEmbedder:
+    """
+    Embeds texts with a sentence-transformers model loaded from a local directory.
+
+    The model runs on CPU; texts longer than `max_seq_length` word pieces are
+    truncated by the model.
+
+    Args:
+        model_dir: Directory holding the saved model; nothing is downloaded.
+        batch_size: Number of texts per forward pass.
+        max_seq_length: Maximum number of word pieces per text.
+        threads: Torch intra-op threads, or None for the torch default.
+    """
+
+    # Only the tokenizer runs when callers parse texts for their terms
+    components = ()
+
+    def __init__(self, model_dir, batch_size=EMBEDDER_BATCH_SIZE, max_seq_length=EMBEDDER_MAX_SEQ_LENGTH,
+                 threads=EMBEDDER_THREADS):
+        if not os.path.isdir(model_dir):
+            raise ValueError(f"sentence-transformers model directory not found: {model_dir}")
+        import torch
+        from sentence_transformers import SentenceTransformer
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_dir, device="cpu")
+        self.model.max_seq_length = max_seq_length
+        self.model_dir = model_dir
+        self.spacy_model = DEFAULT_MODEL
+        self.batch_size = batch_size
+        self.name = f"{SENTENCE_TRANSFORMERS_PREFIX}{model_dir}@{max_seq_length}"
+
+    def embed(self, texts):
+        """
+        Embeds a batch of raw texts.
+
+        Returns:
+            A float32 array with one row per text.
+        """
+        vectors = self.model.encode(list(texts), batch_size=self.batch_size, convert_to_numpy=True,
+                                    show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def _stack(vectors):
+    if not vectors:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.array(vectors, dtype=np.float32)
+
+
+def embedding_key(embedder_name, text):
+    """
+    Returns the cache key of a text: the SHA-256 of the embedder name and the text.
+    """
+    digest = hashlib.sha256(embedder_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of vectors keyed by content hash.
+
+    With `directory` set, misses fall through to one .npy file per vector,
+    written atomically, which every process on the host shares.
+
+    Args:
+        max_entries: Maximum number of in-memory vectors.
+        directory: Optional directory for the shared store.
+    """
+
+    def __init__(self, max_entries=EMBEDDING_CACHE_SIZE, directory=EMBEDDING_CACHE_DIR):
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "shared_hits": 0, "misses": 0}
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.npy")
+
+    def get(self, key):
+        """
+        Returns a cached vector, or None on a miss.
+        """
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return vector
+
+        if self.directory:
+            try:
+                vector = np.load(self._path(key))
+            except (OSError, ValueError):
+                vector = None
+            if vector is not None:
+                self._store(key, vector)
+                with self._lock:
+                    self.counters["shared_hits"] += 1
+                return vector
+
+        with self._lock:
+            self.counters["misses"] += 1
+        return None
+
+    def put(self, key, vector):
+        """
+        Caches a vector in memory and, if enabled, in the shared store.
+        """
+        self._store(key, vector)
+        if not self.directory:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handle, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as vector_file:
+                np.save(vector_file, vector)
+            os.replace(temporary_path, path)
+        except OSError:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def _store(self, key, vector):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """
+        Returns the counters and current size.
+        """
+        with self._lock:
+            return {**self.counters, "size": len(self._entries), "max_entries": self.max_entries}
+
+
+class CachedEmbedder:
+    """
+    Wraps an embedder so texts already embedded are answered from an `EmbeddingCache`.
+
+    Args:
+        embedder: A `SpacyEmbedder` or `SentenceTransformerEmbedder`.
+        cache: The `EmbeddingCache` to use.
+    """
+
+    def __init__(self, embedder, cache):
+        self.embedder = embedder
+        self.cache = cache
+        self.name = embedder.name
+        self.components = embedder.components
+        self.spacy_model = embedder.spacy_model
+
+    def lookup(self, texts):
+        """
+        Returns the cached vector of each text (None on a miss) and their keys.
+        """
+        keys = [embedding_key(self.name, text) for text in texts]
+        return [self.cache.get(key) for key in keys], keys
+
+    def embed(self, texts):
+        """
+        Embeds a batch of texts, running the model only on the cache misses.
+
+        Returns:
+            A float32 array with one row per text.
+        """
+        vectors, keys = self.lookup(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            fresh = self.embedder.embed([texts[i] for i in missing])
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+                self.cache.put(keys[i], vector)
+        return _stack(vectors)
+
+
+def load_embedder(spec=EMBEDDING_MODEL, cache=None):
+    """
+    Creates the embedder a spec names, wrapped with a cache.
+
+    Args:
+        spec: See the module docstring.
+        cache: The `EmbeddingCache` to use; a new one by default.
+
+    Returns:
+        A `CachedEmbedder`.
+    """
+    if spec.startswith(SENTENCE_TRANSFORMERS_PREFIX):
+        embedder = SentenceTransformerEmbedder(spec[len(SENTENCE_TRANSFORMERS_PREFIX):])
+    elif spec.startswith(SPACY_PREFIX):
+        embedder = SpacyEmbedder(spec[len(SPACY_PREFIX):])
+    else:
+        embedder = SpacyEmbedder(spec)
+    return CachedEmbedder(embedder, cache if cache is not None else EmbeddingCache())
+
+
+_embedders = {}
+_embedders_lock = threading.Lock()
+
+
+def get_embedder(spec=EMBEDDING_MODEL):
+    """
+    Returns the process-wide embedder for a spec, loading it on first use.
+    """
+    embedder = _embedders.get(spec)
+    if embedder is None:
+        with _embedders_lock:
+            embedder = _embedders.get(spec)
+            if embedder is None:
+                embedder = _embedders[spec] = load_embedder(spec)
+    return embedder
+
+
+def analyze_texts(texts, components=(), spec=EMBEDDING_MODEL, batch_size=EMBEDDER_BATCH_SIZE):
+    """
+    Parses texts once for their terms and embeds them with the configured embedder.
+
+    Replaces `analyze_batch` wherever a vector is needed. Cached texts skip
+    the embedding: with spaCy, texts that need no other component only run
+    the tokenizer; with sentence-transformers only the misses are embedded,
+    from the raw text.
+
+    Args:
+        texts: Raw texts of job descriptions or resumes.
+        components: Extra spaCy components to run, e.g. `ENTITY_COMPONENTS`.
+        spec: The embedder spec.
+        batch_size: Number of texts each spaCy component processes at once.
+
+    Returns:
+        A list of `summarize` dictionaries whose `vector` comes from the embedder.
+    """
+    texts = list(texts)
+    return analyze_docs(texts, tokenize_batch(texts, get_embedder(spec).spacy_model), components, spec, batch_size)
+
+
+def analyze_docs(texts, docs, components=(), spec=EMBEDDING_MODEL, batch_size=EMBEDDER_BATCH_SIZE):
+    """
+    `analyze_texts` for texts already tokenized with `tokenize_batch`.
+
+    Args:
+        texts: The raw texts.
+        docs: Their Docs, tokenized with the embedder's `spacy_model`.
+        components: Extra spaCy components to run.
+        spec: The embedder spec.
+        batch_size: Number of texts each spaCy component processes at once.
+
+    Returns:
+        A list of `summarize` dictionaries whose `vector` comes from the embedder.
+    """
+    embedder = get_embedder(spec)
+    vectors, keys = embedder.lookup(texts)
+
+    # Extra components run on their own: the NER of the small models has its
+    # own internal tok2vec and does not listen to the shared one. Only cache
+    # misses of the spaCy embedder also run its components, for the vector.
+    requested = tuple(components)
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    groups = [(missing, requested + tuple(embedder.components)),
+              ([i for i, vector in enumerate(vectors) if vector is not None], requested)]
+    analyses = [None] * len(texts)
+    for rows, group_components in groups:
+        if rows:
+            annotated = annotate_batch([docs[i] for i in rows], group_components, batch_size, embedder.spacy_model)
+            for i, analysis in zip(rows, annotated):
+                analyses[i] = analysis
+
+    if missing:
+        if embedder.components:
+            fresh = [analyses[i]["vector"] for i in missing]
+        else:
+            fresh = embedder.embedder.embed([texts[i] for i in missing])
+        for i, vector in zip(missing, fresh):
+            vectors[i] = vector
+            embedder.cache.put(keys[i], vector)
+    for analysis, vector in zip(analyses, vectors):
+        analysis["vector"] = np.asarray(vector, dtype=np.float32)
+    return analyses
+
+
+def analyze_text(text, components=(), spec=EMBEDDING_MODEL):
+    """
+    Single-text version of `analyze_texts`.
+    """
+    return analyze_texts([text], components, spec)[0]
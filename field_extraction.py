@@ -0,0 +1,169 @@
+"""
+Single-pass extraction of labelled fields such as "Location: ..." from job
+postings and resumes.
+
+Every label ends in a colon, so instead of one regex search per field the
+text is scanned once from colon to colon with `str.find`. At each colon
+the characters before it are compared with the labels, the value runs to
+the end of the line, and the scan stops as soon as every field is found.
+A colon followed by "//" after "http" or "https" starts a link.
+
+The first occurrence of each field wins, as with the `re.search` calls
+this replaces.
+"""
+
+_LINK_SCHEMES = ("https", "http")
+
+
+def parse_id(value):
+    """
+    Reads the leading digits of an `ID:` value, or None when there are none.
+    """
+    digits = len(value) - len(value.lstrip("0123456789"))
+    return int(value[:digits]) if digits else None
+
+
+def parse_skillset(value):
+    """
+    Splits a `Skillset:` value on commas.
+    """
+    return [skill.strip() for skill in value.split(",")]
+
+
+def _is_word_character(character):
+    return character.isalnum() or character == "_"
+
+
+class FieldExtractor:
+    """
+    Extracts a fixed set of labelled fields in one scan of the text.
+
+    Args:
+        labels: Field name -> label as written before the colon, e.g.
+            {"location": "Location"}.
+        parsers: Optional field name -> function turning the raw value into
+            the stored one; returning None keeps scanning for a later match.
+        separator: What follows the label: ": " for postings, ":" for resumes.
+        ignore_case: Match labels case-insensitively.
+        word_boundary: Require a non-word character (or the start of the
+            text) before the label, like a leading `\\b`.
+        strip: Strip whitespace around values.
+        link_field: Field receiving the first http(s) link, if any.
+    """
+
+    def __init__(self, labels, parsers=None, separator=": ", ignore_case=False, word_boundary=True,
+                 strip=False, link_field=None):
+        self.fields = list(labels) + ([link_field] if link_field else [])
+        self.parsers = parsers or {}
+        self.separator = separator
+        self.ignore_case = ignore_case
+        self.word_boundary = word_boundary
+        self.strip = strip
+        self.link_field = link_field
+        # Labels grouped by their last character, which is compared first
+        self._labels = {}
+        for field, label in labels.items():
+            label = label.lower() if ignore_case else label
+            self._labels.setdefault(label[-1], []).append((label, field))
+        self._longest = max([len(label) for label in labels.values()] + [len(_LINK_SCHEMES[0])])
+
+    def extract(self, text):
+        """
+        Returns every field of the extractor, None where it is absent.
+        """
+        fields = dict.fromkeys(self.fields)
+        if not text:
+            return fields
+        remaining = len(self.fields)
+        separator_tail = self.separator[1:]
+        colon = text.find(":")
+        while colon != -1 and remaining:
+            before = text[max(0, colon - self._longest):colon]
+            if self.ignore_case:
+                before = before.lower()
+
+            if (self.link_field and fields[self.link_field] is None
+                    and text.startswith("//", colon + 1) and before.endswith(_LINK_SCHEMES)):
+                start = colon - (5 if before.endswith("https") else 4)
+                end = colon + 3
+                while end < len(text) and not text[end].isspace():
+                    end += 1
+                if end > colon + 3:
+                    fields[self.link_field] = text[start:end]
+                    remaining -= 1
+                colon = text.find(":", colon + 1)
+                continue
+
+            candidates = self._labels.get(before[-1:]) if text.startswith(separator_tail, colon + 1) else None
+            for label, field in candidates or ():
+                if fields[field] is not None or not before.endswith(label):
+                    continue
+                label_start = colon - len(label)
+                if self.word_boundary and label_start > 0 and _is_word_character(text[label_start - 1]):
+                    continue
+                value_start = colon + len(self.separator)
+                value_end = text.find("\n", value_start)
+                value = text[value_start:value_end if value_end != -1 else len(text)]
+                if not value:
+                    continue
+                if self.strip:
+                    value = value.strip()
+                parser = self.parsers.get(field)
+                if parser is not None:
+                    value = parser(value)
+                    if value is None:
+                        continue
+                fields[field] = value
+                remaining -= 1
+            colon = text.find(":", colon + 1)
+        return fields
+
+    def extract_batch(self, texts):
+        """
+        Extracts the fields of many texts, e.g. one ingest batch.
+        """
+        extract = self.extract
+        return [extract(text) for text in texts]
+
+
+# Fields a LinkedIn job description may carry beyond what the scraper reports
+JOB_FIELDS = FieldExtractor(
+    {"id": "ID", "location": "Location", "sponsorship": "Sponsorship", "skillset": "Skillset"},
+    parsers={"id": parse_id, "skillset": parse_skillset},
+)
+
+# Standalone postings, which also carry their title and link in the text
+POSTING_FIELDS = FieldExtractor(
+    {"id": "ID", "title": "Title", "location": "Location", "sponsorship": "Sponsorship", "skillset": "Skillset"},
+    parsers={"id": parse_id, "skillset": parse_skillset},
+    link_field="link",
+)
+
+RESUME_FIELDS = FieldExtractor(
+    {"title": "Title", "work_experience": "Work Experience", "location": "Location"},
+    separator=":",
+    ignore_case=True,
+    word_boundary=False,
+    strip=True,
+)
+
+
+def extract_job_fields(description_text):
+    """
+    Extracts `id`, `location`, `sponsorship` and `skillset` from a job description.
+    """
+    return JOB_FIELDS.extract(description_text)
+
+
+def extract_posting_fields(posting_text):
+    """
+    Extracts the job fields plus `title` and `link` from a standalone posting.
+    """
+    return POSTING_FIELDS.extract(posting_text)
+
+
+def extract_resume_fields(resume_text):
+    """
+    Extracts `title`, `work_experience` and `location` from a resume.
+    """
+    return RESUME_FIELDS.extract(resume_text)
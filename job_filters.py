@@ -0,0 +1,331 @@
+"""
+Structured pre-filters for vector search.
+
+Every job document carries a small `filters` subdocument derived from its
+title, location, insights and sponsorship text:
+
+    {"title_terms": ["senior", "ios", "engineer"],
+     "location_terms": ["new york", "ny", "united states"],
+     "remote": False,
+     "experience_level": "mid-senior level",
+     "sponsorship": True,
+     "skills": ["swift", "ios"]}
+
+Searches pass a filter spec with the same keys. Atlas applies it through the
+`filter` clause of `$vectorSearch`; the index needs the paths listed by
+`atlas_index_definition`. Local indexes keep one sorted posting list of rows
+per field value and only score the rows that survive the intersection.
+
+Add the fields to existing documents with:
+
+    python job_filters.py backfill
+"""
+import argparse
+import json
+import os
+import re
+from collections import defaultdict
+import numpy as np
+from pymongo import UpdateOne
+from skill_index import SKILLS_FIELD, normalize_skills
+
+# Subdocument holding the filterable fields of a job
+FILTER_FIELD = "filters"
+
+FILTER_ROWS_FILE = "filter_rows.npy"
+FILTER_POSTINGS_FILE = "filter_postings.json"
+
+# LinkedIn seniority labels, as they appear in job insights
+EXPERIENCE_LEVELS = ("internship", "entry level", "associate", "mid-senior level", "director", "executive")
+
+# Seniority labels a candidate with a given number of years is matched with, as (min_years, levels)
+EXPERIENCE_BANDS = (
+    (10, ("mid-senior level", "director", "executive")),
+    (6, ("mid-senior level", "director")),
+    (3, ("associate", "mid-senior level")),
+    (1, ("entry level", "associate")),
+    (0, ("internship", "entry level")),
+)
+
+REMOTE_PATTERN = re.compile(r"\bremote\b", re.IGNORECASE)
+NO_SPONSORSHIP_PATTERN = re.compile(r"\b(no|not|none|unable|cannot|n/a|without)\b", re.IGNORECASE)
+SPONSORSHIP_PATTERN = re.compile(r"\b(yes|available|provided|offered|sponsor\w*|visa)\b", re.IGNORECASE)
+TERM_PATTERN = re.compile(r"[a-z0-9+#]+")
+
+
+def title_terms(title):
+    """
+    Splits a title into lowercase terms, e.g. "Sr. iOS Engineer" -> ["sr", "ios", "engineer"].
+    """
+    if not title:
+        return []
+    return list(dict.fromkeys(TERM_PATTERN.findall(title.lower())))
+
+
+def location_terms(location):
+    """
+    Splits a location into its lowercase comma-separated parts.
+    """
+    if not location:
+        return []
+    parts = (re.sub(r"\s+", " ", part).strip().lower() for part in location.split(","))
+    return list(dict.fromkeys(part for part in parts if part))
+
+
+def parse_sponsorship(text):
+    """
+    Reads free-form sponsorship text as True, False or None when unclear.
+    """
+    if not text:
+        return None
+    if NO_SPONSORSHIP_PATTERN.search(text):
+        return False
+    if SPONSORSHIP_PATTERN.search(text):
+        return True
+    return None
+
+
+def parse_experience_level(insights):
+    """
+    Returns the first LinkedIn seniority label found in the job insights.
+    """
+    for insight in insights or []:
+        lowered = str(insight).lower()
+        for level in EXPERIENCE_LEVELS:
+            if level in lowered:
+                return level
+    return None
+
+
+def experience_levels_for(years):
+    """
+    Returns the seniority labels matching a number of years of experience.
+    """
+    try:
+        years = float(re.search(r"\d+(\.\d+)?", str(years)).group(0))
+    except AttributeError:
+        return []
+    for min_years, levels in EXPERIENCE_BANDS:
+        if years >= min_years:
+            return list(levels)
+    return []
+
+
+def job_filter_fields(job_data):
+    """
+    Derives the filterable fields of a job document.
+
+    Args:
+        job_data: A job document with any of `title`, `location`, `insights`
+            and `sponsorship`.
+
+    Returns:
+        The `filters` subdocument; fields that cannot be derived are None or empty.
+    """
+    insights = job_data.get("insights") or []
+    texts = [job_data.get("location") or "", job_data.get("title") or "", *map(str, insights)]
+    return {
+        "title_terms": title_terms(job_data.get("title")),
+        "location_terms": location_terms(job_data.get("location")),
+        "remote": any(REMOTE_PATTERN.search(text) for text in texts),
+        "experience_level": parse_experience_level(insights),
+        "sponsorship": parse_sponsorship(job_data.get("sponsorship")),
+        "skills": job_data.get(SKILLS_FIELD) or [],
+    }
+
+
+def resolve_filters(requested, query):
+    """
+    Builds a filter spec from request options and the fields extracted from a resume.
+
+    Args:
+        requested: The `filters` object of a search request, or None. `title`,
+            `location`, `experience` and `skills` take a value or true to use
+            the resume's own field; `remote` and `sponsorship` take booleans.
+        query: The cached resume query with `title`, `location`,
+            `work_experience` and `skills`.
+
+    Returns:
+        A filter spec, or None when nothing is filtered.
+    """
+    if not requested:
+        return None
+    spec = {}
+    title = query.get("title") if requested.get("title") is True else requested.get("title")
+    if title:
+        spec["title_terms"] = title_terms(title)
+    location = query.get("location") if requested.get("location") is True else requested.get("location")
+    if location:
+        spec["location_terms"] = location_terms(location)[:1]
+    experience = query.get("work_experience") if requested.get("experience") is True else requested.get("experience")
+    if experience is not None and experience is not False:
+        spec["experience_levels"] = experience_levels_for(experience)
+    for field in ("remote", "sponsorship"):
+        if requested.get(field) is not None:
+            spec[field] = bool(requested[field])
+    skills = query.get("skills") if requested.get("skills") is True else requested.get("skills")
+    if skills:
+        # Jobs sharing at least one of the skills
+        spec["skills"] = normalize_skills(skills)
+    return {field: value for field, value in spec.items() if value != []} or None
+
+
+def to_atlas_filter(spec):
+    """
+    Translates a filter spec into the MQL `filter` of a `$vectorSearch` stage.
+    """
+    clauses = []
+    for term in spec.get("title_terms", []):
+        clauses.append({f"{FILTER_FIELD}.title_terms": term})
+    for term in spec.get("location_terms", []):
+        clauses.append({f"{FILTER_FIELD}.location_terms": term})
+    if "experience_levels" in spec:
+        clauses.append({f"{FILTER_FIELD}.experience_level": {"$in": spec["experience_levels"]}})
+    for field in ("remote", "sponsorship"):
+        if field in spec:
+            clauses.append({f"{FILTER_FIELD}.{field}": spec[field]})
+    if "skills" in spec:
+        clauses.append({f"{FILTER_FIELD}.skills": {"$in": spec["skills"]}})
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
+
+
+def atlas_index_definition(path="description_vector", dimensions=96):
+    """
+    Returns the Atlas vector index definition including the filter paths.
+    """
+    fields = [{"type": "vector", "path": path, "numDimensions": dimensions, "similarity": "cosine"}]
+    for name in ("title_terms", "location_terms", "remote", "experience_level", "sponsorship", "skills"):
+        fields.append({"type": "filter", "path": f"{FILTER_FIELD}.{name}"})
+    return {"fields": fields}
+
+
+def posting_keys(filter_fields):
+    """
+    Yields the posting-list keys of one job's filter fields.
+    """
+    for field, value in (filter_fields or {}).items():
+        values = value if isinstance(value, list) else [value]
+        for item in values:
+            if item is None:
+                continue
+            yield f"{field}={json.dumps(item)}"
+
+
+def spec_keys(spec):
+    """
+    Returns the filter spec as a list of clauses, each a list of keys of which any may match.
+    """
+    clauses = [[f"title_terms={json.dumps(term)}"] for term in spec.get("title_terms", [])]
+    clauses += [[f"location_terms={json.dumps(term)}"] for term in spec.get("location_terms", [])]
+    if "experience_levels" in spec:
+        clauses.append([f"experience_level={json.dumps(level)}" for level in spec["experience_levels"]])
+    for field in ("remote", "sponsorship"):
+        if field in spec:
+            clauses.append([f"{field}={json.dumps(spec[field])}"])
+    if "skills" in spec:
+        clauses.append([f"skills={json.dumps(skill)}" for skill in spec["skills"]])
+    return clauses
+
+
+class PostingsBuilder:
+    """
+    Collects the rows of every filter value while a local index is exported.
+    """
+
+    def __init__(self):
+        self._rows = defaultdict(list)
+
+    def add(self, row, filter_fields):
+        for key in posting_keys(filter_fields):
+            self._rows[key].append(row)
+
+    def write(self, directory):
+        """
+        Writes all posting lists into one int32 array plus a JSON directory of offsets.
+        """
+        offsets = {}
+        arrays = []
+        position = 0
+        for key, rows in self._rows.items():
+            offsets[key] = [position, len(rows)]
+            arrays.append(np.asarray(rows, dtype=np.int32))
+            position += len(rows)
+        rows = np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int32)
+        np.save(os.path.join(directory, FILTER_ROWS_FILE), rows)
+        with open(os.path.join(directory, FILTER_POSTINGS_FILE), "w") as postings_file:
+            json.dump(offsets, postings_file)
+
+
+class FilterPostings:
+    """
+    Sorted posting lists of a local index, used to pre-filter searches.
+
+    Args:
+        directory: A local index directory exported with filter fields.
+    """
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, FILTER_POSTINGS_FILE)) as postings_file:
+            self.offsets = json.load(postings_file)
+        self.rows = np.load(os.path.join(directory, FILTER_ROWS_FILE), mmap_mode="r")
+
+    def posting(self, key):
+        offset, length = self.offsets.get(key, (0, 0))
+        return np.asarray(self.rows[offset:offset + length])
+
+    def rows_for(self, spec):
+        """
+        Returns the sorted rows matching every clause of a filter spec.
+        """
+        result = None
+        # Intersect the shortest clauses first so the candidate set shrinks fastest
+        clauses = [[self.posting(key) for key in keys] for keys in spec_keys(spec)]
+        for postings in sorted(clauses, key=lambda postings: sum(len(posting) for posting in postings)):
+            matched = postings[0] if len(postings) == 1 else np.unique(np.concatenate(postings))
+            result = matched if result is None else np.intersect1d(result, matched, assume_unique=True)
+            if not len(result):
+                break
+        return result
+
+
+def backfill(collection, batch_size=1000):
+    """
+    Adds the filter fields to every job document that lacks them.
+
+    Returns:
+        The number of updated documents.
+    """
+    updated = 0
+    requests = []
+    projection = {"title": 1, "location": 1, "insights": 1, "sponsorship": 1, SKILLS_FIELD: 1}
+    for document in collection.find({FILTER_FIELD: {"$exists": False}}, projection, batch_size=batch_size):
+        requests.append(UpdateOne({"_id": document["_id"]}, {"$set": {FILTER_FIELD: job_filter_fields(document)}}))
+        if len(requests) >= batch_size:
+            collection.bulk_write(requests, ordered=False)
+            updated += len(requests)
+            requests = []
+    if requests:
+        collection.bulk_write(requests, ordered=False)
+        updated += len(requests)
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Structured search pre-filters")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("backfill", help="Add filter fields to stored jobs")
+    index_parser = subparsers.add_parser("atlas-index", help="Print the Atlas vector index definition")
+    index_parser.add_argument("--dimensions", type=int, default=96)
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        from database import get_collection
+        print(f"Added filter fields to {backfill(get_collection())} documents")
+    elif args.command == "atlas-index":
+        print(json.dumps(atlas_index_definition(dimensions=args.dimensions), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import os
+from bulk_writer import parse_job_id
+from field_extraction import JOB_FIELDS
+from job_filters import FILTER_FIELD, job_filter_fields
+from embedders import analyze_texts, get_embedder
+from nlp_models import get_nlp
+from skill_index import SKILLS_FIELD, job_skills
+from text_analysis import get_stop_words
+from vector_versions import LEGACY_PATH, legacy_version
+
+# Also store the raw description, so a later model change can re-embed it
+# from the full text instead of the stopword-filtered tokens
+STORE_DESCRIPTIONS = os.environ.get("STORE_DESCRIPTIONS", "0") == "1"
+
+# Raw scraper fields a job is queued with
+JOB_EVENT_FIELDS = ("title", "company", "company_link", "date", "link", "insights", "description")
+
+
+def job_event_fields(data):
+    """
+    Copies the fields of a scraper `EventData` into a plain, picklable dict.
+
+    Args:
+        data: A scraper `EventData`.
+
+    Returns:
+        A dictionary with the `JOB_EVENT_FIELDS`.
+    """
+    return {field: getattr(data, field) for field in JOB_EVENT_FIELDS}
+
+
+def load_job_models(vector_version=None):
+    """
+    Loads the embedder, the spaCy model and the stopwords once, e.g. in a vectorization worker.
+
+    Args:
+        vector_version: The vector version jobs are embedded for (see
+            `vector_versions.active_version`); defaults to the legacy field.
+    """
+    get_nlp(get_embedder((vector_version or legacy_version())["model"]).spacy_model)
+    get_stop_words()
+
+
+def vectorize_job_batch(jobs, batch_size=32, vector_version=None):
+    """
+    Turns a batch of scraped jobs into job documents with one batched spaCy pass and the version's embedder.
+
+    Only does CPU work, so it can run in a worker process; writes are left
+    to the caller, and near duplicates are expected to be dropped before a
+    job is queued.
+
+    Args:
+        jobs: Dictionaries from `job_event_fields`.
+        batch_size: Number of descriptions each spaCy component processes at once.
+        vector_version: The active vector version, whose model and field the
+            vectors are written with; defaults to the legacy field.
+
+    Returns:
+        A list of job documents in input order.
+    """
+    vector_version = vector_version or legacy_version()
+    descriptions = [job["description"] for job in jobs]
+    analyses = analyze_texts(descriptions, spec=vector_version["model"], batch_size=batch_size)
+    # Extract the labelled fields of every description in one pass each
+    fields_batch = JOB_FIELDS.extract_batch(descriptions)
+
+    return [job_document(job, additional_fields, analysis, vector_version["path"])
+            for job, analysis, additional_fields in zip(jobs, analyses, fields_batch)]
+
+
+def job_document(job, additional_fields, analysis, vector_path=LEGACY_PATH):
+    """
+    Builds the stored document of one job.
+
+    Args:
+        job: A dictionary with the `JOB_EVENT_FIELDS`.
+        additional_fields: The job's labelled fields from `JOB_FIELDS`.
+        analysis: The job's dictionary from `analyze_texts`.
+        vector_path: Field of the active vector version, e.g. `vectors.<version>`;
+            the vector is written there only, since other versions' models differ.
+
+    Returns:
+        The job document, ready for `BulkJobWriter.write`.
+    """
+    job_data = {
+        "title": job["title"],
+        "company": job["company"],
+        "company_link": job["company_link"],
+        "date": job["date"],
+        "link": job["link"],
+        "insights": job["insights"],
+        "description_length": len(job["description"]),
+        "cluster_id": parse_job_id(job["link"]),
+        **additional_fields,
+        "tokens": analysis["terms"],
+        vector_path: analysis["vector"]
+    }
+    if STORE_DESCRIPTIONS:
+        job_data["description"] = job["description"]
+    # Normalized skills and the structured fields used to pre-filter vector searches
+    job_data[SKILLS_FIELD] = job_skills(additional_fields, job["description"])
+    job_data[FILTER_FIELD] = job_filter_fields(job_data)
+    return job_data
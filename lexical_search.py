@@ -0,0 +1,570 @@
+"""
+BM25 lexical search over the stored job `tokens`, and fusion with vector search.
+
+The index is a directory of immutable segments plus a `segments.json`
+manifest. Each segment holds block-compressed posting lists: documents are
+split into blocks of `BLOCK_SIZE` postings whose doc-id gaps and term
+frequencies are varint-encoded, with the last doc id, highest term
+frequency and shortest document of each block kept uncompressed. Queries
+use MaxScore: once the running k-th best score beats what the remaining
+terms could add, those terms only score existing candidates and only the
+blocks holding them are decoded.
+
+    python lexical_search.py build --dir data/bm25_index
+    python lexical_search.py update --dir data/bm25_index
+
+`update` appends a segment with the jobs stored since the last run; the
+Flask app reloads the manifest when it changes. Jobs updated in place keep
+their `_id`, so `build` should run now and then to pick them up and merge
+the segments.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+from array import array
+from collections import Counter
+import numpy as np
+from bson import ObjectId
+from bulk_writer import job_key
+from database import RESULT_FIELDS, projection
+
+BM25_INDEX_DIR = os.environ.get("BM25_INDEX_DIR", "data/bm25_index")
+
+SEGMENTS_FILE = "segments.json"
+TERMS_FILE = "terms.json"
+BLOCKS_FILE = "blocks.npz"
+POSTINGS_FILE = "postings.bin"
+LENGTHS_FILE = "lengths.npy"
+METADATA_FILE = "metadata.json"
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Postings per compressed block; the unit of skipping
+BLOCK_SIZE = 128
+
+# Jobs per segment, which bounds the memory needed to write one
+SEGMENT_DOCS = 100000
+
+# Rank constant of reciprocal rank fusion
+RRF_K = 60
+
+# Values varint-encoded at once; bounds the temporary byte matrix
+_ENCODE_CHUNK = 1 << 20
+
+
+def encode_varints(values):
+    """
+    LEB128-encodes non-negative integers below 2**35.
+
+    Returns:
+        (data, lengths): the uint8 bytes and the byte length of every value.
+    """
+    values = np.asarray(values, dtype=np.int64)
+    lengths = np.ones(len(values), dtype=np.int64)
+    for position in range(1, 5):
+        lengths += values >= 1 << (7 * position)
+    positions = np.arange(5)
+    chunks = []
+    for start in range(0, len(values), _ENCODE_CHUNK):
+        chunk = values[start:start + _ENCODE_CHUNK, None]
+        chunk_lengths = lengths[start:start + _ENCODE_CHUNK, None]
+        data = (chunk >> (7 * positions)) & 0x7F
+        data |= np.where(positions < chunk_lengths - 1, 0x80, 0)
+        chunks.append(data[positions < chunk_lengths].astype(np.uint8))
+    return (np.concatenate(chunks) if chunks else np.empty(0, dtype=np.uint8)), lengths
+
+
+def decode_varints(data):
+    """
+    Decodes a run of LEB128 integers written by `encode_varints`.
+    """
+    data = np.asarray(data, dtype=np.uint8)
+    if not len(data):
+        return np.empty(0, dtype=np.int64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    position = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+    return np.add.reduceat((data & 0x7F).astype(np.int64) << (7 * position), starts)
+
+
+def bm25_weight(tfs, lengths, average_length):
+    """
+    The term-frequency part of BM25; multiply by the IDF for the score.
+    """
+    tfs = np.asarray(tfs, dtype=np.float32)
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * np.asarray(lengths, dtype=np.float32) / average_length)
+    return tfs * (BM25_K1 + 1) / (tfs + norm)
+
+
+class SegmentWriter:
+    """
+    Accumulates jobs in memory and writes them as one compressed segment.
+    """
+
+    def __init__(self):
+        self.vocabulary = {}
+        self.metadata = []
+        self.lengths = array("i")
+        self._terms = array("i")
+        self._docs = array("i")
+        self._tfs = array("i")
+
+    def __len__(self):
+        return len(self.metadata)
+
+    def add(self, metadata, tokens):
+        """
+        Adds one job.
+
+        Args:
+            metadata: The result document returned for the job.
+            tokens: The job's stopword-filtered tokens.
+        """
+        counts = Counter(tokens)
+        doc = len(self.metadata)
+        for term in [term for term in counts if term not in self.vocabulary]:
+            self.vocabulary[term] = len(self.vocabulary)
+        self._terms.extend(map(self.vocabulary.__getitem__, counts))
+        self._docs.extend([doc] * len(counts))
+        self._tfs.extend(counts.values())
+        self.lengths.append(len(tokens))
+        self.metadata.append(metadata)
+
+    def write(self, directory):
+        """
+        Sorts the postings by term and writes the segment files into `directory`.
+        """
+        os.makedirs(directory, exist_ok=True)
+        # Sort (term, doc, tf) packed into one int64, much faster than an argsort;
+        # frequencies above 65535 are clipped
+        count = max(len(self.metadata), 1)
+        packed = np.frombuffer(self._terms, dtype=np.int32).astype(np.int64) * count
+        packed += np.frombuffer(self._docs, dtype=np.int32)
+        packed <<= 16
+        packed |= np.minimum(np.frombuffer(self._tfs, dtype=np.int32), 0xFFFF)
+        packed.sort()
+        tfs = packed & 0xFFFF
+        packed >>= 16
+        terms, docs = np.divmod(packed, count)
+        del packed
+        lengths = np.frombuffer(self.lengths, dtype=np.int32)
+
+        total = len(terms)
+        term_starts = np.flatnonzero(np.concatenate([[True], terms[1:] != terms[:-1]])) if total else np.empty(0, int)
+        term_counts = np.diff(np.append(term_starts, total))
+        rank = np.arange(total) - np.repeat(term_starts, term_counts)
+        gaps = docs.copy()
+        gaps[1:] -= docs[:-1]
+        gaps[term_starts] = docs[term_starts]
+
+        block_counts = -(-term_counts // BLOCK_SIZE)
+        first_blocks = np.cumsum(block_counts) - block_counts
+        block = np.repeat(first_blocks, term_counts) + rank // BLOCK_SIZE
+        block_starts = np.flatnonzero(np.concatenate([[True], block[1:] != block[:-1]])) if total else block[:0]
+        block_ends = np.append(block_starts[1:], total) - 1
+
+        # Each block holds its doc-id gaps followed by its term frequencies
+        block_sizes = np.diff(np.append(block_starts, total))
+        gap_positions = np.arange(total) + np.repeat(block_starts, block_sizes)
+        values = np.empty(2 * total, dtype=np.int64)
+        values[gap_positions] = gaps
+        values[gap_positions + np.repeat(block_sizes, block_sizes)] = tfs
+        data, value_lengths = encode_varints(values)
+        block_bytes = np.bincount(np.repeat(np.arange(len(block_starts)), 2 * block_sizes),
+                                  weights=value_lengths, minlength=len(block_starts))
+        offsets = np.concatenate([[0], np.cumsum(block_bytes)]).astype(np.int64)
+
+        with open(os.path.join(directory, POSTINGS_FILE), "wb") as postings_file:
+            postings_file.write(data.tobytes())
+        np.savez(os.path.join(directory, BLOCKS_FILE),
+                 last_doc=docs[block_ends].astype(np.int32),
+                 offsets=offsets,
+                 max_tf=np.maximum.reduceat(tfs, block_starts).astype(np.int32) if total else tfs[:0],
+                 min_length=np.minimum.reduceat(lengths[docs], block_starts).astype(np.int32) if total else tfs[:0])
+        np.save(os.path.join(directory, LENGTHS_FILE), lengths)
+
+        names = list(self.vocabulary)
+        lexicon = {names[term]: [int(first), int(count), int(df)] for term, first, count, df
+                   in zip(terms[term_starts].tolist(), first_blocks.tolist(), block_counts.tolist(), term_counts.tolist())}
+        with open(os.path.join(directory, TERMS_FILE), "w") as terms_file:
+            json.dump(lexicon, terms_file)
+        with open(os.path.join(directory, METADATA_FILE), "w") as metadata_file:
+            json.dump(self.metadata, metadata_file)
+
+
+class Segment:
+    """
+    A read-only segment; the postings file is memory-mapped.
+    """
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, TERMS_FILE)) as terms_file:
+            self.terms = json.load(terms_file)
+        with open(os.path.join(directory, METADATA_FILE)) as metadata_file:
+            self.metadata = json.load(metadata_file)
+        with np.load(os.path.join(directory, BLOCKS_FILE)) as blocks:
+            self.last_doc = blocks["last_doc"]
+            self.offsets = blocks["offsets"]
+            self.max_tf = blocks["max_tf"]
+            self.min_length = blocks["min_length"]
+        self.lengths = np.load(os.path.join(directory, LENGTHS_FILE))
+        size = os.path.getsize(os.path.join(directory, POSTINGS_FILE))
+        # A plain ndarray view of the map avoids memmap's per-slice overhead
+        self.postings = (np.memmap(os.path.join(directory, POSTINGS_FILE), dtype=np.uint8, mode="r").view(np.ndarray)
+                         if size else np.empty(0, dtype=np.uint8))
+        self.live = np.ones(len(self.metadata), dtype=bool)
+
+    def decode(self, term, blocks=None):
+        """
+        Decodes the postings of a term, or only some of its blocks.
+
+        Args:
+            term: A term of this segment.
+            blocks: Sorted block numbers relative to the term's first block;
+                all blocks when None.
+
+        Returns:
+            (docs, tfs) int64 arrays, docs ascending.
+        """
+        first, count, df = self.terms[term]
+        if blocks is None:
+            blocks = np.arange(count)
+            data = self.postings[self.offsets[first]:self.offsets[first + count]]
+        else:
+            starts = self.offsets[first + blocks]
+            lengths = self.offsets[first + blocks + 1] - starts
+            # One gather over the byte ranges of all selected blocks
+            data = self.postings[np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+                                 + np.arange(lengths.sum())]
+        values = decode_varints(data)
+        sizes = np.minimum(BLOCK_SIZE, df - blocks * BLOCK_SIZE)
+        entry_starts = np.cumsum(sizes) - sizes
+        within = np.arange(sizes.sum()) - np.repeat(entry_starts, sizes)
+        gap_index = np.repeat(2 * entry_starts, sizes) + within
+        gaps = values[gap_index]
+        tfs = values[gap_index + np.repeat(sizes, sizes)]
+
+        # Gaps restart from the last doc of the previous block of the term
+        bases = np.where(blocks > 0, self.last_doc[first + blocks - 1], 0)
+        running = np.cumsum(gaps)
+        docs = running + np.repeat(bases - (running[entry_starts] - gaps[entry_starts]), sizes)
+        return docs, tfs
+
+
+class BM25Index:
+    """
+    Segmented BM25 index over job tokens.
+
+    Args:
+        directory: The index directory; an empty index is used until one is built.
+    """
+
+    def __init__(self, directory=BM25_INDEX_DIR):
+        self.directory = directory
+        self.segments = []
+        self.names = []
+        self.rows = {}
+        self.count = 0
+        self.average_length = 1.0
+        self.last_id = None
+        self._mtime = None
+        self._lock = threading.Lock()
+        self.reload()
+
+    def __len__(self):
+        return self.count
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.directory, SEGMENTS_FILE)) as manifest_file:
+                return json.load(manifest_file)
+        except FileNotFoundError:
+            return {"segments": [], "last_id": None}
+
+    def reload(self):
+        """
+        Opens the segments listed in the manifest and recomputes the corpus statistics.
+
+        A job stored more than once counts only in its newest row.
+        """
+        manifest = self._read_manifest()
+        path = os.path.join(self.directory, SEGMENTS_FILE)
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        opened = dict(zip(self.names, self.segments))
+        segments = [opened.get(name) or Segment(os.path.join(self.directory, name)) for name in manifest["segments"]]
+
+        rows = {}
+        total_length = 0
+        for number in range(len(segments) - 1, -1, -1):
+            segment = segments[number]
+            live = np.ones(len(segment.metadata), dtype=bool)
+            for row in range(len(segment.metadata) - 1, -1, -1):
+                metadata = segment.metadata[row]
+                key = job_key(metadata) or metadata["_id"]
+                if key in rows:
+                    live[row] = False
+                else:
+                    rows[key] = (number, row)
+            segment.live = live
+            total_length += int(segment.lengths[live].sum())
+
+        last_id = manifest["last_id"]
+        self.segments, self.names, self.rows = segments, list(manifest["segments"]), rows
+        self.count = len(rows)
+        self.average_length = total_length / self.count if self.count else 1.0
+        self.last_id = ObjectId(last_id) if last_id and ObjectId.is_valid(last_id) else last_id
+        self._mtime = mtime
+
+    def reload_if_changed(self):
+        """
+        Reloads when another process has written a new manifest.
+        """
+        path = os.path.join(self.directory, SEGMENTS_FILE)
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        if mtime != self._mtime and self._lock.acquire(blocking=False):
+            try:
+                self.reload()
+            finally:
+                self._lock.release()
+
+    def _write_manifest(self, names, last_id):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as manifest_file:
+            json.dump({"segments": names, "last_id": str(last_id) if last_id is not None else None}, manifest_file)
+        os.replace(temporary, os.path.join(self.directory, SEGMENTS_FILE))
+
+    def _next_name(self, names):
+        numbers = [int(name.split("-")[1]) for name in names + self.names]
+        return f"segment-{max(numbers, default=0) + 1:06d}"
+
+    def update(self, collection, rebuild=False, batch_size=1000, segment_docs=SEGMENT_DOCS):
+        """
+        Indexes the jobs stored since the last update as new segments.
+
+        Args:
+            collection: The pymongo job collection.
+            rebuild: Index every job into fresh segments and drop the old ones.
+            batch_size: Cursor batch size.
+            segment_docs: Jobs per written segment.
+
+        Returns:
+            The number of indexed jobs.
+        """
+        query = {"tokens": {"$exists": True}}
+        if self.last_id is not None and not rebuild:
+            query["_id"] = {"$gt": self.last_id}
+        cursor = collection.find(query, projection("tokens", "id", *RESULT_FIELDS),
+                                 batch_size=batch_size).sort("_id", 1)
+        return self.add_documents(cursor, rebuild, segment_docs)
+
+    def add_documents(self, documents, rebuild=False, segment_docs=SEGMENT_DOCS):
+        """
+        Indexes job documents, in `_id` order, as new segments.
+
+        Args:
+            documents: Job documents with `_id`, `tokens` and the result fields.
+            rebuild: Replace the existing segments instead of adding to them.
+            segment_docs: Jobs per written segment.
+
+        Returns:
+            The number of indexed jobs.
+        """
+        names = [] if rebuild else list(self.names)
+        last_id = None if rebuild else self.last_id
+        added = 0
+        writer = SegmentWriter()
+        for document in documents:
+            metadata = {"_id": str(document["_id"]), **{field: document.get(field) for field in RESULT_FIELDS}}
+            if document.get("id") is not None and job_key(metadata) is None:
+                metadata["id"] = document["id"]
+            writer.add(metadata, document.get("tokens") or [])
+            last_id = document["_id"]
+            added += 1
+            if len(writer) >= segment_docs:
+                names.append(self._commit_segment(writer, names, last_id, publish=not rebuild))
+                writer = SegmentWriter()
+        if len(writer):
+            names.append(self._commit_segment(writer, names, last_id, publish=not rebuild))
+
+        retired = [name for name in self.names if name not in names]
+        self._write_manifest(names, last_id)
+        for name in retired:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+        self.reload()
+        return added
+
+    def _commit_segment(self, writer, names, last_id, publish=True):
+        name = self._next_name(names)
+        writer.write(os.path.join(self.directory, name))
+        if publish:
+            # Publish every finished segment so an interrupted update resumes after it;
+            # a rebuild only swaps the manifest once all its segments exist
+            self._write_manifest(names + [name], last_id)
+        return name
+
+    def idf(self, term):
+        # Document frequencies still count replaced rows until the next build
+        df = min(sum(segment.terms[term][2] for segment in self.segments if term in segment.terms), self.count)
+        return float(np.log1p((self.count - df + 0.5) / (df + 0.5))) if df else 0.0
+
+    def search(self, terms, limit=10, keys=None, prune=True):
+        """
+        Returns the best BM25 matches of a bag of query terms.
+
+        Args:
+            terms: Query tokens, e.g. a resume's stopword-filtered tokens;
+                repeated terms count once.
+            limit: Number of results.
+            keys: Optional job keys (see `bulk_writer.job_key`) the results
+                are restricted to.
+            prune: Use MaxScore early termination; False scores every
+                posting, which gives the same results more slowly.
+
+        Returns:
+            Result documents with `_id`, `title`, `link` and `bm25_score`, best first.
+        """
+        segments, rows = self.segments, self.rows
+        terms = list(dict.fromkeys(terms))
+        idf = {term: self.idf(term) for term in terms}
+        allowed = None
+        if keys is not None:
+            allowed = [[] for _ in segments]
+            for key in keys:
+                if key in rows:
+                    allowed[rows[key][0]].append(rows[key][1])
+
+        found = []
+        threshold = 0.0
+        for number, segment in enumerate(segments):
+            candidates = None if allowed is None else np.array(sorted(allowed[number]), dtype=np.int64)
+            if candidates is not None and not len(candidates):
+                continue
+            docs, scores = self._search_segment(segment, terms, idf, limit, threshold, candidates, prune)
+            found += [(score, number, doc) for score, doc in zip(scores.tolist(), docs.tolist())]
+            found = sorted(found, reverse=True)[:limit]
+            if len(found) == limit:
+                threshold = found[-1][0]
+        return [{**segments[number].metadata[doc], "bm25_score": score} for score, number, doc in found if score > 0]
+
+    def _search_segment(self, segment, terms, idf, limit, threshold, candidates, prune):
+        entries = []
+        for term in terms:
+            if term in segment.terms and idf[term] > 0:
+                first, count, _ = segment.terms[term]
+                bounds = idf[term] * bm25_weight(segment.max_tf[first:first + count],
+                                                 segment.min_length[first:first + count], self.average_length)
+                entries.append((float(bounds.max()), term, first, count))
+        # Highest possible contribution first; `remaining[i]` bounds what terms i.. can still add
+        entries.sort(reverse=True)
+        remaining = np.cumsum([entry[0] for entry in entries][::-1])[::-1]
+
+        # Essential terms accumulate into a dense score array; the first
+        # non-essential term switches to the sparse candidate list
+        dense = None
+        if candidates is None:
+            dense = np.zeros(len(segment.lengths), dtype=np.float32)
+            touched = np.zeros(len(segment.lengths), dtype=bool)
+            # The current top k; only its members and newly scored jobs can form the next one
+            leaders = np.empty(0, dtype=np.int64)
+            is_leader = np.zeros(len(segment.lengths), dtype=bool)
+        else:
+            docs, scores = candidates, np.zeros(len(candidates), dtype=np.float32)
+        for i, (_, term, first, count) in enumerate(entries):
+            if dense is not None and (not prune or remaining[i] > threshold):
+                # Essential term: a job matching only the remaining terms could still make the top k
+                term_docs, tfs = segment.decode(term)
+                live = segment.live[term_docs]
+                term_docs = term_docs[live]
+                dense[term_docs] += idf[term] * bm25_weight(tfs[live], segment.lengths[term_docs],
+                                                            self.average_length)
+                touched[term_docs] = True
+                pool = np.concatenate([leaders, term_docs[~is_leader[term_docs]]])
+                if len(pool) > limit:
+                    pool = pool[np.argpartition(-dense[pool], limit - 1)[:limit]]
+                    threshold = max(threshold, float(dense[pool].min()))
+                is_leader[leaders] = False
+                is_leader[pool] = True
+                leaders = pool
+                continue
+            if dense is not None:
+                docs = np.flatnonzero(touched)
+                scores, dense = dense[docs], None
+            # Only existing candidates that can still reach the threshold are scored,
+            # and only the blocks that may contain them are decoded
+            if prune:
+                keep = scores + remaining[i] > threshold
+                docs, scores = docs[keep], scores[keep]
+            if not len(docs):
+                break
+            blocks = np.searchsorted(segment.last_doc[first:first + count], docs)
+            blocks = np.unique(blocks[blocks < count])
+            if not len(blocks):
+                continue
+            term_docs, tfs = segment.decode(term, blocks)
+            positions = np.minimum(np.searchsorted(term_docs, docs), len(term_docs) - 1)
+            hit = term_docs[positions] == docs
+            scores[hit] += idf[term] * bm25_weight(tfs[positions[hit]], segment.lengths[docs[hit]],
+                                                   self.average_length)
+            if len(scores) >= limit:
+                threshold = max(threshold, float(np.partition(scores, len(scores) - limit)[len(scores) - limit]))
+
+        if dense is not None:
+            docs = np.flatnonzero(touched)
+            scores = dense[docs]
+        if candidates is not None:
+            live = segment.live[docs]
+            docs, scores = docs[live], scores[live]
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            docs, scores = docs[top], scores[top]
+        return docs, scores
+
+
+def reciprocal_rank_fusion(result_lists, limit=10, k=RRF_K):
+    """
+    Merges ranked result lists by reciprocal rank fusion.
+
+    Every result scores sum(1 / (k + rank)) over the lists it appears in;
+    results are matched on their job key. Fields from all lists are kept,
+    so a job found by both searches carries its `score` and `bm25_score`.
+
+    Args:
+        result_lists: Lists of result documents, each best first.
+        limit: Number of fused results.
+        k: Rank constant; larger values flatten the head of each list.
+
+    Returns:
+        The fused results with an `rrf_score`, best first.
+    """
+    fused = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, 1):
+            key = job_key(result) or result.get("_id")
+            entry = fused.setdefault(key, {"rrf_score": 0.0})
+            entry.update({field: value for field, value in result.items() if field not in entry})
+            entry["rrf_score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda result: result["rrf_score"], reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BM25 lexical index over job tokens")
+    parser.add_argument("command", choices=["build", "update"],
+                        help="build: index every job from scratch; update: add jobs stored since the last run")
+    parser.add_argument("--dir", default=BM25_INDEX_DIR, help="Index directory")
+    parser.add_argument("--segment-docs", type=int, default=SEGMENT_DOCS)
+    args = parser.parse_args()
+
+    from database import get_collection
+    index = BM25Index(args.dir)
+    added = index.update(get_collection(), rebuild=args.command == "build", segment_docs=args.segment_docs)
+    print(f"Indexed {added} jobs; {len(index)} jobs in {len(index.segments)} segments")
+
+
+if __name__ == "__main__":
+    main()
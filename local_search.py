@@ -0,0 +1,363 @@
+"""
+Local exact vector search over a memory-mapped float32 matrix.
+
+Export the stored job vectors once, then search them without Atlas:
+
+    python local_search.py export --dir data/local_index
+    SEARCH_BACKEND=local python user_profile_vectorization.py
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import uuid
+import numpy as np
+from database import RESULT_FIELDS, projection
+from job_filters import FILTER_FIELD, FILTER_POSTINGS_FILE, FilterPostings, PostingsBuilder
+from vector_storage import decode_vector, field_value
+
+VECTORS_FILE = "vectors.f32"
+METADATA_FILE = "metadata.json"
+MANIFEST_FILE = "manifest.json"
+# Names the subdirectory of an index directory holding its current export
+CURRENT_FILE = "CURRENT"
+EXPORT_PREFIX = "export-"
+
+# Rows scored per matrix product; bounds the temporary score matrix
+DEFAULT_BLOCK_ROWS = 65536
+
+
+def normalize_rows(matrix):
+    """
+    Scales each row to unit length, leaving all-zero rows untouched.
+
+    Args:
+        matrix: A 2-D float array.
+
+    Returns:
+        A float32 array of the same shape.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def cosine_to_score(similarity):
+    """
+    Maps cosine similarity to Atlas' `vectorSearchScore` range of [0, 1].
+    """
+    return (1.0 + similarity) / 2.0
+
+
+def export_index(collection, directory, path="description_vector", batch_size=10000, query=None):
+    """
+    Streams every job vector from MongoDB into a local index directory.
+
+    Rows are normalized before they are written, so a query only needs one
+    matrix product. Vectors may be stored as arrays or as float32 binary.
+    Documents whose vector is missing or has the wrong dimension are skipped.
+    Posting lists of the `filters` subdocument are written alongside.
+
+    Each export is written into its own subdirectory, and `CURRENT_FILE` is
+    then swapped to point at it with `os.replace`. Vectors, metadata,
+    postings and manifest therefore change together, and an index opened
+    earlier keeps reading the export it opened. The export before the
+    current one is kept for indexes that are being opened during the swap;
+    older ones are removed.
+
+    Args:
+        collection: The pymongo job collection.
+        directory: Output directory; created if needed.
+        path: Field holding the vectors.
+        batch_size: Number of vectors normalized and written at once.
+        query: Optional extra filter on the exported documents.
+
+    Returns:
+        The number of exported vectors.
+    """
+    os.makedirs(directory, exist_ok=True)
+    previous = os.path.basename(export_directory(directory))
+    staging = tempfile.mkdtemp(dir=directory, prefix=EXPORT_PREFIX)
+    try:
+        count = _export_files(collection, staging, path, batch_size, query)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    name = os.path.basename(staging)
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as current_file:
+        current_file.write(name)
+    os.replace(temporary, os.path.join(directory, CURRENT_FILE))
+    for old_name in os.listdir(directory):
+        if old_name.startswith(EXPORT_PREFIX) and old_name not in (name, previous):
+            shutil.rmtree(os.path.join(directory, old_name), ignore_errors=True)
+    return count
+
+
+def export_directory(directory):
+    """
+    Returns the directory holding the files of an index's current export.
+
+    Directories without a `CURRENT_FILE`, such as ones filled by
+    `write_manifest` directly or exported before exports got their own
+    subdirectory, hold the files themselves.
+    """
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as current_file:
+            name = current_file.read().strip()
+    except FileNotFoundError:
+        return directory
+    return os.path.join(directory, name)
+
+
+def _export_files(collection, directory, path, batch_size, query):
+    query = {**(query or {}), path: {"$exists": True}}
+    cursor = collection.find(query, projection(path, FILTER_FIELD, *RESULT_FIELDS), batch_size=batch_size)
+
+    postings = PostingsBuilder()
+    metadata = []
+    pending = []
+    dimension = None
+    with open(os.path.join(directory, VECTORS_FILE), "wb") as vectors_file:
+        for document in cursor:
+            vector = decode_vector(field_value(document, path))
+            if vector is None or not len(vector):
+                continue
+            if dimension is None:
+                dimension = len(vector)
+            if len(vector) != dimension:
+                continue
+            pending.append(vector)
+            postings.add(len(metadata), document.get(FILTER_FIELD))
+            metadata.append({"_id": str(document["_id"]), **{field: document.get(field) for field in RESULT_FIELDS}})
+            if len(pending) >= batch_size:
+                vectors_file.write(normalize_rows(pending).tobytes())
+                pending = []
+        if pending:
+            vectors_file.write(normalize_rows(pending).tobytes())
+
+    postings.write(directory)
+    write_manifest(directory, len(metadata), dimension or 0, metadata, path)
+    return len(metadata)
+
+
+def write_manifest(directory, count, dimension, metadata, path="description_vector"):
+    """
+    Writes the metadata and manifest files that complete an index directory.
+
+    Args:
+        directory: The index directory; `VECTORS_FILE` must already hold
+            `count` normalized rows.
+        count: Number of vectors.
+        dimension: Vector dimension.
+        metadata: One result document per row, or an empty list when the
+            index is only used through `search_rows`.
+        path: Field the vectors were read from.
+
+    Every call stamps a new `export_id`, which indexes built on top of the
+    export (IVF lists, codes) record so they can tell when they are stale.
+    """
+    with open(os.path.join(directory, METADATA_FILE), "w") as metadata_file:
+        json.dump(metadata, metadata_file)
+    with open(os.path.join(directory, MANIFEST_FILE), "w") as manifest_file:
+        json.dump({"count": count, "dimension": dimension, "path": path, "export_id": uuid.uuid4().hex},
+                  manifest_file)
+
+
+def load_manifest(directory):
+    """
+    Reads the manifest of an index directory.
+    """
+    with open(os.path.join(directory, MANIFEST_FILE)) as manifest_file:
+        return json.load(manifest_file)
+
+
+def open_vectors(directory, manifest):
+    """
+    Memory-maps the normalized vectors of an index directory.
+    """
+    if not manifest["count"]:
+        return np.empty((0, manifest["dimension"]), dtype=np.float32)
+    return np.memmap(os.path.join(directory, VECTORS_FILE), dtype=np.float32,
+                     mode="r", shape=(manifest["count"], manifest["dimension"]))
+
+
+def top_k(scores, k):
+    """
+    Returns the indices of the k highest scores of each row, best first.
+
+    Args:
+        scores: A 2-D array of scores.
+        k: Number of indices per row.
+
+    Returns:
+        A 2-D int array with min(k, scores.shape[1]) columns.
+    """
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+class LocalVectorIndex:
+    """
+    Exact cosine search over an exported index directory.
+
+    The vector file is memory-mapped, so startup is instant and only the
+    pages that are scored are read from disk. Result metadata and filter
+    posting lists are loaded up front, so every file comes from the export
+    that was current when the index was opened.
+
+    Args:
+        directory: Directory written by `export_index`.
+        block_rows: Number of rows scored per matrix product.
+    """
+
+    def __init__(self, directory, block_rows=DEFAULT_BLOCK_ROWS):
+        directory = export_directory(directory)
+        manifest = load_manifest(directory)
+        self.directory = directory
+        self.count = manifest["count"]
+        self.dimension = manifest["dimension"]
+        # Field the vectors were exported from, and so the embedding model they belong to
+        self.path = manifest.get("path", "description_vector")
+        # Changes with every export; None for directories exported before it was stamped
+        self.export_id = manifest.get("export_id")
+        self.block_rows = block_rows
+        self.vectors = open_vectors(directory, manifest)
+        with open(os.path.join(directory, METADATA_FILE)) as metadata_file:
+            self.metadata = json.load(metadata_file)
+        has_postings = os.path.exists(os.path.join(directory, FILTER_POSTINGS_FILE))
+        self._postings = FilterPostings(directory) if has_postings else None
+
+    @property
+    def postings(self):
+        if self._postings is None:
+            raise ValueError(f"Index in {self.directory} has no filter postings; export it again")
+        return self._postings
+
+    def search_rows(self, query_vectors, limit=10):
+        """
+        Finds the best-matching rows for a batch of queries.
+
+        Args:
+            query_vectors: A 2-D array with one query per row.
+            limit: Number of rows returned per query.
+
+        Returns:
+            A (rows, similarities) pair of 2-D arrays, best match first.
+        """
+        return self.scan(query_vectors, limit)
+
+    def scan(self, query_vectors, limit=10, rows=None):
+        """
+        Scores queries exactly against every row, or only against `rows`.
+
+        Args:
+            query_vectors: A 2-D array with one query per row.
+            limit: Number of rows returned per query.
+            rows: Optional sorted array of candidate rows, e.g. from a filter.
+
+        Returns:
+            A (rows, similarities) pair of 2-D arrays, best match first.
+        """
+        queries = normalize_rows(np.atleast_2d(query_vectors))
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+
+        total = self.count if rows is None else len(rows)
+        for start in range(0, total, self.block_rows):
+            if rows is None:
+                block_rows = np.arange(start, min(start + self.block_rows, total))
+                block = self.vectors[start:start + self.block_rows]
+            else:
+                block_rows = rows[start:start + self.block_rows]
+                block = self.vectors[block_rows]
+            scores = queries @ block.T
+            keep = top_k(scores, limit)
+
+            # Merge this block's winners into the running top-k
+            merged_scores = np.hstack([best_scores, np.take_along_axis(scores, keep, axis=1)])
+            merged_rows = np.hstack([best_rows, block_rows[keep]])
+            keep = top_k(merged_scores, limit)
+            best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+            best_rows = np.take_along_axis(merged_rows, keep, axis=1)
+
+        return best_rows, best_scores
+
+    def to_results(self, rows, similarities):
+        """
+        Turns matched rows into result documents shaped like the Atlas output.
+        """
+        return [
+            {**self.metadata[row], "score": float(cosine_to_score(similarity))}
+            for row, similarity in zip(rows.tolist(), similarities.tolist())
+        ]
+
+    def search(self, query_vector, num_candidates=100, limit=10, filters=None):
+        """
+        Searches one query vector.
+
+        Args:
+            query_vector: The query embedding.
+            num_candidates: Accepted for interface parity with Atlas; exact
+                search always considers every vector.
+            limit: Number of results.
+            filters: Optional filter spec; see `job_filters`.
+
+        Returns:
+            A list of result dictionaries with `_id`, `title`, `link` and `score`.
+        """
+        return self.search_batch([query_vector], num_candidates, limit, filters)[0]
+
+    def search_batch(self, query_vectors, num_candidates=100, limit=10, filters=None):
+        """
+        Searches several query vectors with shared matrix products.
+
+        With `filters`, only the rows in the intersected posting lists are
+        scored, exactly, whatever kind of index this is.
+
+        Args:
+            query_vectors: A sequence or 2-D array of query embeddings.
+            num_candidates: Accepted for interface parity with Atlas.
+            limit: Number of results per query.
+            filters: Optional filter spec; see `job_filters`.
+
+        Returns:
+            One result list per query, in input order.
+        """
+        if filters:
+            rows, similarities = self.scan(query_vectors, limit, self.postings.rows_for(filters))
+        else:
+            rows, similarities = self.search_rows(query_vectors, limit)
+        return [self.to_results(r, s) for r, s in zip(rows, similarities)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local exact vector search index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Export description vectors from MongoDB")
+    export_parser.add_argument("--dir", default="data/local_index", help="Index directory")
+    export_parser.add_argument("--batch-size", type=int, default=10000)
+    export_parser.add_argument("--path", default=None,
+                               help="Vector field, e.g. vectors.<version> (default: the active vector version)")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        from database import get_collection
+        from vector_versions import active_version
+        collection = get_collection()
+        path = args.path or active_version(collection)["path"]
+        count = export_index(collection, args.dir, path=path, batch_size=args.batch_size)
+        print(f"Exported {count} vectors from {path} to {args.dir}")
+
+
+if __name__ == "__main__":
+    main()
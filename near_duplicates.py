@@ -0,0 +1,203 @@
+import zlib
+import numpy as np
+from pymongo.errors import PyMongoError
+from bulk_writer import JOB_KEY_FIELD
+
+# Field holding each canonical job's MinHash signature
+SIGNATURE_FIELD = "minhash"
+
+
+def shingles(terms, size=3):
+    """
+    Builds the set of word shingles of a term list.
+
+    Args:
+        terms: The stopword-filtered terms of a document.
+        size: Number of consecutive terms per shingle.
+
+    Returns:
+        A set of shingle strings. Documents shorter than `size` yield a
+        single shingle of all their terms.
+    """
+    if len(terms) < size:
+        return {" ".join(terms)} if terms else set()
+    return {" ".join(terms[i:i + size]) for i in range(len(terms) - size + 1)}
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures with a fixed multiply-shift hash family.
+
+    Signatures only depend on `num_perm` and `seed`, so they stay comparable
+    across processes and can be stored alongside the jobs.
+
+    Args:
+        num_perm: Number of hash functions, i.e. the signature length.
+        seed: Seed of the hash family.
+    """
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        # Odd multipliers keep the multiply-shift family universal
+        self._a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    def signature(self, terms):
+        """
+        Returns the MinHash signature of a term list.
+
+        Args:
+            terms: The stopword-filtered terms of a document.
+
+        Returns:
+            A uint32 array of length `num_perm`, or None for an empty document.
+        """
+        shingle_set = shingles(terms)
+        if not shingle_set:
+            return None
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingle_set),
+                             dtype=np.uint64, count=len(shingle_set))
+        # uint64 arithmetic wraps, which is exactly what multiply-shift hashing wants
+        with np.errstate(over="ignore"):
+            permuted = (hashes[:, None] * self._a + self._b) >> np.uint64(32)
+        return permuted.min(axis=0).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """
+    Locality-sensitive hash index of MinHash signatures.
+
+    Signatures are split into `bands` bands; two jobs become candidates when
+    any band matches exactly, and a candidate counts as a near duplicate when
+    the fraction of equal signature positions reaches `threshold`.
+
+    Args:
+        threshold: Minimum estimated Jaccard similarity of a near duplicate.
+        num_perm: Signature length.
+        bands: Number of LSH bands; must divide `num_perm`.
+    """
+
+    def __init__(self, threshold=0.85, num_perm=64, bands=8):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = {}
+        self.checked = 0
+        self.duplicates = 0
+
+    @classmethod
+    def from_collection(cls, collection, **kwargs):
+        """
+        Rebuilds the index from the signatures stored on canonical jobs.
+
+        Args:
+            collection: The pymongo job collection.
+            **kwargs: Passed to the constructor.
+
+        Returns:
+            A NearDuplicateIndex instance.
+        """
+        index = cls(**kwargs)
+        cursor = collection.find({SIGNATURE_FIELD: {"$type": "binData"}, JOB_KEY_FIELD: {"$exists": True}},
+                                 {JOB_KEY_FIELD: 1, SIGNATURE_FIELD: 1, "_id": 0})
+        for document in cursor:
+            signature = np.frombuffer(document[SIGNATURE_FIELD], dtype="<u4")
+            if len(signature) == index.hasher.num_perm:
+                index.add(document[JOB_KEY_FIELD], signature)
+        return index
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, job_id, signature):
+        """
+        Adds a canonical job to the index.
+
+        Args:
+            job_id: The job key.
+            signature: The job's MinHash signature.
+        """
+        self._signatures[job_id] = signature
+        for band, key in self._band_keys(signature):
+            self._buckets[band].setdefault(key, []).append(job_id)
+
+    def query(self, signature):
+        """
+        Finds the most similar indexed job above the threshold.
+
+        Args:
+            signature: A MinHash signature.
+
+        Returns:
+            A (job_id, similarity) pair, or None if there is no near duplicate.
+        """
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(key, ()))
+
+        best = None
+        for job_id in candidates:
+            similarity = float(np.mean(self._signatures[job_id] == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (job_id, similarity)
+        return best
+
+    def check_and_add(self, job_id, terms):
+        """
+        Looks a job up and indexes it as canonical if it is not a near duplicate.
+
+        Args:
+            job_id: The job key, or None if the posting has none.
+            terms: The stopword-filtered terms of the job description.
+
+        Returns:
+            A (cluster_id, signature) pair. `cluster_id` is the key of the
+            canonical job this one duplicates, or None if it is new.
+            `signature` is None for empty descriptions.
+        """
+        self.checked += 1
+        signature = self.hasher.signature(terms)
+        if signature is None:
+            return None, None
+
+        match = self.query(signature)
+        if match is not None:
+            self.duplicates += 1
+            return match[0], signature
+
+        if job_id is not None:
+            self.add(job_id, signature)
+        return None, signature
+
+    def duplicate_rate(self):
+        """
+        Returns the fraction of checked jobs that were near duplicates.
+        """
+        return self.duplicates / self.checked if self.checked else 0.0
+
+    def __len__(self):
+        return len(self._signatures)
+
+
+def load_near_duplicates(collection, **kwargs):
+    """
+    Rebuilds the near-duplicate index from MongoDB, starting empty on failure.
+
+    Args:
+        collection: The pymongo job collection.
+        **kwargs: Passed to the NearDuplicateIndex constructor.
+
+    Returns:
+        A NearDuplicateIndex instance.
+    """
+    try:
+        return NearDuplicateIndex.from_collection(collection, **kwargs)
+    except PyMongoError as e:
+        print(f"Error loading MinHash signatures from MongoDB: {e}")
+        return NearDuplicateIndex(**kwargs)
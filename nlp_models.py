@@ -0,0 +1,162 @@
+import os
+import threading
+
+# Default spaCy pipeline used by the vectorizers and the search service
+DEFAULT_MODEL = "en_core_web_sm"
+
+# Local directory of saved pipelines; a model found here as <name>/ is loaded
+# from disk, otherwise the installed package of that name is used
+SPACY_MODEL_DIR = os.environ.get("SPACY_MODEL_DIR", "data/spacy_models")
+
+# Pipeline components each call site actually needs. `doc.vector` on the small
+# model is the average of `doc.tensor`, which is written by `tok2vec`, so the
+# vector path never needs the tagger, parser or NER.
+VECTOR_COMPONENTS = ("tok2vec",)
+ENTITY_COMPONENTS = ("ner",)
+
+# Short text used to warm up a freshly loaded model
+WARMUP_TEXT = "Software Engineer with Python and MongoDB experience in New York."
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def model_path(model_name):
+    """
+    Returns where a model is loaded from: its directory under `SPACY_MODEL_DIR`
+    if there is one, otherwise the model name itself.
+    """
+    local_path = os.path.join(SPACY_MODEL_DIR, model_name)
+    return local_path if os.path.isdir(local_path) else model_name
+
+
+def get_nlp(model_name=DEFAULT_MODEL):
+    """
+    Returns the process-wide spaCy pipeline for a model, loading it on first use.
+
+    spaCy itself is only imported here, so importing this module is cheap.
+
+    Args:
+        model_name: The name of the installed spaCy model.
+
+    Returns:
+        The loaded spaCy Language object.
+    """
+    nlp = _models.get(model_name)
+    if nlp is not None:
+        return nlp
+
+    with _models_lock:
+        # Another thread may have loaded the model while we waited
+        nlp = _models.get(model_name)
+        if nlp is None:
+            import spacy
+            nlp = spacy.load(model_path(model_name))
+            warm_up(nlp)
+            _models[model_name] = nlp
+    return nlp
+
+
+def warm_up(nlp):
+    """
+    Runs every component once so the first real request does not pay for
+    lazy allocations inside the model.
+
+    Args:
+        nlp: A loaded spaCy Language object.
+    """
+    nlp(WARMUP_TEXT)
+
+
+def select_components(nlp, components):
+    """
+    Resolves the requested component names against a pipeline.
+
+    Args:
+        nlp: A loaded spaCy Language object.
+        components: Names of the components to run, or None for all of them.
+
+    Returns:
+        A list of (name, component) pairs in pipeline order.
+    """
+    if components is None:
+        return list(nlp.pipeline)
+    return [(name, proc) for name, proc in nlp.pipeline if name in components]
+
+
+def process(text, components=None, model_name=DEFAULT_MODEL):
+    """
+    Parses a text running only the requested pipeline components.
+
+    Unlike `nlp.select_pipes`, this does not mutate the shared pipeline, so it
+    is safe to call from concurrent request threads.
+
+    Args:
+        text: The text to parse.
+        components: Names of the components to run, or None for all of them.
+        model_name: The name of the installed spaCy model.
+
+    Returns:
+        The spaCy Doc.
+    """
+    nlp = get_nlp(model_name)
+    doc = nlp.make_doc(text)
+    for _, proc in select_components(nlp, components):
+        doc = proc(doc)
+    return doc
+
+
+def make_docs(texts, model_name=DEFAULT_MODEL):
+    """
+    Tokenizes a stream of texts without running any pipeline component.
+
+    Args:
+        texts: An iterable of texts.
+        model_name: The name of the installed spaCy model.
+
+    Returns:
+        A generator of tokenized spaCy Docs.
+    """
+    nlp = get_nlp(model_name)
+    return (nlp.make_doc(text) for text in texts)
+
+
+def annotate(docs, components=None, batch_size=64, model_name=DEFAULT_MODEL):
+    """
+    Runs the requested components over a stream of tokenized Docs in batches.
+
+    Each component sees whole batches through its own `pipe` method, which is
+    much faster than calling the pipeline once per text.
+
+    Args:
+        docs: An iterable of Docs, e.g. from `make_docs`.
+        components: Names of the components to run, or None for all of them.
+        batch_size: Number of Docs each component processes at once.
+        model_name: The name of the installed spaCy model.
+
+    Returns:
+        A generator of annotated spaCy Docs in input order.
+    """
+    nlp = get_nlp(model_name)
+    for _, proc in select_components(nlp, components):
+        if hasattr(proc, "pipe"):
+            docs = proc.pipe(docs, batch_size=batch_size)
+        else:
+            docs = map(proc, docs)
+    return docs
+
+
+def pipe(texts, components=None, batch_size=64, model_name=DEFAULT_MODEL):
+    """
+    Parses a stream of texts in batches, running only the requested components.
+
+    Args:
+        texts: An iterable of texts to parse.
+        components: Names of the components to run, or None for all of them.
+        batch_size: Number of texts each component processes at once.
+        model_name: The name of the installed spaCy model.
+
+    Returns:
+        A generator of spaCy Docs in input order.
+    """
+    return annotate(make_docs(texts, model_name), components, batch_size, model_name)
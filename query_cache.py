@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+# Cache sizing; QUERY_CACHE_DIR enables the store shared between workers
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.environ.get("QUERY_CACHE_TTL", "3600"))
+QUERY_CACHE_DIR = os.environ.get("QUERY_CACHE_DIR")
+
+
+def normalize_resume_text(resume_text):
+    """
+    Normalizes whitespace so trivially different submissions share a cache entry.
+
+    Line breaks are kept because the field extraction is line based.
+
+    Args:
+        resume_text: The raw resume text.
+
+    Returns:
+        The normalized text.
+    """
+    lines = (re.sub(r"[ \t\r\f\v]+", " ", line).strip() for line in resume_text.split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def cache_key(resume_text, namespace=""):
+    """
+    Returns the cache key of a resume: the SHA-256 of its normalized text.
+
+    A namespace, such as the vector version, keeps entries computed with
+    different models apart.
+    """
+    text = normalize_resume_text(resume_text)
+    if namespace:
+        text = f"{namespace}\0{text}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SharedFileStore:
+    """
+    Cache entries stored as one .npz file each, shared by all workers on a host.
+
+    Files are written atomically and expire `ttl` seconds after they were written.
+
+    Args:
+        directory: Directory holding the entries.
+        ttl: Entry lifetime in seconds.
+    """
+
+    def __init__(self, directory, ttl):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with np.load(path) as entry:
+                return {"vector": entry["vector"], **json.loads(str(entry["fields"]))}
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key, value):
+        fields = {name: field for name, field in value.items() if name != "vector"}
+        handle, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as entry_file:
+                np.savez(entry_file, vector=value["vector"], fields=json.dumps(fields))
+            os.replace(temporary_path, self._path(key))
+        except OSError:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def prune(self):
+        """
+        Deletes expired entries.
+
+        Returns:
+            The number of deleted files.
+        """
+        removed = 0
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+class QueryCache:
+    """
+    Bounded LRU cache with TTL for resume query vectors and extracted fields.
+
+    Entries live in process memory; with `shared_dir` set, misses fall
+    through to a file store that all workers on the host share.
+
+    Args:
+        max_entries: Maximum number of in-memory entries.
+        ttl: Entry lifetime in seconds.
+        shared_dir: Optional directory for the shared file store.
+        namespace: Mixed into every key; see `cache_key`.
+    """
+
+    def __init__(self, max_entries=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL, shared_dir=QUERY_CACHE_DIR, namespace=""):
+        self.max_entries = max_entries
+        self.namespace = namespace
+        self.ttl = ttl
+        self.shared = SharedFileStore(shared_dir, ttl) if shared_dir else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key):
+        """
+        Returns a cached value, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return value
+                del self._entries[key]
+                self.counters["expirations"] += 1
+
+        if self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self._store(key, value)
+                with self._lock:
+                    self.counters["shared_hits"] += 1
+                return value
+
+        with self._lock:
+            self.counters["misses"] += 1
+        return None
+
+    def put(self, key, value):
+        """
+        Caches a value in memory and, if enabled, in the shared store.
+        """
+        self._store(key, value)
+        if self.shared is not None:
+            self.shared.put(key, value)
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def get_or_compute(self, resume_text, compute):
+        """
+        Returns the cached value for a resume, computing and caching it on a miss.
+
+        Args:
+            resume_text: The raw resume text.
+            compute: Callable taking the resume text and returning a dictionary
+                with a `vector` array and JSON-serializable fields.
+
+        Returns:
+            The cached or freshly computed value.
+        """
+        key = cache_key(resume_text, self.namespace)
+        value = self.get(key)
+        if value is None:
+            value = compute(resume_text)
+            self.put(key, value)
+        return value
+
+    def stats(self):
+        """
+        Returns the counters and current size.
+        """
+        with self._lock:
+            return {**self.counters, "size": len(self._entries), "max_entries": self.max_entries}
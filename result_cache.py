@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+# Collection holding one generation counter document per job collection
+GENERATION_COLLECTION = "collection_generations"
+
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "4096"))
+
+# Query vectors are rounded to this step before hashing so that near-identical
+# queries share an entry; 0 keys on the exact float32 bytes
+RESULT_CACHE_STEP = float(os.environ.get("RESULT_CACHE_STEP", "0"))
+
+
+def _generation_filter(collection):
+    return {"_id": collection.name}
+
+
+def bump_generation(collection):
+    """
+    Increments the generation counter of a collection after it was written to.
+
+    Args:
+        collection: The pymongo collection that changed.
+
+    Returns:
+        The new generation.
+    """
+    document = collection.database[GENERATION_COLLECTION].find_one_and_update(
+        _generation_filter(collection),
+        {"$inc": {"generation": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return document["generation"]
+
+
+def read_generation(collection):
+    """
+    Returns the current generation counter of a collection (0 if never bumped).
+    """
+    document = collection.database[GENERATION_COLLECTION].find_one(_generation_filter(collection))
+    return document["generation"] if document else 0
+
+
+def result_key(query_vector, num_candidates, limit, filters=None, step=RESULT_CACHE_STEP):
+    """
+    Builds the cache key of a search.
+
+    Args:
+        query_vector: The normalized query embedding.
+        num_candidates: Number of nearest neighbours considered.
+        limit: Number of results.
+        filters: Optional JSON-serializable filter specification.
+        step: Quantization step for the vector; 0 uses the exact float32 values.
+
+    Returns:
+        A hex digest.
+    """
+    vector = np.asarray(query_vector, dtype=np.float32)
+    if step:
+        vector = np.rint(vector / step).astype(np.int32)
+    digest = hashlib.sha256(vector.tobytes())
+    digest.update(json.dumps([num_candidates, limit, filters], sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CachedSearch:
+    """
+    Wraps a search backend with an LRU cache of result lists.
+
+    The cache is tied to the generation counter of the job collection, which
+    `BulkJobWriter` bumps after every bulk write: when the counter moves, all
+    entries are dropped, so results are at most one ingest batch old.
+
+    Args:
+        backend: A search backend with `search` and `search_batch` methods.
+        collection: The pymongo job collection whose generation is tracked,
+            or None for static backends such as an exported local index.
+        max_entries: Maximum number of cached result lists.
+        step: Quantization step for query vectors; see `RESULT_CACHE_STEP`.
+        check_interval: Minimum seconds between generation reads; 0 reads it
+            on every search.
+    """
+
+    def __init__(self, backend, collection=None, max_entries=RESULT_CACHE_SIZE, step=RESULT_CACHE_STEP,
+                 check_interval=0.0):
+        self.backend = backend
+        self.collection = collection
+        self.max_entries = max_entries
+        self.step = step
+        self.check_interval = check_interval
+
+        self.generation = None
+        self._checked_at = 0.0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def _sync_generation(self):
+        if self.collection is None:
+            return
+        now = time.monotonic()
+        if self.generation is not None and now - self._checked_at < self.check_interval:
+            return
+        try:
+            generation = read_generation(self.collection)
+        except PyMongoError as e:
+            # Without the counter the cache cannot be trusted
+            print(f"Error reading collection generation: {e}")
+            generation = None
+        with self._lock:
+            self._checked_at = now
+            if generation is None or generation != self.generation:
+                if self._entries:
+                    self.counters["invalidations"] += 1
+                self._entries.clear()
+                self.generation = generation
+
+    def search(self, query_vector, num_candidates=100, limit=10, filters=None):
+        """
+        Searches one query vector, answering from the cache when possible.
+
+        Returns:
+            A list of result dictionaries; callers get their own copies.
+        """
+        return self.search_batch([query_vector], num_candidates, limit, filters)[0]
+
+    def search_batch(self, query_vectors, num_candidates=100, limit=10, filters=None):
+        """
+        Searches several query vectors; the cache misses go to the backend in one `search_batch` call.
+
+        Returns:
+            One result list per query, in input order.
+        """
+        self._sync_generation()
+        keys = [result_key(query_vector, num_candidates, limit, filters, self.step) for query_vector in query_vectors]
+        answers = [None] * len(keys)
+        with self._lock:
+            for i, key in enumerate(keys):
+                results = self._entries.get(key)
+                if results is not None:
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    answers[i] = [dict(result) for result in results]
+                else:
+                    self.counters["misses"] += 1
+            generation = self.generation
+
+        missing = [i for i, answer in enumerate(answers) if answer is None]
+        if not missing:
+            return answers
+
+        vectors = [query_vectors[i] for i in missing]
+        if filters is None:
+            fresh = self.backend.search_batch(vectors, num_candidates=num_candidates, limit=limit)
+        else:
+            fresh = self.backend.search_batch(vectors, num_candidates=num_candidates, limit=limit, filters=filters)
+
+        with self._lock:
+            # Do not cache results computed against a generation that has since moved on
+            cacheable = generation == self.generation and (generation is not None or self.collection is None)
+            for i, results in zip(missing, fresh):
+                answers[i] = results
+                if cacheable:
+                    self._entries[keys[i]] = [dict(result) for result in results]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+        return answers
+
+    def stats(self):
+        """
+        Returns the counters, current size and tracked generation.
+        """
+        with self._lock:
+            return {**self.counters, "size": len(self._entries), "max_entries": self.max_entries,
+                    "generation": self.generation}
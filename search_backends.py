@@ -0,0 +1,130 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from database import RESULT_PROJECTION
+from job_filters import to_atlas_filter
+
+# Name of the Atlas Vector Search index on job_collection
+ATLAS_INDEX_NAME = "similarity_search"
+
+# Aggregations run in parallel by AtlasVectorSearch.search_batch
+ATLAS_BATCH_CONCURRENCY = int(os.environ.get("ATLAS_BATCH_CONCURRENCY", "8"))
+
+# Which backend answers searches: "atlas", "local" (exact), "ivf" (approximate)
+# or "sq8" / "pq" (quantized codes with float32 re-ranking)
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "atlas")
+LOCAL_INDEX_DIR = os.environ.get("LOCAL_INDEX_DIR", "data/local_index")
+
+
+class AtlasVectorSearch:
+    """
+    Vector search through the Atlas `$vectorSearch` aggregation stage.
+
+    Args:
+        collection: The pymongo job collection.
+        index: Name of the Atlas vector index.
+        path: Field holding the vectors.
+    """
+
+    def __init__(self, collection, index=ATLAS_INDEX_NAME, path="description_vector"):
+        self.collection = collection
+        self.index = index
+        self.path = path
+
+    def build_pipeline(self, query_vector, num_candidates=100, limit=10, filters=None):
+        """
+        Builds the aggregation pipeline for one query.
+
+        A filter spec becomes the `filter` clause, so Atlas pre-filters the
+        candidates before scoring them.
+        """
+        vector_search = {
+            "index": self.index,
+            "path": self.path,
+            "queryVector": list(query_vector),
+            "numCandidates": num_candidates,
+            "limit": limit
+        }
+        if filters:
+            vector_search["filter"] = to_atlas_filter(filters)
+        return [
+            {
+                "$vectorSearch": vector_search
+            },
+            {
+                # Only the result fields; never the vectors, tokens or description
+                '$project': {
+                    **RESULT_PROJECTION,
+                    'score': {
+                        '$meta': 'vectorSearchScore'
+                    }
+                }
+            }
+        ]
+
+    def search(self, query_vector, num_candidates=100, limit=10, filters=None):
+        """
+        Searches one query vector.
+
+        Args:
+            query_vector: The normalized query embedding.
+            num_candidates: Number of nearest neighbours Atlas considers.
+            limit: Number of results.
+            filters: Optional filter spec; see `job_filters`.
+
+        Returns:
+            A list of result dictionaries with `_id`, `title`, `link` and `score`.
+        """
+        results = list(self.collection.aggregate(self.build_pipeline(query_vector, num_candidates, limit, filters)))
+
+        # Convert ObjectId to string for serialization
+        for result in results:
+            if '_id' in result:
+                result['_id'] = str(result['_id'])
+        return results
+
+    def search_batch(self, query_vectors, num_candidates=100, limit=10, filters=None):
+        """
+        Searches several query vectors, running up to `ATLAS_BATCH_CONCURRENCY` aggregations at once.
+        """
+        if len(query_vectors) <= 1:
+            return [self.search(query_vector, num_candidates, limit, filters) for query_vector in query_vectors]
+        with ThreadPoolExecutor(max_workers=min(ATLAS_BATCH_CONCURRENCY, len(query_vectors))) as executor:
+            return list(executor.map(lambda query_vector: self.search(query_vector, num_candidates, limit, filters),
+                                     query_vectors))
+
+
+def get_search_backend(collection=None, name=SEARCH_BACKEND, path="description_vector"):
+    """
+    Creates the configured search backend.
+
+    Args:
+        collection: The pymongo job collection; only needed for Atlas.
+        name: "atlas", "local", "ivf", "sq8" or "pq".
+        path: Vector field of the active vector version; Atlas searches it and
+            local indexes must have been exported from it.
+
+    Returns:
+        An object with `search` and `search_batch` methods.
+
+    Raises:
+        ValueError: If a local index was exported from another vector field
+            than `path`, i.e. with another embedding model than the queries,
+            or if its IVF lists or codes were built for an earlier export.
+    """
+    if name == "atlas":
+        return AtlasVectorSearch(collection, path=path)
+    if name == "local":
+        from local_search import LocalVectorIndex
+        index = LocalVectorIndex(LOCAL_INDEX_DIR)
+    elif name == "ivf":
+        from ann_index import IVFIndex
+        index = IVFIndex(LOCAL_INDEX_DIR)
+    elif name in ("sq8", "pq"):
+        from vector_quantization import QuantizedIndex
+        index = QuantizedIndex(LOCAL_INDEX_DIR, codec=name)
+    else:
+        raise ValueError(f"Unknown search backend: {name}")
+    if index.path != path:
+        raise ValueError(f"The index in {LOCAL_INDEX_DIR} was exported from {index.path}, but searches use {path}; "
+                         f"export it again with `python local_search.py export --path {path}` and rebuild it")
+    return index
@@ -0,0 +1,186 @@
+"""
+Request coalescing for the /search endpoint.
+
+Concurrent requests are queued and embedded together in one batched spaCy
+call. Their vector lookups then run on a bounded thread pool, so slow
+database round trips overlap instead of queueing behind each other.
+
+Enable it in the Flask app and serve with a threaded server:
+
+    SEARCH_BATCHING=1 gunicorn --workers 2 --threads 32 user_profile_vectorization:app
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+SEARCH_BATCHING = os.environ.get("SEARCH_BATCHING", "0") == "1"
+SEARCH_MAX_BATCH = int(os.environ.get("SEARCH_MAX_BATCH", "16"))
+SEARCH_MAX_WAIT = float(os.environ.get("SEARCH_MAX_WAIT_MS", "5")) / 1000
+SEARCH_LOOKUP_WORKERS = int(os.environ.get("SEARCH_LOOKUP_WORKERS", "8"))
+# Longest a request waits for its batch to be embedded and looked up
+SEARCH_TIMEOUT = float(os.environ.get("SEARCH_TIMEOUT_MS", "30000")) / 1000
+
+
+class SearchCoalescer:
+    """
+    Batches embedding work across concurrent search requests.
+
+    A dispatcher thread takes up to `max_batch_size` queued requests, waiting
+    at most `max_wait` seconds after the first one arrives. It embeds them with
+    one `embed_batch` call and hands each query to the lookup pool.
+
+    Args:
+        embed_batch: Callable mapping a list of resume texts to a list of queries;
+            an exception in place of a query fails only that request.
+        lookup: Callable mapping one query and the request's lookup options to its search results.
+        max_batch_size: Maximum number of requests embedded together.
+        max_wait: Seconds a request may wait for its batch to fill.
+        lookup_workers: Number of concurrent lookups.
+    """
+
+    def __init__(self, embed_batch, lookup, max_batch_size=SEARCH_MAX_BATCH, max_wait=SEARCH_MAX_WAIT,
+                 lookup_workers=SEARCH_LOOKUP_WORKERS):
+        self.embed_batch = embed_batch
+        self.lookup = lookup
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self.totals = {"requests": 0, "batches": 0, "failed": 0}
+        self._totals_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=lookup_workers, thread_name_prefix="search-lookup")
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, resume_text, **lookup_options):
+        """
+        Queues one search request.
+
+        Args:
+            resume_text: The resume to embed.
+            **lookup_options: Passed to `lookup` with the query, e.g. `filters`.
+
+        Returns:
+            A Future resolving to a (query, results) pair.
+        """
+        if self._closed:
+            raise RuntimeError("SearchCoalescer is closed")
+        future = Future()
+        self._queue.put((resume_text, lookup_options, future))
+        return future
+
+    def search(self, resume_text, timeout=SEARCH_TIMEOUT, **lookup_options):
+        """
+        Queues one search request and waits for its (query, results) pair.
+
+        Raises:
+            TimeoutError: If the request is not answered within `timeout`
+                seconds; a request still queued is cancelled.
+        """
+        future = self.submit(resume_text, **lookup_options)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Search not answered within {timeout} s") from None
+
+    def close(self):
+        """
+        Answers the queued requests and stops the dispatcher and lookup pool.
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        """
+        Returns the totals and the mean batch size.
+        """
+        with self._totals_lock:
+            totals = dict(self.totals)
+        totals["mean_batch_size"] = totals["requests"] / totals["batches"] if totals["batches"] else 0.0
+        return totals
+
+    def _run(self):
+        batch = []
+        try:
+            stopping = False
+            while not stopping:
+                request = self._queue.get()
+                if request is None:
+                    break
+                batch = [request]
+                deadline = time.monotonic() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    try:
+                        request = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                    if request is None:
+                        stopping = True
+                        break
+                    batch.append(request)
+                self._dispatch(batch)
+                batch = []
+        except Exception as e:
+            print(f"[SEARCH] Dispatcher stopped: {e}")
+        finally:
+            # Nothing answers requests once this thread is gone
+            self._closed = True
+            self._fail_pending(batch)
+
+    def _fail_pending(self, batch):
+        futures = [future for _, _, future in batch]
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                futures.append(request[2])
+        for future in futures:
+            if not future.done():
+                future.set_exception(RuntimeError("SearchCoalescer stopped before answering"))
+
+    def _dispatch(self, batch):
+        # Skip requests whose caller timed out; the rest can no longer be cancelled
+        batch = [request for request in batch if request[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        with self._totals_lock:
+            self.totals["requests"] += len(batch)
+            self.totals["batches"] += 1
+        try:
+            queries = self.embed_batch([resume_text for resume_text, _, _ in batch])
+        except Exception as e:
+            with self._totals_lock:
+                self.totals["failed"] += len(batch)
+            print(f"[SEARCH] Error embedding batch of {len(batch)} requests: {e}")
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, lookup_options, future), query in zip(batch, queries):
+            if isinstance(query, Exception):
+                with self._totals_lock:
+                    self.totals["failed"] += 1
+                future.set_exception(query)
+                continue
+            try:
+                self._executor.submit(self._lookup, query, lookup_options, future)
+            except RuntimeError as e:
+                # The lookup pool was shut down
+                future.set_exception(e)
+
+    def _lookup(self, query, lookup_options, future):
+        try:
+            future.set_result((query, self.lookup(query, **lookup_options)))
+        except Exception as e:
+            with self._totals_lock:
+                self.totals["failed"] += 1
+            future.set_exception(e)
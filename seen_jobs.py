@@ -0,0 +1,129 @@
+import os
+import numpy as np
+from pymongo.errors import PyMongoError
+from bulk_writer import JOB_KEY_FIELD
+
+
+class SeenJobs:
+    """
+    In-memory set of job ids that are already indexed.
+
+    Membership checks are O(1) and need neither spaCy nor a database round
+    trip, so the scraper can drop known postings before vectorizing them.
+    A job id only becomes seen once its document is stored (see
+    `mark_written`); until then it is queued, which skips repeats within the
+    run but is not saved, so a job whose write failed is scraped again. The
+    set is persisted as a flat int64 array.
+
+    Args:
+        job_ids: Optional iterable of known job ids.
+    """
+
+    def __init__(self, job_ids=()):
+        self._ids = set(int(job_id) for job_id in job_ids)
+        self._queued = set()
+        self.checked = 0
+        self.skipped = 0
+
+    @classmethod
+    def from_collection(cls, collection):
+        """
+        Loads every job id stored in a collection.
+
+        Args:
+            collection: The pymongo job collection.
+
+        Returns:
+            A SeenJobs instance.
+        """
+        cursor = collection.find({JOB_KEY_FIELD: {"$exists": True}}, {JOB_KEY_FIELD: 1, "_id": 0})
+        return cls(document[JOB_KEY_FIELD] for document in cursor)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a set saved with `save`.
+
+        Args:
+            path: Path of the .npy file.
+
+        Returns:
+            A SeenJobs instance.
+        """
+        return cls(np.load(path).tolist())
+
+    def save(self, path):
+        """
+        Saves the set as a sorted int64 array.
+
+        Args:
+            path: Path of the .npy file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.save(path, np.array(sorted(self._ids), dtype=np.int64))
+
+    def check_and_add(self, job_id):
+        """
+        Records a scraped job id as queued and reports whether it was already seen or queued.
+
+        Args:
+            job_id: The job id, or None if the posting has none.
+
+        Returns:
+            True if the job should be skipped.
+        """
+        self.checked += 1
+        if job_id is None:
+            return False
+        if job_id in self._ids or job_id in self._queued:
+            self.skipped += 1
+            return True
+        self._queued.add(job_id)
+        return False
+
+    def mark_written(self, job_ids):
+        """
+        Marks job ids as seen once their documents are stored.
+
+        Used as the `on_written` callback of a `BulkJobWriter`.
+
+        Args:
+            job_ids: Iterable of job ids.
+        """
+        for job_id in job_ids:
+            self._ids.add(job_id)
+            self._queued.discard(job_id)
+
+    def skip_rate(self):
+        """
+        Returns the fraction of checked jobs that were skipped.
+        """
+        return self.skipped / self.checked if self.checked else 0.0
+
+    def __contains__(self, job_id):
+        return job_id in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+
+def load_seen_jobs(collection, path):
+    """
+    Loads the seen-job set from the collection, falling back to the saved file.
+
+    Args:
+        collection: The pymongo job collection.
+        path: Path of the .npy file written by `SeenJobs.save`.
+
+    Returns:
+        A SeenJobs instance, empty if neither source is available.
+    """
+    try:
+        return SeenJobs.from_collection(collection)
+    except PyMongoError as e:
+        print(f"Error loading seen jobs from MongoDB: {e}")
+    if os.path.exists(path):
+        return SeenJobs.load(path)
+    return SeenJobs()
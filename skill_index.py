@@ -0,0 +1,413 @@
+"""
+Normalized skills and an inverted skill index over jobs.
+
+Skills are normalized through `SKILL_ALIASES` ("ReactJS", "react.js" and
+"React" all become "react") and stored on every job as `skills` at ingest.
+`SkillIndex` keeps, per skill, a sorted int32 array of the rows of the jobs
+that list it, plus a forward array of skill ids per row. Overlap scores for
+a resume are computed from those arrays with `np.bincount` or boolean
+lookups, never with Python sets per job.
+"""
+import re
+import threading
+import numpy as np
+from pymongo.errors import PyMongoError
+from bulk_writer import job_key
+
+# Field holding the normalized skills of a job
+SKILLS_FIELD = "skills"
+
+# Alias -> canonical skill; canonical names map to themselves implicitly
+SKILL_ALIASES = {
+    "js": "javascript", "ecmascript": "javascript",
+    "ts": "typescript",
+    "py": "python", "python3": "python",
+    "golang": "go",
+    "c sharp": "c#", "csharp": "c#",
+    "cpp": "c++",
+    "nodejs": "node.js", "node": "node.js",
+    "reactjs": "react", "react.js": "react",
+    "vuejs": "vue", "vue.js": "vue",
+    "angularjs": "angular",
+    "nextjs": "next.js",
+    "expressjs": "express", "express.js": "express",
+    "django rest": "django rest framework", "drf": "django rest framework",
+    "postgres": "postgresql", "psql": "postgresql",
+    "mongo": "mongodb",
+    "k8s": "kubernetes",
+    "amazon web services": "aws",
+    "google cloud": "gcp", "google cloud platform": "gcp",
+    "microsoft azure": "azure",
+    "ml": "machine learning",
+    "dl": "deep learning",
+    "nlp": "natural language processing",
+    "tf": "tensorflow",
+    "sklearn": "scikit-learn", "scikit learn": "scikit-learn",
+    "ci/cd": "ci/cd", "cicd": "ci/cd",
+    "rest": "rest api", "restful": "rest api", "rest apis": "rest api",
+    "restful api": "rest api", "restful apis": "rest api",
+    "spring boot": "spring", "spring framework": "spring",
+    "gql": "graphql",
+    "objective c": "objective-c", "objc": "objective-c",
+    "swiftui": "swiftui",
+}
+
+# Skill names that are also ordinary words or letters ("go to market", "this
+# spring", "R&D"). In free text they only count with exactly this spelling and
+# when listed next to another skill, as in "Python, Go and R"; a Skillset
+# line or a resume SKILLS section is taken as is.
+AMBIGUOUS_SKILLS = (
+    "Go", "R", "C", "REST", "RESTful", "Spring", "Express", "Swift", "Node", "TS", "Rust", "Spark",
+    "Flask", "Rails", "Bash", "Airflow", "ML", "DL", "TF",
+)
+
+# Skills recognized anywhere in free text such as job descriptions
+KNOWN_SKILLS = sorted((set(SKILL_ALIASES) | set(SKILL_ALIASES.values()) | {
+    "python", "java", "javascript", "typescript", "go", "rust", "c", "c++", "c#", "ruby", "php", "scala",
+    "kotlin", "swift", "objective-c", "sql", "html", "css", "bash", "r", "matlab",
+    "django", "flask", "fastapi", "spring", "rails", "react", "angular", "vue", "node.js", "express",
+    "postgresql", "mysql", "mongodb", "redis", "elasticsearch", "kafka", "spark", "hadoop", "airflow",
+    "docker", "kubernetes", "terraform", "aws", "gcp", "azure", "linux", "git",
+    "pandas", "numpy", "pytorch", "tensorflow", "scikit-learn", "spacy", "machine learning",
+    "deep learning", "natural language processing", "computer vision", "graphql", "ios", "android",
+}) - {skill.lower() for skill in AMBIGUOUS_SKILLS}, key=len, reverse=True)
+
+
+def _skill_pattern(skills, flags=0):
+    # Longest alternatives first so "node.js" wins over "node"; skills ending in
+    # symbols such as "c++" cannot use a trailing \b
+    return re.compile(
+        r"(?<![\w.+#])(" + "|".join(re.escape(skill) for skill in sorted(skills, key=len, reverse=True))
+        + r")(?![\w+#&]|\.\w)",
+        flags,
+    )
+
+
+SKILL_PATTERN = _skill_pattern(KNOWN_SKILLS, re.IGNORECASE)
+AMBIGUOUS_SKILL_PATTERN = _skill_pattern(AMBIGUOUS_SKILLS)
+
+# What may separate two items of a skill list: "Python, Go", "C/C++", "Go and R"
+SKILL_LIST_SEPARATOR = re.compile(r"\s*(?:[,/;|&]\s*(?:(?:and|or)\s+)?|(?:and|or)\s+)", re.IGNORECASE)
+
+# A "SKILLS" heading line up to the next all-caps heading or the end of the text
+SKILLS_SECTION_PATTERN = re.compile(r"^[ \t]*(?i:skills)[ \t]*:?[ \t]*$(.*?)(?=^[ \t]*[A-Z][A-Z ]{3,}[ \t]*$|\Z)",
+                                    re.MULTILINE | re.DOTALL)
+
+
+def normalize_skill(skill):
+    """
+    Returns the canonical form of one skill name, or None if it is empty.
+    """
+    skill = re.sub(r"\s+", " ", skill.strip().lower()).strip(" .;")
+    if not skill:
+        return None
+    return SKILL_ALIASES.get(skill, skill)
+
+
+def normalize_skills(skills):
+    """
+    Normalizes a list of skill names, dropping empties and duplicates.
+    """
+    normalized = (normalize_skill(skill) for skill in skills or [])
+    return list(dict.fromkeys(skill for skill in normalized if skill))
+
+
+def extract_skills(text):
+    """
+    Finds known skills mentioned in a text.
+
+    Ambiguous skills (see `AMBIGUOUS_SKILLS`) are only kept when they are
+    chained to an unambiguous skill by list separators.
+    """
+    if not text:
+        return []
+    matches = sorted([(match.start(1), match.end(1), match.group(1), True) for match in SKILL_PATTERN.finditer(text)]
+                     + [(match.start(1), match.end(1), match.group(1), False)
+                        for match in AMBIGUOUS_SKILL_PATTERN.finditer(text)])
+    accepted = [certain for _, _, _, certain in matches]
+    # One pass in each direction spreads acceptance along a whole list
+    for order in (range(1, len(matches)), range(len(matches) - 2, -1, -1)):
+        for i in order:
+            j = i - 1 if order.step == 1 else i + 1
+            if accepted[i] or not accepted[j]:
+                continue
+            first, second = sorted((i, j))
+            if SKILL_LIST_SEPARATOR.fullmatch(text, matches[first][1], matches[second][0]):
+                accepted[i] = True
+    return normalize_skills(skill for (_, _, skill, _), keep in zip(matches, accepted) if keep)
+
+
+def resume_skills(resume_text):
+    """
+    Reads the skills of a resume from its SKILLS section.
+
+    Lines such as "Languages: Python, Go" are split on commas after the
+    label. Without a SKILLS section, known skills are found in the full text.
+    """
+    section = SKILLS_SECTION_PATTERN.search(resume_text or "")
+    if not section:
+        return extract_skills(resume_text)
+    skills = []
+    for line in section.group(1).splitlines():
+        items = line.split(":", 1)[-1]
+        skills.extend(item for item in re.split(r"[,;|]", items))
+    return normalize_skills(skills)
+
+
+def job_skills(job_data, description_text=None):
+    """
+    Returns the normalized skills of a job: its Skillset line plus known skills in the description.
+    """
+    return normalize_skills((job_data.get("skillset") or []) + extract_skills(description_text))
+
+
+class _GrowableArray:
+    """
+    Append-only NumPy array with amortized O(1) appends.
+    """
+
+    def __init__(self, dtype, capacity=16):
+        self._data = np.empty(capacity, dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self._data.dtype)
+        needed = self._size + len(values)
+        if needed > len(self._data):
+            grown = np.empty(max(needed, 2 * len(self._data)), dtype=self._data.dtype)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+        self._data[self._size:needed] = values
+        self._size = needed
+
+    def append(self, value):
+        if self._size == len(self._data):
+            self._data = np.concatenate([self._data, np.empty(len(self._data), dtype=self._data.dtype)])
+        self._data[self._size] = value
+        self._size += 1
+
+    def view(self):
+        return self._data[:self._size]
+
+
+class SkillIndex:
+    """
+    Inverted index from normalized skills to jobs, updated incrementally.
+
+    Every job gets a dense row number when it is added. Rows only grow, so
+    appending a row to a posting list keeps it sorted. Re-adding a job
+    retires its old row instead of rewriting postings.
+    """
+
+    def __init__(self):
+        self.skill_ids = {}
+        self.keys = []
+        self.rows = {}
+        self._postings = []
+        self._document_frequency = _GrowableArray(np.int32)
+        self._alive = _GrowableArray(np.bool_)
+        self._row_offsets = _GrowableArray(np.int64)
+        self._row_offsets.extend([0])
+        self._row_skills = _GrowableArray(np.int32)
+        self._live = 0
+        self._last_id = None
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_collection(cls, collection):
+        """
+        Builds the index from the `skills` stored on every job.
+        """
+        index = cls()
+        index.refresh(collection)
+        return index
+
+    def __len__(self):
+        return self._live
+
+    def _skill_id(self, skill):
+        skill_id = self.skill_ids.get(skill)
+        if skill_id is None:
+            skill_id = self.skill_ids[skill] = len(self.skill_ids)
+            self._postings.append(_GrowableArray(np.int32))
+            self._document_frequency.append(0)
+        return skill_id
+
+    def add(self, key, skills):
+        """
+        Adds or replaces the skills of one job.
+
+        Args:
+            key: The job key (see `bulk_writer.job_key`).
+            skills: Normalized skill names.
+        """
+        with self._lock:
+            old_row = self.rows.get(key)
+            if old_row is not None:
+                self._live -= 1
+                self._alive.view()[old_row] = False
+                start, end = self._row_offsets.view()[old_row:old_row + 2]
+                self._document_frequency.view()[self._row_skills.view()[start:end]] -= 1
+
+            row = len(self.keys)
+            skill_ids = sorted({self._skill_id(skill) for skill in skills})
+            for skill_id in skill_ids:
+                self._postings[skill_id].append(row)
+            self._document_frequency.view()[skill_ids] += 1
+            self._row_skills.extend(skill_ids)
+            self._row_offsets.append(len(self._row_skills))
+            self._alive.append(True)
+            self._live += 1
+            self.keys.append(key)
+            self.rows[key] = row
+
+    def refresh(self, collection, batch_size=10000):
+        """
+        Adds the jobs stored since the last refresh, in `_id` order.
+
+        Jobs updated in place keep their `_id`, so their new skills are only
+        picked up by a rebuild.
+
+        Returns:
+            The number of added jobs.
+        """
+        query = {SKILLS_FIELD: {"$exists": True}}
+        if self._last_id is not None:
+            query["_id"] = {"$gt": self._last_id}
+        added = 0
+        try:
+            cursor = collection.find(query, {SKILLS_FIELD: 1, "link": 1, "id": 1},
+                                     batch_size=batch_size).sort("_id", 1)
+            for document in cursor:
+                key = job_key(document)
+                if key is not None:
+                    self.add(key, document[SKILLS_FIELD] or [])
+                    added += 1
+                self._last_id = document["_id"]
+        except PyMongoError as e:
+            print(f"Error refreshing skill index: {e}")
+        return added
+
+    def posting(self, skill):
+        """
+        Returns the sorted rows of the live jobs listing a skill.
+        """
+        skill_id = self.skill_ids.get(skill)
+        if skill_id is None:
+            return np.empty(0, dtype=np.int32)
+        rows = self._postings[skill_id].view()
+        return rows[self._alive.view()[rows]]
+
+    def _query(self, skills):
+        skill_ids = np.array(sorted({self.skill_ids[skill] for skill in skills if skill in self.skill_ids}),
+                             dtype=np.int32)
+        live = max(len(self), 1)
+        idf = np.log1p(live / np.maximum(self._document_frequency.view()[skill_ids], 1)).astype(np.float32)
+        return skill_ids, idf
+
+    def overlap(self, skills, rows):
+        """
+        Skill-overlap features of a resume against some rows.
+
+        Returns:
+            (matched, jaccard, weighted) arrays aligned with `rows`: the number
+            of shared skills, their Jaccard similarity and the IDF-weighted
+            share of the resume's skills the job covers.
+        """
+        with self._lock:
+            return self._overlap(skills, rows)
+
+    def _overlap(self, skills, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        skill_ids, idf = self._query(normalize_skills(skills))
+        query_size = len(normalize_skills(skills))
+        weights = np.zeros(len(self.skill_ids), dtype=np.float32)
+        weights[skill_ids] = idf
+        in_query = weights > 0
+
+        offsets = self._row_offsets.view()
+        starts, ends = offsets[rows], offsets[rows + 1]
+        lengths = ends - starts
+        # Gather the skill ids of every row into one flat array and reduce per row
+        flat = self._row_skills.view()[np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+                                       + np.arange(lengths.sum())]
+        owners = np.repeat(np.arange(len(rows)), lengths)
+        matched = np.bincount(owners, weights=in_query[flat], minlength=len(rows))
+        covered = np.bincount(owners, weights=weights[flat], minlength=len(rows))
+
+        union = query_size + lengths - matched
+        jaccard = np.divide(matched, union, out=np.zeros(len(rows)), where=union > 0)
+        total_weight = idf.sum()
+        weighted = covered / total_weight if total_weight else np.zeros(len(rows))
+        return matched.astype(np.int32), jaccard, weighted
+
+    def search(self, skills, limit=10, method="weighted", min_matched=1):
+        """
+        Ranks every live job by skill overlap with a resume.
+
+        Only the postings of the resume's skills are read and their rows are
+        counted with one `np.bincount`; Jaccard scores come from the stored
+        per-row skill counts, so no job's skill list is visited.
+
+        Returns:
+            A list of (job key, score, matched) tuples, best first.
+        """
+        with self._lock:
+            return self._search(skills, limit, method, min_matched)
+
+    def _search(self, skills, limit, method, min_matched):
+        query_skills = normalize_skills(skills)
+        skill_ids, idf = self._query(query_skills)
+        if not len(skill_ids):
+            return []
+        postings = [self._postings[skill_id].view() for skill_id in skill_ids]
+        rows = np.concatenate(postings)
+        # Dense per-row counts: linear in the postings read, no sorting
+        matched = np.bincount(rows, minlength=len(self.keys))
+        candidates = np.flatnonzero((matched >= min_matched) & self._alive.view())
+        if method == "jaccard":
+            lengths = np.diff(self._row_offsets.view())[candidates]
+            shared = matched[candidates]
+            scores = shared / (len(query_skills) + lengths - shared)
+        else:
+            weights = np.repeat(idf, [len(posting) for posting in postings])
+            scores = np.bincount(rows, weights=weights, minlength=len(self.keys))[candidates] / idf.sum()
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top = np.arange(len(scores))
+        order = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.keys[row], float(scores[i]), int(matched[row]))
+                for i, row in zip(order.tolist(), candidates[order].tolist())]
+
+    def rank_results(self, results, skills, weight=0.0, method="weighted"):
+        """
+        Adds a `skill_score` to vector search results and optionally re-ranks them.
+
+        Args:
+            results: Result dictionaries with a `link`.
+            skills: The resume's skills.
+            weight: Share of the final score taken by the skill score; 0 keeps the vector order.
+            method: "weighted" or "jaccard".
+
+        Returns:
+            Copies of the results, re-sorted when `weight` is positive. The
+            input may be shared with the result cache and is left untouched.
+        """
+        results = [dict(result) for result in results]
+        keys = [job_key(result) for result in results]
+        known = [i for i, key in enumerate(keys) if key in self.rows]
+        if known:
+            _, jaccard, weighted = self.overlap(skills, [self.rows[keys[i]] for i in known])
+            scores = jaccard if method == "jaccard" else weighted
+            for i, score in zip(known, scores.tolist()):
+                results[i]["skill_score"] = score
+        if weight > 0:
+            for result in results:
+                result["combined_score"] = ((1 - weight) * result.get("score", 0.0)
+                                            + weight * result.get("skill_score", 0.0))
+            results.sort(key=lambda result: result["combined_score"], reverse=True)
+        return results
@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+import pytest
+
+from ann_index import IVFIndex, build_ivf
+from local_search import VECTORS_FILE, normalize_rows, write_manifest
+from vector_quantization import QuantizedIndex, build_codes
+
+
+def export(directory, count, dimension=8, seed=0):
+    vectors = normalize_rows(np.random.default_rng(seed).normal(size=(count, dimension)))
+    with open(os.path.join(directory, VECTORS_FILE), "wb") as vectors_file:
+        vectors_file.write(vectors.tobytes())
+    write_manifest(directory, count, dimension, [])
+    return vectors
+
+
+def test_ivf_index_matches_its_export(tmp_path):
+    vectors = export(str(tmp_path), 200)
+    build_ivf(str(tmp_path), nlist=4)
+
+    index = IVFIndex(str(tmp_path), nprobe=4)
+    rows, _ = index.search_rows(vectors[:3], limit=1)
+    assert rows[:, 0].tolist() == [0, 1, 2]
+
+
+@pytest.mark.parametrize("count", [200, 150])
+def test_ivf_index_of_an_earlier_export_is_rejected(tmp_path, count):
+    export(str(tmp_path), 200)
+    build_ivf(str(tmp_path), nlist=4)
+    export(str(tmp_path), count, seed=1)
+
+    with pytest.raises(ValueError, match="rebuild"):
+        IVFIndex(str(tmp_path))
+
+
+@pytest.mark.parametrize("codec", ["sq8", "pq"])
+def test_codes_of_an_earlier_export_are_rejected(tmp_path, codec):
+    vectors = export(str(tmp_path), 300, dimension=24)
+    build_codes(str(tmp_path), codec)
+    index = QuantizedIndex(str(tmp_path), codec)
+    rows, _ = index.search_rows(vectors[:2], limit=1)
+    assert rows[:, 0].tolist() == [0, 1]
+
+    # Same row count, different export
+    export(str(tmp_path), 300, dimension=24, seed=1)
+    with pytest.raises(ValueError, match="another export"):
+        QuantizedIndex(str(tmp_path), codec)
@@ -0,0 +1,106 @@
+import json
+
+import numpy as np
+import pytest
+
+import user_profile_vectorization as service
+from query_cache import QueryCache
+
+
+class FakeBackend:
+    def search_batch(self, vectors, num_candidates=100, limit=10, filters=None):
+        if any(vector[0] < 0 for vector in vectors):
+            raise RuntimeError("backend unavailable")
+        return [[{"title": "Engineer", "score": 0.9}] for _ in vectors]
+
+
+def fake_embed_resumes(resume_texts):
+    return [{"vector": np.array([-1.0 if text == "fail" else 1.0]), "title": text, "work_experience": None,
+             "location": None, "skills": []} for text in resume_texts]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(service, "_service_ready", True)
+    monkeypatch.setattr(service, "search_backend", FakeBackend())
+    monkeypatch.setattr(service, "embed_resumes", fake_embed_resumes)
+    monkeypatch.setattr(service, "rank_by_skills", lambda query, results, skill_weight=0.0: results)
+    return service.app.test_client()
+
+
+@pytest.mark.parametrize("body", [
+    {"resumes": ["a"], "limit": "ten"},
+    {"resumes": ["a"], "limit": 2.5},
+    {"resumes": ["a"], "batch_size": 0},
+    {"resumes": ["a"], "num_candidates": None},
+    {"resumes": ["a"], "min_score": "high"},
+    {"resumes": ["a"], "skill_weight": [1]},
+    {"resumes": ["a"], "filters": "remote"},
+    ["a"],
+])
+def test_invalid_parameters_are_rejected(client, body):
+    response = client.post("/search/batch", json=body)
+    assert response.status_code == 400
+    assert "message" in response.get_json()
+
+
+def test_non_json_body_is_rejected(client):
+    response = client.post("/search/batch", data="resumes=a", content_type="text/plain")
+    assert response.status_code == 400
+
+
+def test_failed_chunks_stream_error_lines(client):
+    response = client.post("/search/batch", json={"resumes": ["a", "fail", "b"], "batch_size": 1, "min_score": 0.5})
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    assert response.status_code == 200
+    assert [line["index"] for line in lines] == [0, 1, 2]
+    assert lines[1] == {"index": 1, "error": "backend unavailable"}
+    assert lines[2]["results"] == [{"title": "Engineer", "score": 0.9}]
+
+
+@pytest.mark.parametrize("body", [
+    {"resume_text": None},
+    {"resume_text": ["a"]},
+    {"resume_text": "a", "filters": ["remote"]},
+    {"resume_text": "a", "skill_weight": "heavy"},
+    "a",
+])
+def test_invalid_search_requests_are_rejected(client, body):
+    response = client.post("/search", json=body)
+    assert response.status_code == 400
+    assert "message" in response.get_json()
+
+
+def test_embed_resumes_isolates_failing_texts(monkeypatch):
+    def analyze(text, components=(), spec=None):
+        if "crash" in text:
+            raise RuntimeError("model failed")
+        return {"vector": np.ones(2), "terms": text.split()}
+
+    monkeypatch.setattr(service, "query_cache", QueryCache(shared_dir=None))
+    monkeypatch.setattr(service, "vector_version", {"model": "spacy"})
+    monkeypatch.setattr(service, "analyze_text", analyze)
+    monkeypatch.setattr(service, "analyze_texts", lambda texts, spec=None: [analyze(text) for text in texts])
+    monkeypatch.setattr(service, "extract_resume_fields", lambda text: {"title": text})
+
+    queries = service.embed_resumes(["python developer", None, "crash dummy"])
+
+    assert queries[0]["title"] == "python developer"
+    assert isinstance(queries[1], Exception)
+    assert str(queries[2]) == "model failed"
+    assert service.embed_resumes(["python developer"])[0]["terms"] == ["python", "developer"]
+
+
+def test_failed_resumes_get_error_lines(client, monkeypatch):
+    def embed(resume_texts):
+        return [RuntimeError("model failed") if text == "crash" else query
+                for text, query in zip(resume_texts, fake_embed_resumes(resume_texts))]
+
+    monkeypatch.setattr(service, "embed_resumes", embed)
+    response = client.post("/search/batch", json={"resumes": ["a", "crash", "b"]})
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    assert [line["index"] for line in lines] == [0, 1, 2]
+    assert lines[1] == {"index": 1, "error": "model failed"}
+    assert lines[0]["results"] and lines[2]["results"]
@@ -0,0 +1,189 @@
+import mongomock
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from bulk_writer import JOB_KEY_FIELD, BulkJobWriter, content_key
+from seen_jobs import SeenJobs
+
+
+def job(number, **fields):
+    return {"title": f"Engineer {number}", "link": f"https://www.linkedin.com/jobs/view/{number}/?ref=x", **fields}
+
+
+@pytest.fixture
+def collection():
+    return mongomock.MongoClient().job_database.job_collection
+
+
+def make_writer(collection, flush_interval=0.01, **kwargs):
+    writer = BulkJobWriter(collection, flush_interval=flush_interval, retry_backoff=0, **kwargs)
+    writer.ensure_indexes()
+    return writer
+
+
+def test_upserts_are_idempotent_on_job_id(collection):
+    writer = make_writer(collection)
+    writer.write(job(1, company="A"))
+    writer.flush()
+    writer.write(job(1, company="B"))
+    writer.write(job(2))
+    writer.close()
+
+    assert collection.count_documents({}) == 2
+    assert collection.find_one({JOB_KEY_FIELD: 1})["company"] == "B"
+    assert writer.totals["upserted"] == 2
+    assert writer.totals["modified"] == 1
+    assert writer.totals["failed"] == 0
+
+
+def test_repeats_in_one_batch_are_collapsed(collection):
+    writer = make_writer(collection, flush_interval=10)
+    writer.write(job(1, company="A"))
+    writer.write(job(1, company="B"))
+    writer.close()
+
+    assert collection.count_documents({}) == 1
+    assert collection.find_one({JOB_KEY_FIELD: 1})["company"] == "B"
+    assert writer.totals["batches"] == 1
+
+
+def test_keyless_documents_are_inserted(collection):
+    writer = make_writer(collection)
+    writer.write({"title": "No link"})
+    writer.write({"title": "No link"})
+    writer.write({"title": "Only an id", "id": 42})
+    writer.close()
+
+    assert collection.count_documents({JOB_KEY_FIELD: {"$exists": False}}) == 2
+    assert collection.count_documents({JOB_KEY_FIELD: 42}) == 1
+    assert writer.totals["inserted"] == 2
+    assert writer.totals["upserted"] == 1
+
+
+def test_content_keys_make_keyless_records_idempotent(collection):
+    record = {"title": "No link", "company": "A", "description": "Write Python."}
+    key = content_key(record)
+    assert key == content_key(dict(record, link=None)) < 0
+    assert key != content_key(dict(record, company="B"))
+
+    writer = make_writer(collection)
+    for _ in range(2):
+        writer.write(dict(record, **{JOB_KEY_FIELD: key}))
+        writer.flush()
+    writer.close()
+
+    assert collection.count_documents({}) == 1
+    assert writer.totals["upserted"] == 1
+
+
+def test_flush_waits_for_queued_documents(collection):
+    writer = make_writer(collection, flush_interval=0.2, batch_size=3)
+    for number in range(5):
+        writer.write(job(number))
+    writer.flush()
+    assert collection.count_documents({}) == 5
+    writer.close()
+
+
+def test_close_writes_the_rest_and_rejects_writes(collection):
+    writer = make_writer(collection, flush_interval=10)
+    writer.write(job(1))
+    writer.close()
+    writer.close()
+
+    assert collection.count_documents({}) == 1
+    with pytest.raises(RuntimeError):
+        writer.write(job(2))
+
+
+class FlakyCollection:
+    """
+    Wraps a collection and raises the queued errors from `bulk_write` before delegating.
+    """
+
+    def __init__(self, collection, errors):
+        self.collection = collection
+        self.errors = list(errors)
+        self.calls = []
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def bulk_write(self, requests, ordered=True):
+        self.calls.append(list(requests))
+        if self.errors:
+            error = self.errors.pop(0)
+            if callable(error):
+                error = error(requests)
+            raise error
+        return self.collection.bulk_write(requests, ordered=ordered)
+
+
+def test_transient_errors_are_retried(collection):
+    flaky = FlakyCollection(collection, [AutoReconnect("connection reset")])
+    writer = make_writer(flaky)
+    writer.write(job(1))
+    writer.close()
+
+    assert len(flaky.calls) == 2
+    assert collection.count_documents({}) == 1
+    assert writer.totals["failed"] == 0
+
+
+def test_partial_bulk_failure_resends_only_retryable_errors(collection):
+    def partial_failure(requests):
+        # The first request was applied, the second hit a step-down, the third a duplicate key
+        collection.bulk_write(requests[:1])
+        return BulkWriteError({
+            "nInserted": 1, "nUpserted": 0, "nModified": 0,
+            "writeErrors": [{"index": 1, "code": 189, "errmsg": "primary stepped down"},
+                            {"index": 2, "code": 11000, "errmsg": "E11000 duplicate key"}],
+        })
+
+    flaky = FlakyCollection(collection, [partial_failure])
+    writer = make_writer(flaky, flush_interval=10)
+    for title in ("a", "b", "c"):
+        writer.write({"title": title})
+    writer.close()
+
+    assert len(flaky.calls) == 2
+    assert flaky.calls[1] == [flaky.calls[0][1]]
+    assert sorted(document["title"] for document in collection.find()) == ["a", "b"]
+    assert writer.totals["inserted"] == 2
+    assert writer.totals["failed"] == 1
+
+
+def test_permanent_errors_are_not_retried(collection):
+    flaky = FlakyCollection(collection, [BulkWriteError({
+        "nInserted": 0, "writeErrors": [{"index": 0, "code": 121, "errmsg": "Document failed validation"}],
+    })])
+    writer = make_writer(flaky)
+    writer.write(job(1))
+    writer.close()
+
+    assert len(flaky.calls) == 1
+    assert writer.totals["failed"] == 1
+
+
+def test_only_stored_jobs_are_marked_seen(collection, tmp_path):
+    def partial_failure(requests):
+        # The first job was stored, the second failed validation
+        collection.bulk_write(requests[:1])
+        return BulkWriteError({
+            "nInserted": 0, "nUpserted": 1, "nModified": 0,
+            "writeErrors": [{"index": 1, "code": 121, "errmsg": "Document failed validation"}],
+        })
+
+    seen = SeenJobs()
+    flaky = FlakyCollection(collection, [partial_failure])
+    writer = make_writer(flaky, flush_interval=10, on_written=seen.mark_written)
+    for number in (1, 2):
+        assert not seen.check_and_add(number)
+        writer.write(job(number))
+    writer.close()
+
+    assert 1 in seen and 2 not in seen
+    # A queued job is still skipped within the run, but not saved as seen
+    assert seen.check_and_add(2)
+    seen.save(tmp_path / "seen_jobs.npy")
+    assert 2 not in SeenJobs.load(tmp_path / "seen_jobs.npy")
@@ -0,0 +1,100 @@
+import os
+import types
+
+import mongomock
+import pytest
+
+import database
+from database import RESULT_PROJECTION, OperationStats, projection
+
+
+def test_projection():
+    assert projection("title", "filters.skills") == {"_id": 1, "title": 1, "filters.skills": 1}
+    assert projection("job_id", include_id=False) == {"_id": 0, "job_id": 1}
+
+
+def test_result_projection_returns_only_result_fields():
+    collection = mongomock.MongoClient().job_database.job_collection
+    collection.insert_one({"title": "Engineer", "link": "https://www.linkedin.com/jobs/view/1/",
+                           "tokens": ["python"], "description_vector": [0.1, 0.2], "plot": "never projected"})
+    document = collection.find_one({}, RESULT_PROJECTION)
+    assert set(document) == {"_id", "title", "link"}
+
+
+def test_atlas_pipeline_projects_result_fields_and_score():
+    from search_backends import AtlasVectorSearch
+    project = AtlasVectorSearch(None).build_pipeline([0.1, 0.2])[1]["$project"]
+    assert project == {**RESULT_PROJECTION, "score": {"$meta": "vectorSearchScore"}}
+
+
+def command_events(stats, command, collection, connection_id, request_id, micros, failed=False):
+    stats.started(types.SimpleNamespace(command_name=command, command={command: collection},
+                                        connection_id=connection_id, request_id=request_id))
+    finished = types.SimpleNamespace(command_name=command, connection_id=connection_id,
+                                     request_id=request_id, duration_micros=micros)
+    if failed:
+        stats.failed(finished)
+    else:
+        stats.succeeded(finished)
+
+
+def test_operation_stats_counts_per_operation_and_collection():
+    stats = OperationStats(slow_ms=0)
+    for request_id in range(1, 11):
+        command_events(stats, "find", "job_collection", ("localhost", 27017), request_id, request_id * 1000)
+    command_events(stats, "aggregate", "job_collection", ("localhost", 27017), 11, 4000, failed=True)
+    command_events(stats, "find", "profile_collection", ("localhost", 27018), 1, 2000)
+
+    report = stats.stats()
+    assert set(report) == {"find job_collection", "aggregate job_collection", "find profile_collection"}
+    find = report["find job_collection"]
+    assert (find["count"], find["failed"], find["mean_ms"], find["max_ms"]) == (10, 0, 5.5, 10.0)
+    assert find["p50_ms"] == 6.0 and find["p95_ms"] == 10.0
+    assert report["aggregate job_collection"]["failed"] == 1
+    assert "find job_collection 10x" in stats.summary()
+
+    stats.reset()
+    assert stats.stats() == {} and stats.summary() == "no operations"
+
+
+def test_operation_stats_without_started_event_uses_command_name():
+    stats = OperationStats(slow_ms=0)
+    stats.succeeded(types.SimpleNamespace(command_name="ping", connection_id=None, request_id=1,
+                                          duration_micros=100))
+    assert stats.stats()["ping"]["count"] == 1
+
+
+@pytest.fixture
+def local_client(monkeypatch):
+    # A client that never connects: pymongo connects in the background on first use
+    monkeypatch.setattr(database, "connection_string", "mongodb://localhost:1/?serverSelectionTimeoutMS=100")
+    database.reset_client()
+    yield
+    if database._client is not None:
+        database._client.close()
+    database.reset_client()
+
+
+def test_get_client_is_shared_and_configured(local_client):
+    client = database.get_client()
+    assert database.get_client() is client
+    assert database.get_collection().database.client is client
+    assert client.options.pool_options.max_pool_size == database.MONGODB_MAX_POOL_SIZE
+    assert database.operation_stats in client.options.event_listeners
+
+
+def test_forked_child_builds_its_own_client(local_client):
+    client = database.get_client()
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            reset = database._client is None
+            own = database.get_client() is not client and database.get_client() is database.get_client()
+            os.write(write_end, b"1" if reset and own else b"0")
+        finally:
+            os._exit(0)
+    os.close(write_end)
+    os.waitpid(pid, 0)
+    assert os.read(read_end, 1) == b"1"
+    assert database.get_client() is client
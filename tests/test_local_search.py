@@ -0,0 +1,66 @@
+import os
+
+import mongomock
+import numpy as np
+import pytest
+
+from ann_index import IVFIndex, build_ivf
+from local_search import CURRENT_FILE, EXPORT_PREFIX, LocalVectorIndex, export_index
+
+
+def insert_jobs(collection, count, dimension=4, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, dimension))
+    collection.delete_many({})
+    collection.insert_many([{"title": f"Engineer {number}", "link": f"link {number}",
+                             "description_vector": vector.tolist(), "filters": {"remote": number % 2 == 0}}
+                            for number, vector in enumerate(vectors)])
+
+
+@pytest.fixture
+def collection():
+    return mongomock.MongoClient().job_database.job_collection
+
+
+def test_open_index_keeps_its_export(tmp_path, collection):
+    directory = str(tmp_path)
+    insert_jobs(collection, 5)
+    assert export_index(collection, directory) == 5
+    old_index = LocalVectorIndex(directory)
+    old_vectors = np.array(old_index.vectors)
+
+    insert_jobs(collection, 3, seed=1)
+    assert export_index(collection, directory) == 3
+
+    # Vectors, metadata and postings of the open index all stay on the first export
+    assert np.array_equal(old_index.vectors, old_vectors)
+    assert [result["title"] for result in old_index.search(old_vectors[4], limit=1)] == ["Engineer 4"]
+    assert len(old_index.search(old_vectors[4], limit=5, filters={"remote": True})) == 3
+
+    new_index = LocalVectorIndex(directory)
+    assert new_index.count == 3
+    assert new_index.export_id != old_index.export_id
+    assert [result["title"] for result in new_index.search(new_index.vectors[2], limit=1)] == ["Engineer 2"]
+
+
+def test_only_the_current_and_previous_exports_are_kept(tmp_path, collection):
+    directory = str(tmp_path)
+    names = []
+    for seed in range(3):
+        insert_jobs(collection, 4, seed=seed)
+        export_index(collection, directory)
+        with open(os.path.join(directory, CURRENT_FILE)) as current_file:
+            names.append(current_file.read())
+    exports = sorted(name for name in os.listdir(directory) if name.startswith(EXPORT_PREFIX))
+    assert exports == sorted(names[1:])
+
+
+def test_ivf_index_must_be_built_for_the_current_export(tmp_path, collection):
+    directory = str(tmp_path)
+    insert_jobs(collection, 50)
+    export_index(collection, directory)
+    build_ivf(directory, nlist=2)
+    IVFIndex(directory)
+
+    export_index(collection, directory)
+    with pytest.raises(ValueError, match="build"):
+        IVFIndex(directory)
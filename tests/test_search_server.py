@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from search_server import SearchCoalescer
+
+
+def embed(texts):
+    return [{"text": text} for text in texts]
+
+
+def lookup(query):
+    return [query["text"].upper()]
+
+
+def test_requests_are_answered():
+    coalescer = SearchCoalescer(embed, lookup, max_wait=0.01)
+    try:
+        assert coalescer.search("python") == ({"text": "python"}, ["PYTHON"])
+    finally:
+        coalescer.close()
+
+
+def test_search_times_out_and_cancels_the_request():
+    release = threading.Event()
+    embedded = []
+
+    def slow_embed(texts):
+        release.wait(5)
+        embedded.extend(texts)
+        return embed(texts)
+
+    coalescer = SearchCoalescer(slow_embed, lookup, max_batch_size=1, max_wait=0)
+    try:
+        first = coalescer.submit("first")
+        with pytest.raises(TimeoutError):
+            coalescer.search("second", timeout=0.05)
+        release.set()
+        assert first.result(5) == ({"text": "first"}, ["FIRST"])
+    finally:
+        coalescer.close()
+    # The timed-out request was still queued, so it was never embedded
+    assert embedded == ["first"]
+
+
+def test_dispatcher_crash_fails_its_batch_and_the_queue():
+    started = threading.Event()
+    release = threading.Event()
+
+    def broken_embed(texts):
+        started.set()
+        release.wait(5)
+        # Not a list of queries, so dispatching fails outside the embedding call
+        return None
+
+    coalescer = SearchCoalescer(broken_embed, lookup, max_batch_size=1, max_wait=0)
+    first = coalescer.submit("first")
+    started.wait(5)
+    second = coalescer.submit("second")
+    release.set()
+    for future in (first, second):
+        with pytest.raises(RuntimeError, match="stopped"):
+            future.result(5)
+    with pytest.raises(RuntimeError, match="closed"):
+        coalescer.submit("third")
+    coalescer.close()
+
+
+def test_failed_query_fails_only_its_request():
+    def partly_failing_embed(texts):
+        return [ValueError("bad resume") if text == "bad" else {"text": text} for text in texts]
+
+    coalescer = SearchCoalescer(partly_failing_embed, lookup, max_batch_size=2, max_wait=0.2)
+    try:
+        bad = coalescer.submit("bad")
+        good = coalescer.submit("good")
+        with pytest.raises(ValueError, match="bad resume"):
+            bad.result(5)
+        assert good.result(5) == ({"text": "good"}, ["GOOD"])
+    finally:
+        coalescer.close()
+    assert coalescer.stats()["failed"] == 1
@@ -0,0 +1,23 @@
+from skill_index import extract_skills, job_skills, resume_skills
+
+
+def test_ordinary_words_are_not_skills():
+    text = ("Join the rest of the team as we go to market this spring. "
+            "Please express interest; swift delivery of R&D. Node: c. TS")
+    assert extract_skills(text) == []
+
+
+def test_ambiguous_skills_count_in_a_skill_list():
+    text = "We use Python, Go and R, C/C++ and Java. REST APIs with Spring Boot, Node.js and TS."
+    assert extract_skills(text) == ["python", "go", "r", "c", "c++", "java", "rest api", "spring", "node.js",
+                                    "typescript"]
+
+
+def test_ambiguous_skills_need_their_usual_spelling():
+    assert extract_skills("Kubernetes, go and terraform") == ["kubernetes", "terraform"]
+    assert extract_skills("Kubernetes, Go and Terraform") == ["kubernetes", "go", "terraform"]
+
+
+def test_skillset_and_skills_section_are_taken_as_is():
+    assert job_skills({"skillset": ["Go", "Spring"]}, "Ready to go this spring") == ["go", "spring"]
+    assert resume_skills("SKILLS\nLanguages: Python, Go, R\n") == ["python", "go", "r"]
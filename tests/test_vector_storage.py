@@ -0,0 +1,24 @@
+import mongomock
+import numpy as np
+import pytest
+
+from vector_storage import decode_vector, field_value, migrate
+
+
+@pytest.mark.parametrize("path", ["description_vector", "vectors.v2"])
+def test_migrate_converts_arrays_to_binary(path):
+    collection = mongomock.MongoClient().job_database.job_collection
+    *parents, name = path.split(".")
+    documents = []
+    for number in range(3):
+        document = {name: [float(number), 0.5]}
+        for parent in reversed(parents):
+            document = {parent: document}
+        documents.append(document)
+    collection.insert_many(documents)
+
+    assert migrate(collection, path, batch_size=2) == 3
+    assert migrate(collection, path) == 0
+    vectors = [decode_vector(field_value(document, path)) for document in collection.find().sort("_id", 1)]
+    assert all(isinstance(vector, np.ndarray) and vector.dtype == np.float32 for vector in vectors)
+    assert [vector.tolist() for vector in vectors] == [[0.0, 0.5], [1.0, 0.5], [2.0, 0.5]]
@@ -0,0 +1,46 @@
+import datetime
+
+import mongomock
+import numpy as np
+import pytest
+
+import vector_versions
+from vector_versions import LEGACY_PATH, VERSIONS_COLLECTION, activate, active_version
+
+
+class FakeEmbedder:
+    def embed(self, texts):
+        return np.ones((len(texts), 3), dtype=np.float32)
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    monkeypatch.setattr(vector_versions, "get_embedder", lambda model_name: FakeEmbedder())
+    collection = mongomock.MongoClient().job_database.job_collection
+    collection.database[VERSIONS_COLLECTION].insert_one({
+        "_id": collection.name,
+        "versions": {"v2": {"model": "fake", "completed_at": datetime.datetime(2026, 1, 1), "count": 1}},
+    })
+    return collection
+
+
+def test_activate_embeds_jobs_stored_after_the_backfill(collection):
+    collection.insert_many([
+        {"description": "backfilled", LEGACY_PATH: [1.0], "vectors": {"v2": [1.0, 1.0, 1.0]}},
+        {"description": "stored since", LEGACY_PATH: [1.0]},
+        {"description": "never embedded"},
+    ])
+
+    activate(collection, "v2")
+
+    assert active_version(collection)["path"] == "vectors.v2"
+    assert collection.count_documents({"vectors.v2": {"$exists": True}}) == 2
+    assert collection.count_documents({"vectors.v2": {"$exists": False}, LEGACY_PATH: {"$exists": True}}) == 0
+    versions = collection.database[VERSIONS_COLLECTION].find_one({"_id": collection.name})
+    assert versions["versions"]["v2"]["count"] == 2
+
+
+def test_incomplete_backfill_cannot_be_activated(collection):
+    with pytest.raises(ValueError):
+        activate(collection, "v3")
+    assert active_version(collection)["path"] == LEGACY_PATH
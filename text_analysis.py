@@ -0,0 +1,170 @@
+import os
+import re
+import numpy as np
+from nlp_models import DEFAULT_MODEL, VECTOR_COMPONENTS, annotate, make_docs, process
+
+# Local NLTK data directory searched before NLTK's defaults; nothing is downloaded
+# at runtime. Fill it once with:
+#     python -m nltk.downloader -d data/nltk_data stopwords
+NLTK_DATA_DIR = os.environ.get("NLTK_DATA_DIR", "data/nltk_data")
+
+_stop_words = None
+
+
+def get_stop_words():
+    """
+    Returns the NLTK English stopword set, loading it on first use.
+
+    The corpus is looked up in `NLTK_DATA_DIR` first, then in NLTK's default
+    locations.
+
+    Returns:
+        A set of lowercase stopwords.
+
+    Raises:
+        LookupError: If the stopwords corpus is not installed anywhere.
+    """
+    global _stop_words
+    if _stop_words is None:
+        import nltk
+        from nltk.corpus import stopwords
+        if NLTK_DATA_DIR not in nltk.data.path:
+            nltk.data.path.insert(0, NLTK_DATA_DIR)
+        try:
+            _stop_words = set(stopwords.words("english"))
+        except LookupError:
+            raise LookupError(f"NLTK stopwords not found; install them with "
+                              f"`python -m nltk.downloader -d {NLTK_DATA_DIR} stopwords`") from None
+    return _stop_words
+
+
+def clean_text(text):
+    """
+    Lowercases a text and strips punctuation, as every vectorizer expects.
+
+    Args:
+        text: The raw text.
+
+    Returns:
+        The cleaned text.
+    """
+    text = text.lower()
+    return re.sub(r"[^\w\s]", "", text)
+
+
+def filter_terms(tokens):
+    """
+    Drops stopwords from a token list.
+
+    Args:
+        tokens: Lowercase token strings.
+
+    Returns:
+        The tokens that are not stopwords, in order.
+    """
+    stop_words = get_stop_words()
+    return [token for token in tokens if token not in stop_words]
+
+
+def split_terms(text):
+    """
+    Returns the stopword-filtered terms of a raw text without loading spaCy.
+
+    Once `clean_text` has removed punctuation, spaCy's tokenizer splits on
+    whitespace almost everywhere, so these terms match the `terms` of
+    `summarize` closely enough for MinHash signatures. Cheap enough to run
+    before a job is queued for embedding.
+
+    Args:
+        text: The raw text.
+
+    Returns:
+        A list of term strings.
+    """
+    return filter_terms(clean_text(text).split())
+
+
+def summarize(doc):
+    """
+    Turns a parsed Doc into plain Python data so the Doc can be released.
+
+    Args:
+        doc: A spaCy Doc.
+
+    Returns:
+        A dictionary with the tokens, stopword-filtered terms, entities as
+        (text, label) pairs and the float32 document vector.
+    """
+    tokens = [token.text for token in doc if not token.is_space]
+    return {
+        "tokens": tokens,
+        "terms": filter_terms(tokens),
+        "entities": [(ent.text, ent.label_) for ent in doc.ents],
+        "vector": np.array(doc.vector, dtype=np.float32),
+    }
+
+
+def analyze(text, components=VECTOR_COMPONENTS, model_name=DEFAULT_MODEL):
+    """
+    Cleans and parses a text once and extracts everything the vectorizers use.
+
+    Args:
+        text: The raw text of a job description or resume.
+        components: spaCy components to run. Add `ENTITY_COMPONENTS` when
+            entities are needed; the tokenizer always runs.
+        model_name: The name of the installed spaCy model.
+
+    Returns:
+        The dictionary produced by `summarize`.
+    """
+    return summarize(process(clean_text(text), components, model_name))
+
+
+def tokenize_batch(texts, model_name=DEFAULT_MODEL):
+    """
+    Cleans and tokenizes texts without running any pipeline component.
+
+    Pass the result to `annotate_batch` once cheap token-level checks (such
+    as near-duplicate detection) have decided which documents to keep.
+
+    Args:
+        texts: An iterable of raw texts.
+        model_name: The name of the installed spaCy model.
+
+    Returns:
+        A list of tokenized spaCy Docs.
+    """
+    return list(make_docs((clean_text(text) for text in texts), model_name))
+
+
+def annotate_batch(docs, components=VECTOR_COMPONENTS, batch_size=64, model_name=DEFAULT_MODEL):
+    """
+    Runs the requested components over tokenized Docs and summarizes them.
+
+    Args:
+        docs: Docs from `tokenize_batch`.
+        components: spaCy components to run.
+        batch_size: Number of Docs each component processes at once.
+        model_name: The name of the installed spaCy model.
+
+    Returns:
+        A list of `summarize` dictionaries in input order.
+    """
+    return [summarize(doc) for doc in annotate(docs, components, batch_size, model_name)]
+
+
+def analyze_batch(texts, components=VECTOR_COMPONENTS, batch_size=64, model_name=DEFAULT_MODEL):
+    """
+    Batched version of `analyze` built on spaCy's `pipe`.
+
+    Args:
+        texts: An iterable of raw texts.
+        components: spaCy components to run; the tokenizer always runs.
+        batch_size: Number of texts each component processes at once.
+        model_name: The name of the installed spaCy model.
+
+    Returns:
+        A list of `summarize` dictionaries in input order.
+    """
+    docs = make_docs((clean_text(text) for text in texts), model_name)
+    return annotate_batch(docs, components, batch_size, model_name)
@@ -0,0 +1,303 @@
+"""
+Compressed job vectors for memory-bound search.
+
+Two codecs are built next to an exported local index:
+
+    sq8  int8 scalar quantization, 1 byte per dimension (4x smaller)
+    pq   product quantization, 1 byte per subspace (16x smaller at 96-d / 24)
+
+    python vector_quantization.py build --dir data/local_index --codec pq
+    SEARCH_BACKEND=pq python user_profile_vectorization.py
+
+Queries are scored against the codes; the best `rerank` candidates are then
+re-scored with the float32 vectors.
+"""
+import argparse
+import os
+import numpy as np
+from local_search import LocalVectorIndex, export_directory, load_manifest, normalize_rows, open_vectors, top_k
+
+CODES_FILE = "{codec}_codes.npy"
+PARAMS_FILE = "{codec}_params.npz"
+# Entry of the params file recording the export the codes were built from
+EXPORT_ID_PARAM = "export_id"
+
+# Rows encoded or scored at once
+BLOCK_ROWS = 65536
+
+
+def kmeans(data, k, iterations=10, seed=0):
+    """
+    Plain Euclidean k-means, used to train product-quantization codebooks.
+
+    Args:
+        data: A 2-D float32 array.
+        k: Number of centroids.
+        iterations: Number of iterations.
+        seed: Random seed.
+
+    Returns:
+        A (k, dimension) float32 array of centroids.
+    """
+    rng = np.random.default_rng(seed)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = nearest_centroids(data, centroids)
+        counts = np.bincount(assignments, minlength=k)
+        sums = np.stack([np.bincount(assignments, weights=data[:, d], minlength=k)
+                         for d in range(data.shape[1])], axis=1)
+        filled = counts > 0
+        centroids[filled] = (sums[filled] / counts[filled, None]).astype(np.float32)
+    return centroids
+
+
+def nearest_centroids(data, centroids):
+    """
+    Returns the index of the closest centroid (Euclidean) for each row.
+    """
+    # argmin |x - c|^2 == argmax (x.c - |c|^2 / 2)
+    half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    return np.argmax(data @ centroids.T - half_norms, axis=1)
+
+
+class ScalarQuantizer:
+    """
+    Maps each dimension linearly onto 256 levels between its min and max.
+
+    Args:
+        low: Per-dimension minimum.
+        scale: Per-dimension step between levels.
+    """
+
+    name = "sq8"
+
+    def __init__(self, low, scale):
+        self.low = low
+        self.scale = scale
+
+    @classmethod
+    def train(cls, vectors):
+        low = vectors.min(axis=0)
+        high = vectors.max(axis=0)
+        scale = np.maximum(high - low, 1e-12) / 255.0
+        return cls(low.astype(np.float32), scale.astype(np.float32))
+
+    def encode(self, vectors):
+        codes = np.rint((vectors - self.low) / self.scale)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def decode(self, codes):
+        return codes.astype(np.float32) * self.scale + self.low
+
+    def score(self, query, codes):
+        """
+        Inner products of one query with a block of codes.
+        """
+        # q.(low + code * scale) == q.low + code.(q * scale)
+        return codes.astype(np.float32) @ (query * self.scale) + float(query @ self.low)
+
+    def params(self):
+        return {"low": self.low, "scale": self.scale}
+
+
+class ProductQuantizer:
+    """
+    Splits vectors into `subspaces` chunks and encodes each chunk as the id
+    of its nearest centroid in a 256-entry codebook.
+
+    Args:
+        codebooks: A (subspaces, 256, chunk dimension) array.
+    """
+
+    name = "pq"
+
+    def __init__(self, codebooks):
+        self.codebooks = codebooks
+        self.subspaces, self.ksub, self.dsub = codebooks.shape
+
+    @classmethod
+    def train(cls, vectors, subspaces=24, iterations=10, seed=0):
+        dimension = vectors.shape[1]
+        if dimension % subspaces:
+            raise ValueError(f"Dimension {dimension} is not divisible by {subspaces} subspaces")
+        dsub = dimension // subspaces
+        codebooks = np.zeros((subspaces, 256, dsub), dtype=np.float32)
+        for j in range(subspaces):
+            centroids = kmeans(vectors[:, j * dsub:(j + 1) * dsub], 256, iterations, seed + j)
+            codebooks[j, :len(centroids)] = centroids
+        return cls(codebooks)
+
+    def encode(self, vectors):
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        for j in range(self.subspaces):
+            chunk = vectors[:, j * self.dsub:(j + 1) * self.dsub]
+            codes[:, j] = nearest_centroids(chunk, self.codebooks[j])
+        return codes
+
+    def decode(self, codes):
+        return np.hstack([self.codebooks[j][codes[:, j]] for j in range(self.subspaces)])
+
+    def score(self, query, codes):
+        """
+        Inner products of one query with a block of codes via lookup tables.
+        """
+        tables = np.einsum("jkd,jd->jk", self.codebooks, query.reshape(self.subspaces, self.dsub))
+        scores = np.zeros(len(codes), dtype=np.float32)
+        for j in range(self.subspaces):
+            scores += tables[j].take(codes[:, j])
+        return scores
+
+    def params(self):
+        return {"codebooks": self.codebooks}
+
+
+CODECS = {"sq8": ScalarQuantizer, "pq": ProductQuantizer}
+
+# Float32 re-rank depth per codec; PQ codes are coarser and need a deeper shortlist
+DEFAULT_RERANK = {"sq8": 100, "pq": 500}
+
+
+def load_codec(directory, codec):
+    """
+    Loads the parameters of a built codec.
+    """
+    with np.load(os.path.join(directory, PARAMS_FILE.format(codec=codec))) as params:
+        return CODECS[codec](**{name: params[name] for name in params.files if name != EXPORT_ID_PARAM})
+
+
+def codes_export_id(directory, codec):
+    """
+    Returns the `export_id` of the export a codec's codes were built from,
+    or None for codes built before it was recorded.
+    """
+    with np.load(os.path.join(directory, PARAMS_FILE.format(codec=codec))) as params:
+        if EXPORT_ID_PARAM not in params.files:
+            return None
+        return str(params[EXPORT_ID_PARAM]) or None
+
+
+def build_codes(directory, codec="sq8", train_size=100000, seed=0):
+    """
+    Trains a codec on a sample of an exported local index and encodes every vector.
+
+    Args:
+        directory: A local index directory written by `export_index`.
+        codec: "sq8" or "pq".
+        train_size: Number of vectors sampled for training.
+        seed: Random seed.
+
+    Returns:
+        The size of the codes in bytes.
+    """
+    # Built next to the current export's files, and replaced along with them
+    directory = export_directory(directory)
+    manifest = load_manifest(directory)
+    vectors = open_vectors(directory, manifest)
+    if not len(vectors):
+        raise ValueError(f"Index in {directory} is empty")
+
+    rng = np.random.default_rng(seed)
+    sample_rows = np.sort(rng.choice(len(vectors), size=min(train_size, len(vectors)), replace=False))
+    quantizer = CODECS[codec].train(np.asarray(vectors[sample_rows]))
+
+    codes = None
+    for start in range(0, len(vectors), BLOCK_ROWS):
+        block_codes = quantizer.encode(np.asarray(vectors[start:start + BLOCK_ROWS]))
+        if codes is None:
+            codes = np.lib.format.open_memmap(os.path.join(directory, CODES_FILE.format(codec=codec)), mode="w+",
+                                              dtype=np.uint8, shape=(len(vectors), block_codes.shape[1]))
+        codes[start:start + len(block_codes)] = block_codes
+    codes.flush()
+
+    np.savez(os.path.join(directory, PARAMS_FILE.format(codec=codec)), **quantizer.params(),
+             **{EXPORT_ID_PARAM: np.array(manifest.get("export_id") or "")})
+    return codes.nbytes
+
+
+class QuantizedIndex(LocalVectorIndex):
+    """
+    Searches compressed codes, optionally re-ranking with float32 vectors.
+
+    Only the codes need to stay resident; the float32 matrix is memory-mapped
+    and touched for at most `rerank` rows per query.
+
+    Args:
+        directory: A local index directory with built codes.
+        codec: "sq8" or "pq".
+        rerank: Number of code-scored candidates re-scored exactly; 0 disables
+            re-ranking and None uses the codec's `DEFAULT_RERANK`.
+        in_memory: Load the codes into RAM instead of memory-mapping them.
+
+    Raises:
+        ValueError: If the current export has no codes, or they were built
+            for an earlier export; their rows would point at the wrong jobs.
+    """
+
+    def __init__(self, directory, codec="sq8", rerank=None, in_memory=True):
+        super().__init__(directory)
+        directory = self.directory
+        rebuild = f"`python vector_quantization.py build --dir {directory} --codec {codec}`"
+        if not os.path.exists(os.path.join(directory, PARAMS_FILE.format(codec=codec))):
+            raise ValueError(f"The current export in {directory} has no {codec} codes; build them with {rebuild}")
+        self.quantizer = load_codec(directory, codec)
+        self.codes = np.load(os.path.join(directory, CODES_FILE.format(codec=codec)),
+                             mmap_mode=None if in_memory else "r")
+        built_for = (len(self.codes), codes_export_id(directory, codec))
+        if built_for != (self.count, self.export_id):
+            raise ValueError(f"{codec} codes in {directory} were built for another export "
+                             f"({built_for[0]} vectors, export {built_for[1]}; the export has "
+                             f"{self.count}, export {self.export_id}); rebuild them with {rebuild}")
+        self.rerank = DEFAULT_RERANK[codec] if rerank is None else rerank
+
+    def search_rows(self, query_vectors, limit=10):
+        """
+        Finds the best-matching rows for a batch of queries.
+
+        Returns:
+            A (rows, similarities) pair of 2-D arrays, best match first.
+        """
+        queries = normalize_rows(np.atleast_2d(query_vectors))
+        shortlist = max(limit, self.rerank)
+        rows_out = []
+        scores_out = []
+        for query in queries:
+            best_rows = np.empty(0, dtype=np.int64)
+            best_scores = np.empty(0, dtype=np.float32)
+            for start in range(0, self.count, self.block_rows):
+                scores = self.quantizer.score(query, self.codes[start:start + self.block_rows])
+                keep = top_k(scores[None, :], shortlist)[0]
+                merged_rows = np.concatenate([best_rows, keep + start])
+                merged_scores = np.concatenate([best_scores, scores[keep]])
+                keep = top_k(merged_scores[None, :], shortlist)[0]
+                best_rows, best_scores = merged_rows[keep], merged_scores[keep]
+
+            if self.rerank:
+                # Re-score the shortlist exactly, reading rows in file order
+                ordered = np.sort(best_rows)
+                exact = np.asarray(self.vectors[ordered]) @ query
+                keep = top_k(exact[None, :], limit)[0]
+                best_rows, best_scores = ordered[keep], exact[keep]
+            else:
+                best_rows, best_scores = best_rows[:limit], best_scores[:limit]
+            rows_out.append(best_rows)
+            scores_out.append(best_scores.astype(np.float32))
+        return np.array(rows_out), np.array(scores_out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantized job vector codes")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="Build codes for an exported local index")
+    build_parser.add_argument("--dir", default="data/local_index", help="Local index directory")
+    build_parser.add_argument("--codec", choices=sorted(CODECS), default="sq8")
+    build_parser.add_argument("--train-size", type=int, default=100000)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        size = build_codes(args.dir, args.codec, args.train_size)
+        print(f"Built {args.codec} codes ({size / 2 ** 20:.1f} MiB) in {args.dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Compact binary storage for job vectors.
+
+With VECTOR_STORAGE=binary, vectors are written as BSON binary vectors
+(subtype 9, float32): one little-endian float32 per dimension behind a
+two-byte header, which Atlas Vector Search indexes directly. Readers accept
+both that format and the original arrays of doubles.
+
+Convert existing documents with:
+
+    python vector_storage.py migrate
+"""
+import argparse
+import os
+import time
+import numpy as np
+from bson import Binary
+from pymongo import UpdateOne
+
+# "array" stores BSON arrays of doubles, "binary" stores packed float32
+VECTOR_STORAGE = os.environ.get("VECTOR_STORAGE", "array")
+
+# BSON binary subtype for vectors and the header byte of its float32 dtype
+VECTOR_SUBTYPE = 9
+FLOAT32_DTYPE = 0x27
+VECTOR_HEADER = bytes([FLOAT32_DTYPE, 0])
+
+
+def encode_vector(vector):
+    """
+    Packs a vector as a BSON float32 binary vector.
+
+    Args:
+        vector: A sequence or array of floats.
+
+    Returns:
+        A bson Binary with subtype 9.
+    """
+    packed = np.asarray(vector, dtype="<f4").tobytes()
+    return Binary(VECTOR_HEADER + packed, VECTOR_SUBTYPE)
+
+
+def decode_vector(value):
+    """
+    Reads a stored vector in any supported format.
+
+    Args:
+        value: A list of numbers, a subtype 9 float32 Binary, or raw
+            little-endian float32 bytes.
+
+    Returns:
+        A float32 NumPy array, or None if `value` is None.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray)):
+        if isinstance(value, Binary) and value.subtype == VECTOR_SUBTYPE:
+            if value[0] != FLOAT32_DTYPE:
+                raise ValueError(f"Unsupported vector dtype 0x{value[0]:02x}")
+            return np.frombuffer(value, dtype="<f4", offset=len(VECTOR_HEADER))
+        return np.frombuffer(value, dtype="<f4")
+    return np.asarray(value, dtype=np.float32)
+
+
+def field_value(document, path):
+    """
+    Reads a possibly dotted field path such as `vectors.en_core_web_md` from a document.
+
+    Args:
+        document: A MongoDB document.
+        path: The field path.
+
+    Returns:
+        The value, or None if any part of the path is missing.
+    """
+    value = document
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def encode_for_storage(vector, storage=VECTOR_STORAGE):
+    """
+    Converts a vector to the configured storage format.
+
+    Args:
+        vector: A NumPy array or list.
+        storage: "array" or "binary".
+
+    Returns:
+        A list of floats or a float32 Binary.
+    """
+    if storage == "binary":
+        return encode_vector(vector)
+    if isinstance(vector, np.ndarray):
+        return vector.tolist()
+    return vector
+
+
+def migrate(collection, path="description_vector", batch_size=1000):
+    """
+    Rewrites every array-stored vector as a binary vector.
+
+    Only documents still holding an array are selected, so an interrupted
+    migration can simply be run again.
+
+    Args:
+        collection: The pymongo job collection.
+        path: Field holding the vectors.
+        batch_size: Number of documents per bulk update.
+
+    Returns:
+        The number of migrated documents.
+    """
+    migrated = 0
+    last_id = None
+    start = time.perf_counter()
+    while True:
+        query = {path: {"$type": "array"}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = list(collection.find(query, {path: 1}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+
+        requests = [UpdateOne({"_id": document["_id"]}, {"$set": {path: encode_vector(field_value(document, path))}})
+                    for document in batch]
+        collection.bulk_write(requests, ordered=False)
+        migrated += len(batch)
+        last_id = batch[-1]["_id"]
+        print(f"Migrated {migrated} documents ({migrated / (time.perf_counter() - start):.0f} docs/sec)")
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Binary float32 vector storage")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="Convert stored arrays of doubles to float32 binary")
+    migrate_parser.add_argument("--path", default="description_vector", help="Vector field")
+    migrate_parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        from database import get_collection
+        count = migrate(get_collection(), args.path, args.batch_size)
+        print(f"Migrated {count} documents to binary vectors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Versioned job vectors and the re-embedding backfill.
+
+Changing the embedding model means recomputing every stored vector. The
+backfill writes the new vectors next to the current ones, under
+`vectors.<version>`, so searches keep using the old field while it runs.
+It walks the collection in `_id` ranges, embeds each batch on a process
+pool and writes it with one bulk update; the last `_id` written is saved
+in MongoDB after every batch, so a restarted run continues where the last
+one stopped.
+
+The active version is a single field of one control document per job
+collection. `activate` first embeds the jobs stored since the backfill
+finished, then flips it with one update and bumps the collection
+generation, which drops cached search results. Search processes read it
+at startup and embed queries with the matching model; the scraper and
+bulk_ingest.py read it too and write new jobs' vectors into its field.
+
+    python vector_versions.py backfill en_core_web_md --workers 4 --max-rate 500
+    python vector_versions.py backfill minilm --model sentence-transformers:/models/all-MiniLM-L6-v2
+    python vector_versions.py activate en_core_web_md
+    python vector_versions.py status
+"""
+import argparse
+import datetime
+import os
+import re
+import time
+from collections import deque
+from multiprocessing import Pool
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from embedders import EMBEDDING_MODEL, get_embedder
+from nlp_models import get_nlp
+from result_cache import bump_generation
+from text_analysis import get_stop_words
+from vector_storage import VECTOR_STORAGE, encode_for_storage
+
+# Collection holding one control document per job collection
+VERSIONS_COLLECTION = "vector_versions"
+
+# Subdocument holding one vector per backfilled version
+VECTORS_FIELD = "vectors"
+
+# The vectors written by the ingest path, before any backfill
+LEGACY_VERSION = "legacy"
+LEGACY_PATH = "description_vector"
+
+VERSION_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def vector_path(version):
+    """
+    Returns the field holding the vectors of a version.
+
+    Args:
+        version: A version name made of letters, digits, "_" and "-".
+
+    Returns:
+        The dotted field path.
+    """
+    if version == LEGACY_VERSION:
+        return LEGACY_PATH
+    if not VERSION_NAME_PATTERN.match(version):
+        raise ValueError(f"Invalid vector version name: {version!r}")
+    return f"{VECTORS_FIELD}.{version}"
+
+
+def _versions_filter(collection):
+    return {"_id": collection.name}
+
+
+def read_versions(collection):
+    """
+    Returns the control document of a job collection, or an empty one.
+    """
+    return collection.database[VERSIONS_COLLECTION].find_one(_versions_filter(collection)) or {}
+
+
+def legacy_version():
+    """
+    Returns the version of the `description_vector` field written before any backfill.
+    """
+    return {"version": LEGACY_VERSION, "model": EMBEDDING_MODEL, "path": LEGACY_PATH}
+
+
+def active_version(collection):
+    """
+    Returns the vector version searches should use.
+
+    Falls back to the legacy `description_vector` field and the ingest
+    path's `EMBEDDING_MODEL` when nothing was activated or MongoDB is unreachable.
+
+    Args:
+        collection: The pymongo job collection.
+
+    Returns:
+        A dictionary with `version`, `model` and `path`.
+    """
+    legacy = legacy_version()
+    try:
+        document = read_versions(collection)
+    except PyMongoError as e:
+        print(f"Error reading the active vector version: {e}")
+        return legacy
+    version = document.get("active")
+    if not version or version == LEGACY_VERSION:
+        return legacy
+    details = document.get("versions", {}).get(version, {})
+    return {"version": version, "model": details.get("model", version), "path": vector_path(version)}
+
+
+def activate(collection, version):
+    """
+    Switches searches to a backfilled version with a single update.
+
+    Jobs stored after the backfill finished only have the vector of the
+    version that was active when they were written; they are embedded for
+    the new version first (see `catch_up`), so no job drops out of the
+    searches when they switch. Scrapers and ingests still running with the
+    old version must be restarted afterwards.
+
+    Args:
+        collection: The pymongo job collection.
+        version: A version whose backfill has completed, or `LEGACY_VERSION`.
+
+    Raises:
+        ValueError: If the version's backfill never reached the end of the collection.
+    """
+    if version != LEGACY_VERSION:
+        details = read_versions(collection).get("versions", {}).get(version, {})
+        if not details.get("completed_at"):
+            raise ValueError(f"Vector version {version!r} has not been backfilled completely")
+        current_path = active_version(collection)["path"]
+        if current_path != vector_path(version):
+            caught_up = catch_up(collection, version, details.get("model", version), current_path)
+            if caught_up:
+                print(f"Embedded {caught_up} jobs stored since the {version} backfill")
+    collection.database[VERSIONS_COLLECTION].update_one(
+        _versions_filter(collection),
+        {"$set": {"active": version, "activated_at": datetime.datetime.utcnow()}},
+        upsert=True,
+    )
+    bump_generation(collection)
+
+
+def catch_up(collection, version, model_name, from_path, batch_size=256, storage=VECTOR_STORAGE):
+    """
+    Embeds the jobs that have a vector in `from_path` but none for `version`.
+
+    Runs in the calling process: after a completed backfill only the jobs
+    stored since are missing, and each batch written shrinks the query.
+
+    Args:
+        collection: The pymongo job collection.
+        version: The backfilled version.
+        model_name: The version's embedder spec.
+        from_path: Field of the active version, which the ingest path writes.
+        batch_size: Jobs per embedding call and bulk update.
+        storage: "array" or "binary"; see `vector_storage.VECTOR_STORAGE`.
+
+    Returns:
+        The number of jobs embedded.
+    """
+    path = vector_path(version)
+    query = {path: {"$exists": False}, from_path: {"$exists": True}}
+    embedder = get_embedder(model_name)
+    embedded = 0
+    while True:
+        batch = list(collection.find(query, {"description": 1, "tokens": 1}).limit(batch_size))
+        if not batch:
+            return embedded
+        vectors = embedder.embed([backfill_text(document) for document in batch])
+        collection.bulk_write([UpdateOne({"_id": document["_id"]}, {"$set": {path: encode_for_storage(vector, storage)}})
+                               for document, vector in zip(batch, vectors)], ordered=False)
+        collection.database[VERSIONS_COLLECTION].update_one(
+            _versions_filter(collection), {"$inc": {f"versions.{version}.count": len(batch)}})
+        embedded += len(batch)
+
+
+def backfill_text(document):
+    """
+    Returns the text a stored job is re-embedded from.
+
+    The description is only stored with `STORE_DESCRIPTIONS=1`; older jobs
+    fall back to their stopword-filtered tokens.
+    """
+    return document.get("description") or " ".join(document.get("tokens") or [])
+
+
+class RateLimiter:
+    """
+    Caps a loop at `rate` items per second by sleeping before each batch.
+
+    Args:
+        rate: Items per second; None or 0 disables the limit.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.started = time.monotonic()
+        self.items = 0
+
+    def wait(self, count):
+        if self.rate:
+            delay = self.started + self.items / self.rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        self.items += count
+
+
+def _load_model(model_name):
+    # Pool initializer: every worker loads the embedder once
+    get_nlp(get_embedder(model_name).spacy_model)
+    get_stop_words()
+
+
+def _embed(texts, model_name):
+    return get_embedder(model_name).embed(texts)
+
+
+def _read_batches(collection, last_id, batch_size, limiter):
+    # Walks the collection in _id order, one range query per batch
+    while True:
+        limiter.wait(batch_size)
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = list(collection.find(query, {"description": 1, "tokens": 1}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            return
+        last_id = batch[-1]["_id"]
+        yield batch
+
+
+def backfill(collection, version, model_name=None, workers=None, batch_size=256, max_rate=None,
+             restart=False, storage=VECTOR_STORAGE):
+    """
+    Re-embeds every job into the field of a vector version.
+
+    Batches are embedded on a process pool with at most two batches per
+    worker in flight, and written back in `_id` order; after each write the
+    last `_id` is saved in the control document.
+
+    Args:
+        collection: The pymongo job collection.
+        version: Version name; see `vector_path`.
+        model_name: Embedder spec (see `embedders`); defaults to the version name.
+        workers: Worker processes (default: CPU count).
+        batch_size: Jobs per read, embedding task and bulk update.
+        max_rate: Optional cap in jobs per second on reads and writes.
+        restart: Ignore the saved progress and embed every job again.
+        storage: "array" or "binary"; see `vector_storage.VECTOR_STORAGE`.
+
+    Returns:
+        The number of jobs embedded by this run.
+    """
+    if version == LEGACY_VERSION:
+        raise ValueError("The legacy vectors are written by the ingest path, not backfilled")
+    path = vector_path(version)
+    model_name = model_name or version
+    versions = collection.database[VERSIONS_COLLECTION]
+    prefix = f"versions.{version}"
+    details = read_versions(collection).get("versions", {}).get(version, {})
+    if details.get("model", model_name) != model_name:
+        raise ValueError(f"Vector version {version!r} was embedded with {details['model']}, not {model_name}")
+    last_id = None if restart else details.get("last_id")
+    if last_id is not None:
+        print(f"Resuming {version} after _id {last_id}")
+    progress = {f"{prefix}.model": model_name, f"{prefix}.path": path}
+    if last_id is None:
+        progress[f"{prefix}.count"] = 0
+    versions.update_one(_versions_filter(collection), {"$set": progress}, upsert=True)
+
+    workers = workers or os.cpu_count() or 1
+    embedded = 0
+    limiter = RateLimiter(max_rate)
+    start = time.perf_counter()
+    with Pool(workers, initializer=_load_model, initargs=(model_name,)) as pool:
+        in_flight = deque()
+        batches = _read_batches(collection, last_id, batch_size, limiter)
+        while True:
+            while len(in_flight) < 2 * workers:
+                batch = next(batches, None)
+                if batch is None:
+                    break
+                texts = [backfill_text(document) for document in batch]
+                in_flight.append((batch, pool.apply_async(_embed, (texts, model_name))))
+            if not in_flight:
+                break
+
+            batch, task = in_flight.popleft()
+            vectors = task.get()
+            requests = [UpdateOne({"_id": document["_id"]}, {"$set": {path: encode_for_storage(vector, storage)}})
+                        for document, vector in zip(batch, vectors)]
+            collection.bulk_write(requests, ordered=False)
+            embedded += len(batch)
+            versions.update_one(_versions_filter(collection), {
+                "$set": {f"{prefix}.last_id": batch[-1]["_id"], f"{prefix}.dimensions": int(vectors.shape[1])},
+                "$inc": {f"{prefix}.count": len(batch)},
+            })
+            print(f"Embedded {embedded} jobs ({embedded / (time.perf_counter() - start):.0f} docs/sec)")
+
+    versions.update_one(_versions_filter(collection),
+                        {"$set": {f"{prefix}.completed_at": datetime.datetime.utcnow()}})
+    return embedded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Versioned job vectors")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = subparsers.add_parser("backfill", help="Re-embed every job into a new vector version")
+    backfill_parser.add_argument("version", help="Version name; also the embedder spec unless --model is given")
+    backfill_parser.add_argument("--model", default=None,
+                                 help="Embedder spec, e.g. a spaCy model or sentence-transformers:<model dir>")
+    backfill_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    backfill_parser.add_argument("--batch-size", type=int, default=256)
+    backfill_parser.add_argument("--max-rate", type=float, default=None, help="Maximum jobs per second")
+    backfill_parser.add_argument("--restart", action="store_true", help="Ignore the saved progress")
+    activate_parser = subparsers.add_parser("activate", help="Switch searches to a backfilled version")
+    activate_parser.add_argument("version")
+    subparsers.add_parser("status", help="Show the active version and backfill progress")
+    args = parser.parse_args()
+
+    from database import get_collection
+    from job_filters import atlas_index_definition
+    collection = get_collection()
+    if args.command == "backfill":
+        count = backfill(collection, args.version, args.model, args.workers, args.batch_size, args.max_rate,
+                         args.restart)
+        print(f"Backfilled {count} jobs into {vector_path(args.version)}")
+    elif args.command == "activate":
+        details = read_versions(collection).get("versions", {}).get(args.version, {})
+        if details.get("dimensions"):
+            print("The Atlas vector index must cover the new field:")
+            print(atlas_index_definition(vector_path(args.version), details["dimensions"]))
+        if args.version == LEGACY_VERSION:
+            # Jobs ingested while another version was active only have that version's vector
+            missing = collection.count_documents({LEGACY_PATH: {"$exists": False}})
+            if missing:
+                print(f"Warning: {missing} jobs have no {LEGACY_PATH} and will not be found")
+        activate(collection, args.version)
+        print(f"Searches and ingest now use {vector_path(args.version)}; restart the search service, "
+              f"the scraper and running ingests to pick it up")
+    elif args.command == "status":
+        document = read_versions(collection)
+        print(f"Active: {document.get('active', LEGACY_VERSION)}")
+        for version, details in document.get("versions", {}).items():
+            print(f"  {version}: model={details.get('model')} count={details.get('count', 0)} "
+                  f"dimensions={details.get('dimensions')} completed_at={details.get('completed_at')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+# Worker processes running the spaCy pipeline; one per core, leaving one for
+# the scraper, the collector thread and the bulk writer
+VECTORIZE_WORKERS = int(os.environ.get("VECTORIZE_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+
+# Items waiting for a worker before `submit` blocks; the same bound applies
+# to finished batches waiting for the collector
+VECTORIZE_MAX_PENDING = int(os.environ.get("VECTORIZE_MAX_PENDING", 256))
+
+# Workers are forked where possible: the scraper has no main guard, so a
+# spawned worker would re-run it on import
+DEFAULT_START_METHOD = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _work(process_batch, initializer, tasks, results, batch_size, max_wait):
+    # Runs in each worker process: load the models once, then turn queued
+    # items into batches until the None sentinel arrives
+    if initializer is not None:
+        initializer()
+    stopping = False
+    while not stopping:
+        item = tasks.get()
+        if item is None:
+            break
+        batch = [item]
+        deadline = time.monotonic() + max_wait
+        while len(batch) < batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = tasks.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                stopping = True
+                break
+            batch.append(item)
+
+        try:
+            results.put((process_batch(batch), 0))
+        except Exception as e:
+            print(f"Error processing batch of {len(batch)} items in worker {os.getpid()}: {e}")
+            results.put(([], len(batch)))
+    results.put(None)
+
+
+class VectorizationPool:
+    """
+    Runs CPU-bound batch processing in worker processes fed by a bounded queue.
+
+    `submit` only enqueues an item, so the caller (the scraper's event
+    thread) is never held up by spaCy. Each worker runs `initializer` once,
+    e.g. to load the model, then collects up to `batch_size` items or waits
+    at most `max_wait` seconds and calls `process_batch` on them. The
+    outputs are handed one by one to `handle_result` on a collector thread
+    in this process, which is where the MongoDB writes happen.
+
+    Both queues are bounded, so a slow writer blocks the workers and in turn
+    `submit`, instead of letting memory grow without limit.
+
+    Args:
+        process_batch: Picklable function mapping a list of items to a list
+            of outputs; runs in the workers.
+        handle_result: Called with each output in this process.
+        workers: Number of worker processes.
+        max_pending: Maximum number of queued items, and of finished batches
+            waiting for the collector.
+        batch_size: Maximum number of items per `process_batch` call.
+        max_wait: Seconds a worker waits for a batch to fill.
+        initializer: Optional picklable function each worker runs at startup.
+        start_method: multiprocessing start method; see `DEFAULT_START_METHOD`.
+    """
+
+    def __init__(self, process_batch, handle_result, workers=VECTORIZE_WORKERS, max_pending=VECTORIZE_MAX_PENDING,
+                 batch_size=32, max_wait=5.0, initializer=None, start_method=DEFAULT_START_METHOD):
+        self.handle_result = handle_result
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+        context = multiprocessing.get_context(start_method)
+        self._tasks = context.Queue(maxsize=max_pending)
+        self._results = context.Queue(maxsize=max_pending)
+        self._closed = False
+        self._workers = [
+            context.Process(
+                target=_work,
+                args=(process_batch, initializer, self._tasks, self._results, batch_size, max_wait),
+                daemon=True,
+            )
+            for _ in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def __len__(self):
+        return len(self._workers)
+
+    def submit(self, item):
+        """
+        Queues one item, blocking while `max_pending` items are waiting.
+
+        Args:
+            item: A picklable item, e.g. the fields of a scraped job.
+        """
+        if self._closed:
+            raise RuntimeError("VectorizationPool is closed")
+        self._tasks.put(item)
+        self.submitted += 1
+
+    def pending(self):
+        """
+        Returns the number of submitted items that have not been handled yet.
+        """
+        return self.submitted - self.completed - self.failed
+
+    def close(self):
+        """
+        Processes everything still queued, then stops the workers and the collector.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._workers:
+            self._tasks.put(None)
+        self._collector.join()
+        for worker in self._workers:
+            worker.join()
+        print(f"[VECTORIZE] Totals: {self.completed} processed, {self.failed} failed "
+              f"by {len(self._workers)} workers")
+
+    def _collect(self):
+        finished = 0
+        while finished < len(self._workers):
+            try:
+                message = self._results.get(timeout=1.0)
+            except queue.Empty:
+                # A worker that died without its sentinel leaves nothing more to collect
+                if not any(worker.is_alive() for worker in self._workers):
+                    break
+                continue
+            if message is None:
+                finished += 1
+                continue
+
+            outputs, failed = message
+            self.failed += failed
+            for output in outputs:
+                try:
+                    self.handle_result(output)
+                except Exception as e:
+                    print(f"Error handling vectorized item: {e}")
+                self.completed += 1